@@ -148,7 +148,7 @@ const IssueList = () => {
                                                     </div>
                                                 ) : (
                                                     <img
-                                                        src={thumbUrl}
+                                                        src={`${thumbUrl}?size=thumb`}
                                                         alt="evidence"
                                                         style={{ width: "60px", height: "60px", objectFit: "cover", borderRadius: "10px", border: "2px solid white", boxShadow: '0 2px 4px rgba(0,0,0,0.1)' }}
                                                         onError={(e) => e.target.src = 'https://via.placeholder.com/60?text=Error'}
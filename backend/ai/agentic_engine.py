@@ -1,6 +1,11 @@
 import json
 import os
 from datetime import datetime
+from services.metrics import metrics
+from services.log import get_logger
+from services.tracing import tracer
+
+log = get_logger(__name__)
 
 # Initialize Gemini (Lazy Load)
 model = None
@@ -54,14 +59,15 @@ Return structured decision in JSON format:
 }}"""
 
     try:
-        print("🤖 AGENT 1: Triage Agent Running...")
-        triage_resp = ai.generate_content(triage_prompt)
+        log.info("Agent running", agent="triage")
+        with tracer.span("agent_triage"), metrics.llm_call("gemini", "triage"):
+            triage_resp = ai.generate_content(triage_prompt)
         # cleanup markdown
         text = triage_resp.text.replace('```json', '').replace('```', '').strip()
         triage_data = json.loads(text)
         results["triage"] = triage_data
     except Exception as e:
-        print(f"❌ Triage Failed: {e}")
+        log.error("Agent failed", agent="triage", error=str(e))
         triage_data = {"issue_type": "Unknown", "priority_level": "Medium"}
         results["triage"] = {"error": str(e)}
 
@@ -89,8 +95,9 @@ Return JSON:
 }}"""
 
     try:
-        print("⚖️ AGENT 2: Policy Agent Running...")
-        policy_resp = ai.generate_content(policy_prompt)
+        log.info("Agent running", agent="policy")
+        with tracer.span("agent_policy"), metrics.llm_call("gemini", "policy"):
+            policy_resp = ai.generate_content(policy_prompt)
         text = policy_resp.text.replace('```json', '').replace('```', '').strip()
         results["policy"] = json.loads(text)
     except Exception as e:
@@ -115,8 +122,9 @@ Return JSON:
 }}"""
 
     try:
-        print("📢 AGENT 3: Assignment Agent Running...")
-        assign_resp = ai.generate_content(assign_prompt)
+        log.info("Agent running", agent="assignment")
+        with tracer.span("agent_assignment"), metrics.llm_call("gemini", "assignment"):
+            assign_resp = ai.generate_content(assign_prompt)
         text = assign_resp.text.replace('```json', '').replace('```', '').strip()
         results["assignment"] = json.loads(text)
     except Exception as e:
@@ -141,9 +149,10 @@ Return JSON:
 }}"""
     
     try:
-        print("✅ AGENT 4: Verifier Agent Running...")
+        log.info("Agent running", agent="verifier")
         # Ideally we pass images here, but for text-flow we simulate or skip
-        verifier_resp = ai.generate_content(verifier_prompt)
+        with tracer.span("agent_verifier"), metrics.llm_call("gemini", "verifier"):
+            verifier_resp = ai.generate_content(verifier_prompt)
         text = verifier_resp.text.replace('```json', '').replace('```', '').strip()
         results["verification"] = json.loads(text)
     except Exception as e:
@@ -18,10 +18,14 @@ from bson import ObjectId
 # Add backend to path to import AI modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
 
+from services.log import get_logger
+
+log = get_logger(__name__)
+
 try:
     from ai.inspector_agent import generate_inspection_summary
 except ImportError:
-    print("⚠️  AI Inspector module not found. Please ensure it's in backend/ai/inspector_agent.py")
+    log.error("AI Inspector module not found, expected backend/ai/inspector_agent.py")
     sys.exit(1)
 
 # Database connection
@@ -43,7 +47,7 @@ DEPARTMENT_MAPPING = {
 
 def process_pending_issues():
     """Fetches and processes all pending issues autonomously"""
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] 🤖 Autonomous Agent waking up...")
+    log.info("Autonomous agent waking up")
     
     # Find issues with status 'Pending' or missing status
     pending_issues = list(issues_collection.find({
@@ -56,16 +60,16 @@ def process_pending_issues():
     }))
     
     if not pending_issues:
-        print("   No pending issues found. Sleeping... 😴")
+        log.info("No pending issues")
         return 0
         
-    print(f"   Found {len(pending_issues)} pending issues to process.")
+    log.info("Pending issues found", count=len(pending_issues))
     
     count = 0
     for issue in pending_issues:
         issue_id = str(issue["_id"])
         title = issue.get("title", "Untitled")
-        print(f"   👉 Processing: {title} ({issue_id})")
+        log.debug("Processing issue", issue_id=issue_id)
         
         # 1. Run AI Inspection
         analysis = generate_inspection_summary(issue)
@@ -99,7 +103,7 @@ def process_pending_issues():
             {"$set": update_data}
         )
         
-        print(f"      ✅ AUTO-ASSIGNED to {assigned_dept} (Priority: {priority_label})")
+        log.info("Issue auto-assigned", issue_id=issue_id, department=assigned_dept, priority=priority_label)
         count += 1
         
     return count
@@ -6,6 +6,10 @@ MULTI-TIER AI: Gemini (FREE) → OpenAI (Premium)
 
 import os
 from datetime import datetime
+from services.metrics import metrics
+from services.log import get_logger
+
+log = get_logger(__name__)
 
 class UrbanEyeChatbot:
     """
@@ -18,16 +22,21 @@ class UrbanEyeChatbot:
         self.chatbot_type = None
         self.chatbot = None
         
+        # FAQ answer cache (history-independent questions skip the LLM)
+        from ai.response_cache import ResponseCache
+        self.response_cache = ResponseCache()
+        self.response_cache.register_faq(self.get_quick_replies())
+        
         # Try Gemini first (FREE!)
         if self._init_gemini():
             self.chatbot_type = "gemini"
-            print("[INFO] Using Google Gemini AI (FREE tier)")
+            log.info("Chatbot backend selected", backend="gemini")
             return
         
         # Try OpenAI second (requires billing)
         if self._init_openai():
             self.chatbot_type = "openai"
-            print("[INFO] Using OpenAI GPT (premium mode)")
+            log.info("Chatbot backend selected", backend="openai")
             return
         
         # Fallback to FREE rule-based chatbot (no API key needed!)
@@ -35,13 +44,13 @@ class UrbanEyeChatbot:
             from ai.free_chatbot import FreeChatbot
             self.chatbot = FreeChatbot()
             self.chatbot_type = "free"
-            print("[INFO] ✅ Using FREE rule-based chatbot (no API key needed)")
+            log.info("Chatbot backend selected", backend="free")
             return
         except Exception as e:
-            print(f"⚠️ Free chatbot failed: {e}")
+            log.warning("Free chatbot failed", error=str(e))
         
         # If even free chatbot fails, go offline
-        print("[WARN] No chatbot available at all.")
+        log.warning("No chatbot available")
         self.chatbot_type = "offline"
         self.chatbot = None
     
@@ -56,7 +65,7 @@ class UrbanEyeChatbot:
                     self.chatbot = gemini_chatbot
                     return True
         except Exception as e:
-            print(f"⚠️ Gemini not available: {e}")
+            log.warning("Gemini not available", error=str(e))
         return False
     
     def _init_openai(self):
@@ -71,7 +80,7 @@ class UrbanEyeChatbot:
                 self.conversations = {}
                 return True
         except Exception as e:
-            print(f"⚠️ OpenAI not available: {e}")
+            log.warning("OpenAI not available", error=str(e))
         return False
     
     def _build_knowledge_base(self):
@@ -119,10 +128,20 @@ UrbanEye helps citizens report infrastructure problems to the government using A
             except Exception as e:
                 return f"[Chat Error] {str(e)}"
 
+        # FAQ cache (LLM tiers only - the free bot is already local).
+        # Cacheable answers are shared, so they are generated without history.
+        cached_answer, cache_key = self.response_cache.get(message)
+        if cached_answer:
+            return cached_answer
+
         # Use Gemini
         if self.chatbot_type == "gemini":
             try:
-                return self.chatbot.chat(user_id, message)
+                bot_message = self.chatbot.chat(user_id, message, use_history=cache_key is None)
+                # Don't pin the offline fallback answer for the whole TTL
+                if bot_message != self.chatbot._local_intelligence_response(message):
+                    self.response_cache.put(cache_key, bot_message)
+                return bot_message
             except Exception as e:
                 return f"[AI Service Error] Gemini Unavailable: {str(e)}"
         
@@ -136,18 +155,19 @@ UrbanEye helps citizens report infrastructure problems to the government using A
                 "content": message
             })
             
-            context = self.conversations[user_id][-10:]
+            context = self.conversations[user_id][-10:] if cache_key is None else self.conversations[user_id][-1:]
             
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        *context
-                    ],
-                    temperature=0.7,
-                    max_tokens=200
-                )
+                with metrics.llm_call("openai", "chat"):
+                    response = self.client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=[
+                            {"role": "system", "content": self.system_prompt},
+                            *context
+                        ],
+                        temperature=0.7,
+                        max_tokens=200
+                    )
                 
                 bot_message = response.choices[0].message.content.strip()
                 
@@ -156,10 +176,11 @@ UrbanEye helps citizens report infrastructure problems to the government using A
                     "content": bot_message
                 })
                 
+                self.response_cache.put(cache_key, bot_message)
                 return bot_message
                 
             except Exception as e:
-                print(f"[ERROR] OpenAI failed: {e}")
+                log.error("OpenAI failed", error=str(e))
                 return f"[AI Service Error] OpenAI Unavailable: {str(e)}"
         
         return "[System Error] Unknown AI State"
@@ -172,6 +193,10 @@ UrbanEye helps citizens report infrastructure problems to the government using A
             del self.conversations[user_id]
         return True
     
+    def get_cache_stats(self):
+        """FAQ response cache hit-rate metrics"""
+        return self.response_cache.stats()
+    
     def get_quick_replies(self):
         """Get suggested quick replies"""
         if self.chatbot:
@@ -0,0 +1,309 @@
+"""
+Offline Near-Duplicate Clustering for UrbanEye AI
+Re-links duplicate reports across the WHOLE issue archive
+
+Report-time linking (ai.duplicate_detector.find_potential_duplicate) only
+looks at open issues from the last 7 days, so historical duplicates,
+re-reports of resolved issues and reports that arrived before their
+"original" are never merged. This batch job:
+
+1. Loads every stored hash + coordinate into NumPy arrays.
+2. Buckets issues into a spatial grid whose cell size equals the geo
+   radius, so any matching pair lies in the same or an adjacent cell.
+3. Compares each cell against itself and its forward neighbours with a
+   vectorised XOR/popcount block (ai.perceptual_hash), giving all
+   near-duplicate pairs in ~O(n) for realistic densities.
+4. Union-finds the pairs into clusters. The earliest report becomes the
+   original; every other member gets `is_duplicate_of` and status
+   "Duplicate" (as at report time), and the original's `support_count`
+   becomes the cluster size. A former duplicate that becomes the original
+   gets back the status it had before it was demoted.
+5. Writes only the changed fields back with bulk_write.
+
+Multi-index hash buckets are not used: with the production threshold
+(distance < 15) the pigeonhole split needs 15 substrings of ~4 bits, so
+every bucket would hold ~1/16 of a cell and prune almost nothing. The
+spatial grid already bounds each comparison to a few neighbouring cells.
+
+Usage (from backend/):
+    python -m ai.duplicate_clustering --dry-run
+    python -m ai.duplicate_clustering
+    python -m ai.duplicate_clustering --benchmark 200000   # synthetic, no DB
+"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+
+from ai.perceptual_hash import from_hex, to_signed64, popcount64
+
+DEFAULT_THRESHOLD = 15      # same as find_potential_duplicate
+DEFAULT_GEO_RANGE = 0.0003  # degrees, same bounding box as report time
+CANDIDATE_BUDGET = 2_000_000  # candidate pairs compared per vectorised chunk
+DUPLICATE_STATUS = "Duplicate"
+DEFAULT_STATUS = "Pending"  # status of a new unique report (routes/issue.py)
+
+# The cell itself plus 4 forward neighbours cover every adjacent pair once
+NEIGHBOUR_OFFSETS = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _split_by_budget(counts, budget):
+    """Split point positions into chunks of at most ~budget candidates"""
+    ends = np.cumsum(counts)
+    bounds = np.searchsorted(ends, np.arange(budget, ends[-1] if len(ends) else 0, budget), side="right")
+    edges = np.unique(np.concatenate([[0], bounds, [len(counts)]]))
+    return zip(edges[:-1], edges[1:])
+
+
+def find_duplicate_pairs(lats, lngs, hashes, threshold=DEFAULT_THRESHOLD, geo_range=DEFAULT_GEO_RANGE):
+    """
+    All (i, j) pairs, i < j, inside the geo box with Hamming distance < threshold.
+
+    Points are sorted by grid cell; for every neighbour offset each point is
+    joined to the index range of its neighbour cell (searchsorted), so
+    candidate generation and comparison are both pure NumPy and the cost is
+    O(n + candidates).
+
+    Args:
+        lats, lngs: float arrays of coordinates
+        hashes: int64 array of packed dHashes
+
+    Returns:
+        np.ndarray: (k, 2) array of index pairs
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    hashes = np.asarray(hashes, dtype=np.int64)
+    if len(hashes) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    cell_y = np.floor(lats / geo_range).astype(np.int64)
+    cell_x = np.floor(lngs / geo_range).astype(np.int64)
+    cell_y -= cell_y.min()
+    cell_x -= cell_x.min() - 1          # keep x - 1 >= 0
+    width = int(cell_x.max()) + 2
+    keys = cell_y * width + cell_x
+
+    # Sort once; all lookups below work on sorted positions
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    cell_keys, cell_start, cell_count = np.unique(sorted_keys, return_index=True, return_counts=True)
+    s_lat, s_lng, s_hash = lats[order], lngs[order], hashes[order]
+    positions = np.arange(len(order))
+
+    found = []
+    for dy, dx in NEIGHBOUR_OFFSETS:
+        target = sorted_keys + dy * width + dx
+        slot = np.minimum(np.searchsorted(cell_keys, target), len(cell_keys) - 1)
+        exists = cell_keys[slot] == target
+        start = np.where(exists, cell_start[slot], 0)
+        count = np.where(exists, cell_count[slot], 0)
+        if dy == 0 and dx == 0:
+            # Same cell: only partners after this point (i < j)
+            count = np.maximum(start + count - positions - 1, 0)
+            start = positions + 1
+
+        for lo, hi in _split_by_budget(count, CANDIDATE_BUDGET):
+            c = count[lo:hi]
+            total = int(c.sum())
+            if total == 0:
+                continue
+            left = np.repeat(positions[lo:hi], c)
+            first = np.repeat(start[lo:hi] - (np.cumsum(c) - c), c)
+            right = first + np.arange(total)
+
+            mask = popcount64(np.bitwise_xor(s_hash[left], s_hash[right])) < threshold
+            mask &= np.abs(s_lat[left] - s_lat[right]) < geo_range
+            mask &= np.abs(s_lng[left] - s_lng[right]) < geo_range
+            if mask.any():
+                found.append(np.stack([order[left[mask]], order[right[mask]]], axis=1))
+
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.sort(np.concatenate(found), axis=1)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size"""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+
+def build_clusters(n, pairs):
+    """
+    Returns:
+        list: Index lists for every cluster with 2+ members
+    """
+    uf = UnionFind(n)
+    for i, j in pairs.tolist():
+        uf.union(i, j)
+    clusters = {}
+    for idx in np.unique(pairs).tolist():
+        clusters.setdefault(uf.find(idx), []).append(idx)
+    return list(clusters.values())
+
+
+def _load_archive(collection):
+    """Pull ids, coordinates, hashes and current links into arrays (image reports only)"""
+    cursor = collection.find(
+        {"$or": [{"image_dhash": {"$ne": None}}, {"image_hash": {"$ne": None}}],
+         "media_type": {"$ne": "video"}},  # video fingerprints are not image dHashes
+        {"latitude": 1, "longitude": 1, "image_dhash": 1, "image_hash": 1,
+         "created_at": 1, "support_count": 1, "is_duplicate_of": 1,
+         "status": 1, "status_before_duplicate": 1}
+    )
+    docs, lats, lngs, hashes = [], [], [], []
+    for issue in cursor:
+        try:
+            lat = float(issue.get("latitude"))
+            lng = float(issue.get("longitude"))
+        except (TypeError, ValueError):
+            continue
+        packed = issue.get("image_dhash")
+        if packed is None:
+            packed = from_hex(issue.get("image_hash"))
+        if packed is None:
+            continue
+        docs.append(issue)
+        lats.append(lat)
+        lngs.append(lng)
+        hashes.append(to_signed64(packed))
+    return docs, np.array(lats), np.array(lngs), np.array(hashes, dtype=np.int64)
+
+
+def plan_corrections(docs, clusters):
+    """
+    Decide the original of each cluster and the field updates needed.
+
+    Returns:
+        list: (issue _id, {field: value}) for documents that change
+    """
+    updates = []
+    for members in clusters:
+        members = sorted(members, key=lambda i: (docs[i].get("created_at") or datetime.max, str(docs[i]["_id"])))
+        original = docs[members[0]]
+        original_id = str(original["_id"])
+
+        fields = {}
+        if original.get("is_duplicate_of"):
+            fields["is_duplicate_of"] = None
+        if original.get("status") == DUPLICATE_STATUS:
+            # Linked at report time there was no earlier status: treat as new
+            fields["status"] = original.get("status_before_duplicate") or DEFAULT_STATUS
+        if original.get("support_count", 1) != len(members):
+            fields["support_count"] = len(members)
+        if fields:
+            updates.append((original["_id"], fields))
+
+        for idx in members[1:]:
+            doc = docs[idx]
+            fields = {}
+            if doc.get("is_duplicate_of") != original_id:
+                fields["is_duplicate_of"] = original_id
+            if doc.get("status") != DUPLICATE_STATUS:
+                fields["status"] = DUPLICATE_STATUS
+                fields["status_before_duplicate"] = doc.get("status") or DEFAULT_STATUS
+            if doc.get("support_count", 1) != 1:
+                fields["support_count"] = 1
+            if fields:
+                updates.append((doc["_id"], fields))
+    return updates
+
+
+def run_clustering(collection=None, threshold=DEFAULT_THRESHOLD, geo_range=DEFAULT_GEO_RANGE,
+                   dry_run=False, batch_size=500):
+    """
+    Cluster the whole archive and write the corrections back.
+
+    Returns:
+        dict: Job statistics
+    """
+    from pymongo import UpdateOne
+    if collection is None:
+        from config import issues_collection as collection
+
+    t0 = time.perf_counter()
+    docs, lats, lngs, hashes = _load_archive(collection)
+    t1 = time.perf_counter()
+    pairs = find_duplicate_pairs(lats, lngs, hashes, threshold, geo_range)
+    clusters = build_clusters(len(docs), pairs)
+    updates = plan_corrections(docs, clusters)
+    t2 = time.perf_counter()
+
+    modified = 0
+    if not dry_run:
+        ops = [UpdateOne({"_id": _id}, {"$set": fields}) for _id, fields in updates]
+        for start in range(0, len(ops), batch_size):
+            modified += collection.bulk_write(ops[start:start + batch_size], ordered=False).modified_count
+
+    return {
+        "issues_scanned": len(docs),
+        "duplicate_pairs": int(len(pairs)),
+        "clusters": len(clusters),
+        "largest_cluster": max((len(c) for c in clusters), default=0),
+        "corrections": len(updates),
+        "modified": modified,
+        "dry_run": dry_run,
+        "load_seconds": round(t1 - t0, 3),
+        "cluster_seconds": round(t2 - t1, 3),
+        "write_seconds": round(time.perf_counter() - t2, 3),
+    }
+
+
+def _synthetic_archive(n, seed=7):
+    """Random city-sized archive with ~10% planted near-duplicates"""
+    rng = np.random.default_rng(seed)
+    lats = 12.9 + rng.random(n) * 0.2
+    lngs = 77.5 + rng.random(n) * 0.2
+    hashes = rng.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, n, dtype=np.int64)
+
+    dup = rng.choice(n, n // 10, replace=False)
+    src = rng.integers(0, n, len(dup))
+    lats[dup] = lats[src] + rng.normal(0, 0.00005, len(dup))
+    lngs[dup] = lngs[src] + rng.normal(0, 0.00005, len(dup))
+    flips = np.zeros(len(dup), dtype=np.int64)
+    for _ in range(4):  # up to 4 flipped bits
+        flips |= np.left_shift(np.int64(1), rng.integers(0, 63, len(dup)))
+    hashes[dup] = hashes[src] ^ flips
+    return lats, lngs, hashes
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-cluster near-duplicate issues across the archive")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD, help="Max Hamming distance (exclusive)")
+    parser.add_argument("--geo-range", type=float, default=DEFAULT_GEO_RANGE, help="Bounding box in degrees")
+    parser.add_argument("--dry-run", action="store_true", help="Report corrections without writing")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time pair finding on N synthetic issues (no DB)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        lats, lngs, hashes = _synthetic_archive(args.benchmark)
+        start = time.perf_counter()
+        pairs = find_duplicate_pairs(lats, lngs, hashes, args.threshold, args.geo_range)
+        clusters = build_clusters(len(hashes), pairs)
+        elapsed = time.perf_counter() - start
+        print(f"⏱️  {args.benchmark} issues: {len(pairs)} pairs, {len(clusters)} clusters in {elapsed:.2f}s")
+    else:
+        stats = run_clustering(threshold=args.threshold, geo_range=args.geo_range, dry_run=args.dry_run)
+        print(f"✅ Duplicate clustering finished: {stats}")
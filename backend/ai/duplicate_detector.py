@@ -1,52 +1,40 @@
-import cv2
 import numpy as np
 from datetime import datetime, timedelta
 from config import issues_collection
+from services.log import get_logger
+from ai.perceptual_hash import (
+    dhash, to_hex, from_hex, to_signed64, as_hash_array, hamming, hamming_many
+)
 
-def compute_dhash(image_path, hash_size=8):
+log = get_logger(__name__)
+
+def compute_dhash(image, hash_size=8):
     """
-    Compute the dHash (difference hash) of an image.
-    Resizes to (hash_size + 1, hash_size), converts to grayscale,
-    and compares adjacent pixels.
+    Compute the dHash (difference hash) of an image as a hex string
+    (legacy `image_hash` format). New code should use ai.perceptual_hash.dhash,
+    which returns the packed integer.
+    
+    Args:
+        image: File path or shared ImageContext
     """
-    try:
-        # Load image in grayscale
-        image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if image is None:
-            return None
-            
-        # Resize to (width, height) = (hash_size + 1, hash_size)
-        resized = cv2.resize(image, (hash_size + 1, hash_size))
-        
-        # Calculate difference between adjacent pixels
-        diff = resized[:, 1:] > resized[:, :-1]
-        
-        # Convert boolean array to hex string
-        # Pack bits into integer then hex
-        return hex(int("".join(["1" if b else "0" for b in diff.flatten()]), 2))[2:]
-    except Exception as e:
-        print(f"Error computing dHash: {e}")
-        return None
+    return to_hex(dhash(image, hash_size))
 
 def hamming_distance(hash1, hash2):
     """
-    Calculate Hamming distance between two hex strings.
+    Hamming distance between two hashes (hex strings or integers).
     """
-    if not hash1 or not hash2:
+    a = from_hex(hash1) if isinstance(hash1, str) else hash1
+    b = from_hex(hash2) if isinstance(hash2, str) else hash2
+    if a is None or b is None:
         return 999 # Max distance
-    
-    # Convert hex to integers
-    try:
-        n1 = int(hash1, 16)
-        n2 = int(hash2, 16)
-        
-        # XOR and count set bits
-        x = n1 ^ n2
-        return bin(x).count('1')
-    except:
-        return 999
+    return hamming(a, b)
+
+def _issue_hash(issue):
+    """Packed hash of a stored issue (falls back to the legacy hex field)"""
+    packed = issue.get("image_dhash")
+    return packed if packed is not None else from_hex(issue.get("image_hash"))
 
-def find_potential_duplicate(current_hash, lat, lng, threshold=15):
+def find_potential_duplicate(current_hash, lat, lng, threshold=15, media_type="image"):
     """
     Find if a similar issue exists near the location.
     
@@ -54,13 +42,17 @@ def find_potential_duplicate(current_hash, lat, lng, threshold=15):
     1. Within last 7 days.
     2. Within ~20 meters (approx 0.0002 degrees).
     3. Hamming distance < threshold.
+    4. Same media type (video fingerprints are only compared with videos).
     """
-    if not current_hash or not lat or not lng:
+    if current_hash is None or not lat or not lng:
         return None
         
     try:
         lat = float(lat)
         lng = float(lng)
+        query = from_hex(current_hash) if isinstance(current_hash, str) else current_hash
+        if query is None:
+            return None
         
         # 1. Time Filter: Last 7 days
         start_date = datetime.now() - timedelta(days=7)
@@ -74,24 +66,69 @@ def find_potential_duplicate(current_hash, lat, lng, threshold=15):
             "status": {"$ne": "Resolved"}, # Only match open issues
             "latitude": {"$ne": None},
             "longitude": {"$ne": None},
-            "image_hash": {"$exists": True} # Must have a hash
-        })
+            # Older image reports have no media_type
+            "media_type": "video" if media_type == "video" else {"$ne": "video"},
+            "$or": [{"image_dhash": {"$ne": None}}, {"image_hash": {"$ne": None}}] # Must have a hash
+        }, {"latitude": 1, "longitude": 1, "image_dhash": 1, "image_hash": 1})
         
+        ids, lats, lngs, hashes = [], [], [], []
         for issue in candidates:
-            # Check Geo manually (since we store strings, and simple float comp is strict)
+            # Coordinates are stored as strings, so the geo box is checked here
             try:
                 i_lat = float(issue.get("latitude"))
                 i_lng = float(issue.get("longitude"))
-                
-                if abs(lat - i_lat) < lat_range and abs(lng - i_lng) < lng_range:
-                    # Check Visual Similarity
-                    dist = hamming_distance(current_hash, issue.get("image_hash"))
-                    if dist < threshold:
-                        return issue # Return the full duplicate object
-            except:
+            except (TypeError, ValueError):
                 continue
-                
-        return None
+            packed = _issue_hash(issue)
+            if packed is None:
+                continue
+            ids.append(issue["_id"])
+            lats.append(i_lat)
+            lngs.append(i_lng)
+            hashes.append(packed)
+        
+        if not ids:
+            return None
+        
+        # 3. Geo box + visual similarity for all candidates at once
+        near = (np.abs(np.array(lats) - lat) < lat_range) & (np.abs(np.array(lngs) - lng) < lng_range)
+        distances = hamming_many(query, as_hash_array(hashes))
+        matches = np.flatnonzero(near & (distances < threshold))
+        if matches.size == 0:
+            return None
+        
+        # First match in collection order (same as the old linear scan)
+        return issues_collection.find_one({"_id": ids[matches[0]]}) # Return the full duplicate object
     except Exception as e:
-        print(f"Error finding duplicate: {e}")
+        log.error("Error finding duplicate", error=str(e))
         return None
+
+def backfill_packed_hashes(batch_size=500):
+    """
+    Add `image_dhash` (signed int64) to issues that only have the legacy
+    hex `image_hash`. Run from backend/: python -m ai.duplicate_detector
+
+    Returns:
+        int: Number of issues updated
+    """
+    from pymongo import UpdateOne
+
+    ops, updated = [], 0
+    cursor = issues_collection.find(
+        {"image_hash": {"$ne": None}, "image_dhash": {"$exists": False}},
+        {"image_hash": 1}
+    )
+    for issue in cursor:
+        packed = from_hex(issue.get("image_hash"))
+        if packed is None:
+            continue
+        ops.append(UpdateOne({"_id": issue["_id"]}, {"$set": {"image_dhash": to_signed64(packed)}}))
+        if len(ops) >= batch_size:
+            updated += issues_collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += issues_collection.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+if __name__ == "__main__":
+    print(f"✅ Backfilled image_dhash on {backfill_packed_hashes()} issues")
@@ -0,0 +1,309 @@
+"""
+Embedding Store for UrbanEye AI
+Cached MobileNetV2 features for incremental classifier retraining
+
+The classifier's MobileNetV2 base is frozen; only the small dense head is
+trained. So the 1280-d pooled embedding of an image never changes, and
+retraining only needs the embeddings, not the images. This module keeps
+them in an append-only, memory-mapped store keyed by the SHA-256 of the
+image bytes (the same `content_sha256` uploads are stored under):
+
+    ai/embeddings/vectors.npy   float16 [capacity, 1280]  (np.memmap)
+    ai/embeddings/keys.npy      S64     [capacity]        (sha256 hex)
+    ai/embeddings/meta.json     {"count", "dim", "backbone"}
+
+- verify_issue computes the embedding of a newly verified upload once
+  (index_issue_embedding) so it is ready for the next retrain.
+- train_classifier.py --embeddings fills in missing embeddings in one batch
+  and trains the head on the stored vectors in seconds.
+
+Appends take an inter-process file lock where fcntl exists; readers reload
+the key index when another process has appended.
+
+Embeddings come from the ONNX backbone (python -m ai.onnx_export --backbone)
+when it exists, otherwise from Keras MobileNetV2.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from services.metrics import metrics
+from services.storage import file_sha256
+from services.log import get_logger
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+log = get_logger(__name__)
+
+AI_DIR = os.path.dirname(__file__)
+STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", os.path.join(AI_DIR, "embeddings"))
+BACKBONE_ONNX_PATH = os.path.join(AI_DIR, "mobilenetv2_embedding.onnx")
+BACKBONE = "mobilenet_v2_imagenet_224_avg"
+EMBEDDING_DIM = 1280
+MIN_CAPACITY = 1024
+BATCH_SIZE = 32
+
+backbone = None
+
+
+class EmbeddingStore:
+    """Append-only sha256 -> float16 embedding store on memory-mapped .npy files"""
+
+    def __init__(self, root=STORE_DIR, dim=EMBEDDING_DIM):
+        self.root = root
+        self.dim = dim
+        self.vectors_path = os.path.join(root, "vectors.npy")
+        self.keys_path = os.path.join(root, "keys.npy")
+        self.meta_path = os.path.join(root, "meta.json")
+        self._lock = threading.Lock()
+        self._index = {}
+        self._count = 0
+        self._meta_mtime = None
+        self._vectors = None
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return {"count": 0, "dim": self.dim, "backbone": BACKBONE}
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def _refresh(self):
+        """Reload the key index if another process appended since last time"""
+        mtime = os.path.getmtime(self.meta_path) if os.path.exists(self.meta_path) else None
+        if mtime == self._meta_mtime:
+            return
+        meta = self._read_meta()
+        if meta.get("backbone", BACKBONE) != BACKBONE or meta.get("dim", self.dim) != self.dim:
+            raise RuntimeError(f"Embedding store {self.root} was built with a different backbone")
+        count = meta["count"]
+        if count:
+            keys = np.load(self.keys_path, mmap_mode="r")[:count]
+            self._index = {k.decode(): i for i, k in enumerate(keys.tolist())}
+            self._vectors = np.load(self.vectors_path, mmap_mode="r")
+        else:
+            self._index, self._vectors = {}, None
+        self._count = count
+        self._meta_mtime = mtime
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return self._count
+
+    def __contains__(self, sha256):
+        with self._lock:
+            self._refresh()
+            return sha256 in self._index
+
+    def get_many(self, keys):
+        """
+        Returns:
+            tuple: (float32 [len(keys), dim] matrix, bool mask of keys found)
+        """
+        with self._lock:
+            self._refresh()
+            rows = np.array([self._index.get(k, -1) for k in keys], dtype=np.int64)
+            found = rows >= 0
+            out = np.zeros((len(keys), self.dim), dtype=np.float32)
+            if found.any():
+                # Sorted fancy indexing reads the memmap sequentially
+                order = np.argsort(rows[found])
+                idx = rows[found][order]
+                target = np.flatnonzero(found)[order]
+                out[target] = self._vectors[idx].astype(np.float32)
+            return out, found
+
+    def get(self, key):
+        vectors, found = self.get_many([key])
+        return vectors[0] if found[0] else None
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _file_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        handle = open(os.path.join(self.root, ".lock"), "w")
+        if FCNTL_AVAILABLE:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _grow(self, needed, count):
+        """Make room for `needed` rows, doubling capacity (copy once per doubling)"""
+        capacity = 0
+        if os.path.exists(self.keys_path):
+            capacity = np.load(self.keys_path, mmap_mode="r").shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(MIN_CAPACITY, capacity * 2, needed)
+        for path, dtype, shape in (
+            (self.vectors_path, np.float16, (new_capacity, self.dim)),
+            (self.keys_path, "S64", (new_capacity,)),
+        ):
+            tmp = f"{path}.{os.getpid()}.tmp.npy"
+            grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+            if count:
+                grown[:count] = np.load(path, mmap_mode="r")[:count]
+            grown.flush()
+            del grown
+            os.replace(tmp, path)
+
+    def put_many(self, keys, vectors):
+        """
+        Append embeddings for keys not stored yet.
+
+        Returns:
+            int: Number of rows appended
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+        handle = self._file_lock()
+        try:
+            with self._lock:
+                self._meta_mtime = None  # always re-read under the file lock
+                self._refresh()
+                fresh, seen = [], set()
+                for i, key in enumerate(keys):
+                    if key not in self._index and key not in seen:
+                        fresh.append(i)
+                        seen.add(key)
+                if not fresh:
+                    return 0
+
+                count = self._count
+                self._grow(count + len(fresh), count)
+                stored = np.load(self.vectors_path, mmap_mode="r+")
+                stored_keys = np.load(self.keys_path, mmap_mode="r+")
+                stored[count:count + len(fresh)] = vectors[fresh].astype(np.float16)
+                stored_keys[count:count + len(fresh)] = [keys[i].encode() for i in fresh]
+                stored.flush()
+                stored_keys.flush()
+                del stored, stored_keys
+
+                # Publishing the new count makes the rows visible to readers
+                tmp = f"{self.meta_path}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump({"count": count + len(fresh), "dim": self.dim, "backbone": BACKBONE}, f)
+                os.replace(tmp, self.meta_path)
+                self._meta_mtime = None
+                return len(fresh)
+        finally:
+            handle.close()
+
+    def put(self, key, vector):
+        return self.put_many([key], [vector])
+
+
+# ----------------------------------------------------------------------
+# Feature extraction
+# ----------------------------------------------------------------------
+def _load_backbone():
+    """ONNX backbone if exported (no TensorFlow import), else Keras MobileNetV2"""
+    global backbone
+    if backbone is None:
+        if os.path.exists(BACKBONE_ONNX_PATH):
+            try:
+                from ai.image_classifier import OnnxClassifier
+                backbone = OnnxClassifier(BACKBONE_ONNX_PATH)
+                return backbone
+            except ImportError:
+                pass
+        from tensorflow.keras.applications import MobileNetV2
+        backbone = MobileNetV2(weights="imagenet", include_top=False, pooling="avg", input_shape=(224, 224, 3))
+    return backbone
+
+
+def compute_embeddings(images):
+    """
+    1280-d pooled MobileNetV2 features (same preprocessing as inference).
+
+    Args:
+        images: Paths or ImageContexts
+
+    Returns:
+        list: float32 vector or None (unreadable image) per input
+    """
+    from ai.image_classifier import _preprocess
+
+    arrays = [_preprocess(image) for image in images]
+    out = [None] * len(images)
+    valid = [i for i, arr in enumerate(arrays) if arr is not None]
+    model = _load_backbone()
+    for start in range(0, len(valid), BATCH_SIZE):
+        chunk = valid[start:start + BATCH_SIZE]
+        features = np.asarray(model.predict(np.stack([arrays[i] for i in chunk]).astype(np.float32), verbose=0))
+        for row, i in enumerate(chunk):
+            out[i] = features[row]
+    return out
+
+
+def compute_embedding(image):
+    return compute_embeddings([image])[0]
+
+
+def ensure_embeddings(paths, store=None, path_hashes=None):
+    """
+    Embeddings for image files, computing only the ones not stored yet.
+
+    Args:
+        paths: Image file paths
+        path_hashes: Optional {path: sha256} (skips re-hashing known files)
+
+    Returns:
+        tuple: (float32 [n, dim] matrix, bool mask of usable rows, sha256 list)
+    """
+    store = store or embedding_store
+    path_hashes = path_hashes or {}
+    keys = [path_hashes.get(p) or file_sha256(p) for p in paths]
+    vectors, found = store.get_many(keys)
+    metrics.inc("urbaneye_cache_requests_total", int(found.sum()), cache="embedding", result="hit")
+    metrics.inc("urbaneye_cache_requests_total", int((~found).sum()), cache="embedding", result="miss")
+
+    missing = np.flatnonzero(~found)
+    if missing.size:
+        log.info("Computing embeddings", missing=int(missing.size), cached=int(found.sum()))
+        computed = compute_embeddings([paths[i] for i in missing])
+        ok = [(i, v) for i, v in zip(missing, computed) if v is not None]
+        if ok:
+            store.put_many([keys[i] for i, _ in ok], [v for _, v in ok])
+            for i, v in ok:
+                vectors[i] = v
+                found[i] = True
+    return vectors, found, keys
+
+
+def index_issue_embedding(issue):
+    """
+    Store the embedding of a verified issue's upload (no-op if cached).
+    Meant to run off the request thread.
+    """
+    try:
+        if issue.get("media_type") not in (None, "image") or not issue.get("image_path"):
+            return False
+        from services.storage import storage
+        path = storage.local_path(issue["image_path"])
+        key = issue.get("content_sha256") or file_sha256(path)
+        if key in embedding_store:
+            return False
+        from ai.inference_service import run_inference
+        vector = run_inference("embedding", path)
+        if vector is None:
+            return False
+        embedding_store.put(key, vector)
+        log.info("Embedded verified issue", issue_id=str(issue["_id"]), store_size=len(embedding_store))
+        return True
+    except Exception as e:
+        log.warning("Embedding indexing failed", error=str(e))
+        return False
+
+
+# Global instance
+embedding_store = EmbeddingStore()
@@ -0,0 +1,357 @@
+"""
+Lightweight EXIF Reader for UrbanEye AI
+Header-only parser for the handful of tags the forensics checks need
+
+PIL's Image.open + getexif() builds a full image object and decodes every
+tag. Forensics only needs DateTimeOriginal, GPS, Make/Model and Software,
+so this module walks the container headers directly:
+
+- JPEG: markers from SOI up to the APP1 "Exif" segment (stops at SOS, so
+  the compressed image data is never read),
+- HEIC/HEIF/AVIF: the `meta` box (iinf + iloc) to locate the Exif item,
+  then reads just that extent,
+- WebP: the RIFF "EXIF" chunk, PNG: the "eXIf" chunk (chunk headers are
+  walked and image data is skipped, never read),
+
+and decodes only the wanted TIFF tags in one pass over IFD0, the Exif
+sub-IFD and the GPS sub-IFD. It works from the shared upload buffer
+(ImageContext.data) or reads a few KB from a file, which keeps it cheap
+enough for bulk re-audits of the whole archive.
+"""
+
+import math
+import os
+import struct
+
+# IFD0
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_SOFTWARE = 0x0131
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+# Exif sub-IFD
+TAG_DATETIME_ORIGINAL = 0x9003
+# GPS sub-IFD
+TAG_GPS_LAT_REF = 1
+TAG_GPS_LAT = 2
+TAG_GPS_LNG_REF = 3
+TAG_GPS_LNG = 4
+
+IFD0_TAGS = {TAG_MAKE: "make", TAG_MODEL: "model", TAG_SOFTWARE: "software", TAG_DATETIME: "datetime"}
+
+# TIFF field type -> size in bytes
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+MAX_SEGMENTS = 64          # markers inspected before giving up on a JPEG
+MAX_CHUNKS = 4096          # WebP/PNG chunks inspected (PNGs can have many IDATs)
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+MAX_META_BYTES = 1 << 20   # HEIC meta boxes are a few KB; refuse absurd sizes
+EARTH_RADIUS_M = 6371000.0
+HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1", b"avif"}
+
+
+# ----------------------------------------------------------------------
+# Container parsing: find the TIFF block
+# ----------------------------------------------------------------------
+class _Source:
+    """Random access over either a bytes buffer or an open file"""
+
+    def __init__(self, data=None, handle=None):
+        self.data = data
+        self.handle = handle
+
+    def read(self, offset, size):
+        if self.data is not None:
+            return bytes(self.data[offset:offset + size])
+        self.handle.seek(offset)
+        return self.handle.read(size)
+
+
+def _jpeg_exif(src):
+    """TIFF bytes from the APP1 Exif segment, None if absent"""
+    if src.read(0, 2) != b"\xff\xd8":
+        return None
+    pos = 2
+    for _ in range(MAX_SEGMENTS):
+        header = src.read(pos, 4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / start of scan: no more metadata
+            return None
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:  # standalone markers
+            pos += 2
+            continue
+        length = struct.unpack(">H", header[2:4])[0]
+        if marker == 0xE1:
+            payload = src.read(pos + 4, length - 2)
+            if payload.startswith(b"Exif\x00\x00"):
+                return payload[6:]
+        pos += 2 + length
+    return None
+
+
+def _strip_exif_header(payload):
+    """Some writers keep the JPEG APP1 "Exif" header inside WebP/PNG chunks"""
+    return payload[6:] if payload.startswith(b"Exif\x00\x00") else payload
+
+
+def _webp_exif(src):
+    """TIFF bytes from the RIFF EXIF chunk of a WebP file, None if absent"""
+    head = src.read(0, 12)
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+        return None
+    pos = 12
+    for _ in range(MAX_CHUNKS):
+        header = src.read(pos, 8)
+        if len(header) < 8:
+            return None
+        kind, size = header[:4], struct.unpack("<I", header[4:8])[0]
+        if kind == b"EXIF":
+            return _strip_exif_header(src.read(pos + 8, size))
+        pos += 8 + size + (size & 1)  # chunks are padded to even sizes
+    return None
+
+
+def _png_exif(src):
+    """TIFF bytes from the eXIf chunk of a PNG file, None if absent"""
+    if src.read(0, 8) != PNG_SIGNATURE:
+        return None
+    pos = 8
+    for _ in range(MAX_CHUNKS):
+        header = src.read(pos, 8)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack(">I4s", header)
+        if kind == b"eXIf":
+            return _strip_exif_header(src.read(pos + 8, size))
+        if kind == b"IEND":
+            return None
+        pos += 12 + size  # length + type + data + CRC
+    return None
+
+
+def _boxes(buf, start, end):
+    """(type, payload start, box end) of ISO-BMFF boxes in buf[start:end]"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", buf[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", buf[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _uint(buf, pos, size):
+    if size == 0:
+        return 0, pos
+    return int.from_bytes(buf[pos:pos + size], "big"), pos + size
+
+
+def _heif_exif(src):
+    """TIFF bytes of the Exif item of a HEIF/AVIF file, None if absent"""
+    head = src.read(0, 32)
+    if len(head) < 12 or head[4:8] != b"ftyp":
+        return None
+    ftyp_size = struct.unpack(">I", head[:4])[0]
+    brands = src.read(8, max(0, ftyp_size - 8))
+    if not any(brands[i:i + 4] in HEIF_BRANDS for i in range(0, len(brands), 4)):
+        return None
+
+    # Find the top-level meta box without reading mdat
+    pos, meta = ftyp_size, None
+    while True:
+        header = src.read(pos, 16)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack(">I4s", header[:8])
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+        if kind == b"meta":
+            if size > MAX_META_BYTES:
+                return None
+            meta = src.read(pos, size)
+            break
+        if size < 8:
+            return None
+        pos += size
+
+    # meta is a full box: skip 8-byte header + 4 bytes version/flags
+    exif_id, locations = None, {}
+    for kind, start, end in _boxes(meta, 12, len(meta)):
+        version = meta[start]
+        body = start + 4
+        if kind == b"iinf":
+            count_size = 2 if version == 0 else 4
+            for ekind, estart, eend in _boxes(meta, body + count_size, end):
+                if ekind != b"infe" or meta[estart] < 2:
+                    continue
+                id_size = 2 if meta[estart] == 2 else 4
+                item_id, p = _uint(meta, estart + 4, id_size)
+                if meta[p + 2:p + 6] == b"Exif":
+                    exif_id = item_id
+        elif kind == b"iloc":
+            offset_size, length_size = meta[body] >> 4, meta[body] & 0x0F
+            base_size = meta[body + 1] >> 4
+            index_size = meta[body + 1] & 0x0F if version in (1, 2) else 0
+            p = body + 2
+            count, p = _uint(meta, p, 2 if version < 2 else 4)
+            for _ in range(count):
+                item_id, p = _uint(meta, p, 2 if version < 2 else 4)
+                if version in (1, 2):
+                    p += 2  # construction_method
+                p += 2      # data_reference_index
+                base, p = _uint(meta, p, base_size)
+                extents, p = _uint(meta, p, 2)
+                first = None
+                for _ in range(extents):
+                    _, p = _uint(meta, p, index_size)
+                    offset, p = _uint(meta, p, offset_size)
+                    length, p = _uint(meta, p, length_size)
+                    first = first or (base + offset, length)
+                if first:
+                    locations[item_id] = first
+
+    if exif_id is None or exif_id not in locations:
+        return None
+    offset, length = locations[exif_id]
+    item = src.read(offset, length)
+    if len(item) < 4:
+        return None
+    # Item starts with a 4-byte offset to the TIFF header
+    tiff_start = 4 + struct.unpack(">I", item[:4])[0]
+    return item[tiff_start:]
+
+
+# ----------------------------------------------------------------------
+# TIFF / IFD decoding
+# ----------------------------------------------------------------------
+def _parse_ifd(tiff, offset, endian, wanted):
+    """{tag: value} for the wanted tags of one IFD"""
+    values = {}
+    if offset + 2 > len(tiff):
+        return values
+    count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, kind, n = struct.unpack(endian + "HHI", tiff[entry:entry + 8])
+        if tag not in wanted or kind not in TYPE_SIZES:
+            continue
+        size = TYPE_SIZES[kind] * n
+        if size <= 4:
+            raw = tiff[entry + 8:entry + 8 + size]
+        else:
+            ptr = struct.unpack(endian + "I", tiff[entry + 8:entry + 12])[0]
+            raw = tiff[ptr:ptr + size]
+            if len(raw) < size:
+                continue
+        if kind == 2:
+            values[tag] = raw.split(b"\x00", 1)[0].decode("utf-8", "replace").strip()
+        elif kind in (5, 10):
+            fmt = endian + ("I" if kind == 5 else "i") * (2 * n)
+            nums = struct.unpack(fmt, raw)
+            values[tag] = [nums[j] / nums[j + 1] if nums[j + 1] else 0.0 for j in range(0, len(nums), 2)]
+        elif kind in (3, 4, 9):
+            fmt = endian + {3: "H", 4: "I", 9: "i"}[kind] * n
+            nums = struct.unpack(fmt, raw)
+            values[tag] = nums[0] if n == 1 else list(nums)
+        else:
+            values[tag] = raw
+    return values
+
+
+def _coordinate(parts, ref):
+    if not isinstance(parts, list) or len(parts) != 3:
+        return None
+    value = parts[0] + parts[1] / 60.0 + parts[2] / 3600.0
+    return -value if ref in ("S", "W") else value
+
+
+def parse_tiff(tiff):
+    """
+    Decode the forensics tags from a TIFF/EXIF block.
+
+    Returns:
+        dict: datetime_original, datetime, make, model, software, gps ((lat, lng) or None)
+    """
+    result = {"datetime_original": None, "datetime": None, "make": None,
+              "model": None, "software": None, "gps": None}
+    if not tiff or len(tiff) < 8:
+        return result
+    endian = {b"II": "<", b"MM": ">"}.get(bytes(tiff[:2]))
+    if endian is None:
+        return result
+    ifd0 = struct.unpack(endian + "I", tiff[4:8])[0]
+
+    tags = _parse_ifd(tiff, ifd0, endian, set(IFD0_TAGS) | {TAG_EXIF_IFD, TAG_GPS_IFD})
+    for tag, name in IFD0_TAGS.items():
+        if isinstance(tags.get(tag), str) and tags[tag]:
+            result[name] = tags[tag]
+
+    if isinstance(tags.get(TAG_EXIF_IFD), int):
+        exif = _parse_ifd(tiff, tags[TAG_EXIF_IFD], endian, {TAG_DATETIME_ORIGINAL})
+        result["datetime_original"] = exif.get(TAG_DATETIME_ORIGINAL) or None
+
+    if isinstance(tags.get(TAG_GPS_IFD), int):
+        gps = _parse_ifd(tiff, tags[TAG_GPS_IFD], endian,
+                         {TAG_GPS_LAT_REF, TAG_GPS_LAT, TAG_GPS_LNG_REF, TAG_GPS_LNG})
+        lat = _coordinate(gps.get(TAG_GPS_LAT), gps.get(TAG_GPS_LAT_REF))
+        lng = _coordinate(gps.get(TAG_GPS_LNG), gps.get(TAG_GPS_LNG_REF))
+        # 0,0 is what many apps write when they have no fix
+        if lat is not None and lng is not None and abs(lat) <= 90 and abs(lng) <= 180 and (lat or lng):
+            result["gps"] = (round(lat, 7), round(lng, 7))
+    return result
+
+
+def _tiff_from(src):
+    return _jpeg_exif(src) or _heif_exif(src) or _webp_exif(src) or _png_exif(src)
+
+
+def read_exif(source):
+    """
+    Forensics tags of an image, reading headers only.
+
+    Args:
+        source: File path, bytes, or ImageContext (its buffer is used when loaded)
+
+    Returns:
+        dict: see parse_tiff (all None when there is no EXIF)
+    """
+    data, path = None, None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = source
+    elif isinstance(source, str):
+        path = source
+    else:  # ImageContext
+        data, path = getattr(source, "data", None), getattr(source, "path", None)
+
+    try:
+        if data is not None:
+            return parse_tiff(_tiff_from(_Source(data=memoryview(data))))
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                return parse_tiff(_tiff_from(_Source(handle=f)))
+    except (struct.error, ValueError, IndexError, OSError):
+        pass
+    return parse_tiff(None)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
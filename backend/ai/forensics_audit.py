@@ -0,0 +1,429 @@
+"""
+Archive-wide Forensics Re-audit for UrbanEye AI
+Re-runs the fraud checks over every stored image upload
+
+`forensics_data` is computed once, at report time, with whatever checks
+existed then. This batch job re-audits the whole archive so new checks
+reach old reports:
+
+1. EXIF age and GPS-vs-reported-location (ai.metadata_forensics), measured
+   against the report's `created_at` instead of "now".
+2. Error-level analysis (ELA) on JPEGs: a centre crop is re-encoded at a
+   known quality and the per-block error compared with the image's own
+   median; pasted regions saved at a different quality stand out.
+3. Reuse across reports: the same upload (content SHA-256, or identical
+   dHash for legacy rows) attached to reports far apart from the first one
+   that used it.
+
+Images are audited in a process pool (nice'd workers, so the API keeps its
+CPU) in `_id` order. Each batch is written with one bulk_write and then
+checkpointed to ai/forensics_audit.checkpoint.json, so an interrupted run
+resumes where it stopped; a run that reaches the end of the archive
+removes the checkpoint. Issues already audited with the current
+AUDIT_VERSION are skipped; bump it when a check is added or changed and
+re-run to audit the full archive again.
+
+Each issue gets:
+    forensics_audit: {version, audited_at, exif, ela, reuse, flags, verdict}
+    forensics_data:  refreshed EXIF result (left untouched if the file is gone)
+    content_sha256:  backfilled when missing
+
+An image that cannot be loaded (file gone, storage outage) only gets
+    forensics_audit_error: {audited_at, error}
+and keeps its previous forensics_audit, so the next run selects it again.
+
+Usage (from backend/):
+    python -m ai.forensics_audit --dry-run --limit 200
+    python -m ai.forensics_audit --workers 4 --report audit_report.json
+    python -m ai.forensics_audit --restart        # ignore the checkpoint
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from ai.exif_reader import haversine_m
+from ai.metadata_forensics import GPS_TOLERANCE_M
+
+# Bump when a check is added or its logic changes; older audits get redone
+AUDIT_VERSION = 1
+
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forensics_audit.checkpoint.json")
+DEFAULT_WORKERS = int(os.getenv("FORENSICS_AUDIT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+WORKER_NICENESS = 10
+
+# ELA: re-encode quality, block size and crop size (pixels)
+ELA_QUALITY = 90
+ELA_BLOCK = 16
+ELA_MAX_SIDE = 1024
+# p99.5 / median block error; ~p99 of genuine local uploads is 10
+ELA_RATIO_THRESHOLD = float(os.getenv("FORENSICS_ELA_RATIO", "12"))
+
+# dHashes that say nothing about content (flat / blank images)
+TRIVIAL_DHASHES = (0, -1)
+
+
+# ----------------------------------------------------------------------
+# Worker side (no database access)
+# ----------------------------------------------------------------------
+def _init_worker():
+    """Run workers at lower priority so API requests win the CPU"""
+    try:
+        os.nice(WORKER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def error_level_analysis(image, quality=ELA_QUALITY, block=ELA_BLOCK, max_side=ELA_MAX_SIDE):
+    """
+    Block-wise error level of a JPEG against a re-encode at `quality`.
+
+    Only a block-aligned centre crop (at most max_side per side) is
+    re-encoded; the crop keeps the 8x8 JPEG grid so the original blocks
+    line up with the re-encoded ones.
+
+    Args:
+        image: ImageContext (or path)
+
+    Returns:
+        dict: {"status": "Consistent" | "Inconsistent" | "Skipped",
+               "mean", "median", "p99", "ratio"}
+    """
+    import cv2
+    import numpy as np
+    from ai.image_context import ImageContext
+
+    ctx = ImageContext.ensure(image)
+    if ctx.data is not None and bytes(ctx.data[:2]) != b"\xff\xd8":
+        return {"status": "Skipped", "details": "Not a JPEG"}
+    bgr = ctx.bgr
+    if bgr is None:
+        return {"status": "Skipped", "details": "Could not decode image"}
+
+    h, w = bgr.shape[:2]
+    ch, cw = min(h, max_side) // block * block, min(w, max_side) // block * block
+    if ch < 4 * block or cw < 4 * block:
+        return {"status": "Skipped", "details": "Image too small"}
+    y, x = (h - ch) // 2 // 8 * 8, (w - cw) // 2 // 8 * 8
+    crop = np.ascontiguousarray(bgr[y:y + ch, x:x + cw])
+
+    ok, buf = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        return {"status": "Skipped", "details": "Re-encode failed"}
+    error = cv2.absdiff(crop, cv2.imdecode(buf, cv2.IMREAD_COLOR)).max(axis=2).astype(np.float32)
+    blocks = error.reshape(ch // block, block, cw // block, block).mean(axis=(1, 3))
+
+    median = float(np.median(blocks))
+    p99 = float(np.percentile(blocks, 99.5))
+    ratio = p99 / max(median, 0.5)  # floor: near-lossless images have ~0 median
+    return {
+        "status": "Inconsistent" if ratio > ELA_RATIO_THRESHOLD else "Consistent",
+        "mean": round(float(error.mean()), 3),
+        "median": round(median, 3),
+        "p99": round(p99, 3),
+        "ratio": round(ratio, 2),
+    }
+
+
+def audit_image(task):
+    """
+    Run the per-image checks for one issue (executes in a pool worker).
+
+    Args:
+        task: (issue id, image_path, latitude, longitude, created_at)
+
+    Returns:
+        dict: {"id", "exif", "ela", "sha256", "timings"} or {"id", "error"}
+    """
+    from ai.image_context import ImageContext
+    from ai.metadata_forensics import analyze_metadata
+    from services.storage import storage
+
+    issue_id, image_path, latitude, longitude, created_at = task
+    timings = {}
+    try:
+        t = time.perf_counter()
+        ctx = ImageContext.from_path(storage.local_path(image_path))
+        timings["read"] = time.perf_counter() - t
+    except Exception as e:
+        return {"id": issue_id, "error": f"Image unavailable: {e}"}
+
+    t = time.perf_counter()
+    exif = analyze_metadata(ctx, latitude, longitude, report_time=created_at)
+    timings["exif"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    try:
+        ela = error_level_analysis(ctx)
+    except Exception as e:
+        ela = {"status": "Skipped", "details": str(e)}
+    timings["ela"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    sha256 = hashlib.sha256(ctx.data).hexdigest()
+    timings["hash"] = time.perf_counter() - t
+    return {"id": issue_id, "exif": exif, "ela": ela, "sha256": sha256, "timings": timings}
+
+
+# ----------------------------------------------------------------------
+# Parent side
+# ----------------------------------------------------------------------
+def _coords(issue):
+    try:
+        return float(issue.get("latitude")), float(issue.get("longitude"))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_reuse_index(collection, query):
+    """
+    Group image reports that share an upload.
+
+    Members are keyed by content SHA-256, or by an exact non-trivial dHash
+    for rows stored before content hashing. Each group keeps its earliest
+    report as the original.
+
+    Returns:
+        dict: {issue _id: {"original", "count", "doc"}} for issues in a group
+    """
+    groups = {}
+    cursor = collection.find(query, {"content_sha256": 1, "image_dhash": 1, "latitude": 1,
+                                     "longitude": 1, "created_at": 1})
+    for issue in cursor:
+        if issue.get("content_sha256"):
+            key = ("sha", issue["content_sha256"])
+        elif issue.get("image_dhash") is not None and issue["image_dhash"] not in TRIVIAL_DHASHES:
+            key = ("dhash", issue["image_dhash"])
+        else:
+            continue
+        groups.setdefault(key, []).append(issue)
+
+    index = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda d: (d.get("created_at") or datetime.max, str(d["_id"])))
+        for doc in members:
+            index[doc["_id"]] = {"original": members[0], "count": len(members), "doc": doc}
+    return index
+
+
+def reuse_check(issue_id, reuse_index):
+    """Was this upload already used by a report somewhere else?"""
+    entry = reuse_index.get(issue_id)
+    if entry is None:
+        return {"status": "Unique", "count": 1}
+    original, doc = entry["original"], entry["doc"]
+    result = {"status": "Original" if original["_id"] == issue_id else "Repeated",
+              "count": entry["count"], "original_id": str(original["_id"])}
+    here, there = _coords(doc), _coords(original)
+    if result["status"] == "Repeated" and here and there:
+        distance = haversine_m(here[0], here[1], there[0], there[1])
+        result["distance_m"] = round(distance, 1)
+        # Same photo, same place: a duplicate report, not fraud
+        if distance > GPS_TOLERANCE_M:
+            result["status"] = "Reused"
+    return result
+
+
+def verdict_for(exif, ela, reuse):
+    """
+    Returns:
+        tuple: (flags list, "Suspicious" | "Review" | "Clean")
+    """
+    flags = []
+    status = exif.get("status")
+    details = exif.get("details") or ""
+    if status == "Stale":
+        flags.append("stale_capture")
+    if status == "Suspicious" and "Future timestamp" in details:
+        flags.append("future_timestamp")
+    if (exif.get("location_check") or {}).get("status") == "Mismatch":
+        flags.append("gps_mismatch")
+    if status == "Unknown" and exif.get("capture_time") is None:
+        flags.append("no_exif")
+    if "(edited with" in details:
+        flags.append("edited_software")
+    if ela.get("status") == "Inconsistent":
+        flags.append("ela_inconsistent")
+    if reuse.get("status") == "Reused":
+        flags.append("reused_image")
+
+    if {"future_timestamp", "gps_mismatch", "reused_image"} & set(flags):
+        verdict = "Suspicious"
+    elif {"stale_capture", "edited_software", "ela_inconsistent"} & set(flags):
+        verdict = "Review"
+    else:
+        verdict = "Clean"
+    return flags, verdict
+
+
+def read_checkpoint(path=CHECKPOINT_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    return state if state.get("version") == AUDIT_VERSION else None
+
+
+def write_checkpoint(last_id, stats, path=CHECKPOINT_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": AUDIT_VERSION, "last_id": str(last_id),
+                   "processed": stats["processed"], "updated_at": datetime.now().isoformat()}, f)
+    os.replace(tmp, path)
+
+
+def _batches(cursor, size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _plan_update(issue, result, reuse_index, audited_at):
+    """$set fields for one audited issue"""
+    if "error" in result:
+        # No version stamp: a transient failure must not count as audited
+        return {"forensics_audit_error": {"audited_at": audited_at, "error": result["error"]}}, "Unavailable"
+
+    exif, ela = result["exif"], result["ela"]
+    reuse = reuse_check(issue["_id"], reuse_index)
+    flags, verdict = verdict_for(exif, ela, reuse)
+
+    fields = {"forensics_audit": {
+        "version": AUDIT_VERSION, "audited_at": audited_at,
+        "exif": exif, "ela": ela, "reuse": reuse, "flags": flags, "verdict": verdict,
+    }}
+    if exif.get("status") != "Error":
+        fields["forensics_data"] = exif
+    if issue.get("forensics_audit_error"):
+        fields["forensics_audit_error"] = None
+    if result.get("sha256") and not issue.get("content_sha256"):
+        fields["content_sha256"] = result["sha256"]
+    return fields, verdict
+
+
+def run_audit(collection=None, workers=DEFAULT_WORKERS, batch_size=200, dry_run=False,
+              restart=False, limit=None, max_rate=None, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Audit every image issue not yet audited with AUDIT_VERSION.
+
+    Args:
+        workers: Pool size (keep below the core count on an API host)
+        batch_size: Issues per pool round, bulk_write and checkpoint
+        restart: Ignore the checkpoint and start from the first issue
+        limit: Stop after this many issues
+        max_rate: Upper bound on images/second (sleeps between batches)
+
+    Returns:
+        dict: Job statistics and throughput report
+    """
+    from pymongo import UpdateOne
+    if collection is None:
+        from config import issues_collection as collection
+
+    images = {"image_path": {"$ne": None}, "media_type": {"$nin": ["video", "text"]}}
+    query = dict(images, **{"forensics_audit.version": {"$ne": AUDIT_VERSION}})
+    checkpoint = None if restart else read_checkpoint(checkpoint_path)
+    if checkpoint:
+        from bson import ObjectId
+        query["_id"] = {"$gt": ObjectId(checkpoint["last_id"])}
+        print(f"↪️  Resuming after {checkpoint['last_id']} ({checkpoint['processed']} done earlier)")
+
+    t0 = time.perf_counter()
+    reuse_index = build_reuse_index(collection, images)
+    index_seconds = time.perf_counter() - t0
+
+    stats = {"processed": checkpoint["processed"] if checkpoint else 0, "audited": 0, "errors": 0,
+             "modified": 0, "verdicts": {}, "dry_run": dry_run}
+    timings = {"read": 0.0, "exif": 0.0, "ela": 0.0, "hash": 0.0, "write": 0.0}
+    cursor = collection.find(
+        query, {"image_path": 1, "latitude": 1, "longitude": 1, "created_at": 1, "content_sha256": 1,
+                "forensics_audit_error": 1}
+    ).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for batch in _batches(cursor, batch_size):
+            batch_start = time.perf_counter()
+            tasks = [(str(d["_id"]), d["image_path"], d.get("latitude"), d.get("longitude"),
+                      d.get("created_at")) for d in batch]
+            results = list(pool.map(audit_image, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+            audited_at = datetime.now()
+            ops = []
+            for issue, result in zip(batch, results):
+                fields, verdict = _plan_update(issue, result, reuse_index, audited_at)
+                ops.append(UpdateOne({"_id": issue["_id"]}, {"$set": fields}))
+                stats["verdicts"][verdict] = stats["verdicts"].get(verdict, 0) + 1
+                if "error" in result:
+                    stats["errors"] += 1
+                for name, seconds in result.get("timings", {}).items():
+                    timings[name] += seconds
+
+            t = time.perf_counter()
+            if not dry_run:
+                stats["modified"] += collection.bulk_write(ops, ordered=False).modified_count
+                write_checkpoint(batch[-1]["_id"], dict(stats, processed=stats["processed"] + len(batch)),
+                                 checkpoint_path)
+            timings["write"] += time.perf_counter() - t
+
+            stats["audited"] += len(batch)
+            stats["processed"] += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"🔎 {stats['audited']} audited ({stats['audited'] / elapsed:.1f} img/s), "
+                  f"verdicts {stats['verdicts']}")
+
+            if max_rate:
+                pause = len(batch) / max_rate - (time.perf_counter() - batch_start)
+                if pause > 0:
+                    time.sleep(pause)
+
+    # Whole archive done: the next run starts from the first issue again, so
+    # images that failed to load are retried
+    if not dry_run and not (limit and stats["audited"] >= limit) and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    elapsed = time.perf_counter() - start
+    audited = max(stats["audited"], 1)
+    stats.update({
+        "reuse_groups_indexed": len(reuse_index),
+        "index_seconds": round(index_seconds, 3),
+        "audit_seconds": round(elapsed, 3),
+        "images_per_second": round(stats["audited"] / elapsed, 2) if elapsed else 0.0,
+        # Worker-side time is summed across processes, so it can exceed wall time
+        "ms_per_image": {name: round(seconds * 1000 / audited, 2) for name, seconds in timings.items()},
+        "workers": workers,
+    })
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-run forensic checks over all stored image uploads")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Audit processes")
+    parser.add_argument("--batch-size", type=int, default=200, help="Issues per bulk_write / checkpoint")
+    parser.add_argument("--limit", type=int, help="Stop after N issues")
+    parser.add_argument("--max-rate", type=float, help="Max images per second")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Audit without writing results")
+    parser.add_argument("--report", help="Also write the throughput report to this JSON file")
+    args = parser.parse_args()
+
+    stats = run_audit(workers=args.workers, batch_size=args.batch_size, dry_run=args.dry_run,
+                      restart=args.restart, limit=args.limit, max_rate=args.max_rate)
+    print(f"✅ Forensics audit finished: {stats}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(stats, f, indent=2)
@@ -6,6 +6,10 @@ Google Gemini AI Chatbot Integration for UrbanEye
 import os
 import google.generativeai as genai
 from datetime import datetime
+from services.metrics import metrics
+from services.log import get_logger
+
+log = get_logger(__name__)
 
 class GeminiChatbot:
     """
@@ -17,13 +21,14 @@ class GeminiChatbot:
         # Configure Gemini
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
-            print("⚠️ GEMINI_API_KEY not found. Starting in OFFLINE MODE (Local Intelligence Only).")
+            log.warning("GEMINI_API_KEY not found, starting in offline mode (local intelligence only)")
             self.model = None
             self.conversations = None
             self.system_prompt = self._build_knowledge_base()
             return
         
-        genai.configure(api_key=api_key)
+        from ai.worker_runtime import configure_gemini
+        configure_gemini(api_key)
         
         # MongoDB for History (High Concurrency / Scaling)
         from config import db
@@ -40,21 +45,21 @@ class GeminiChatbot:
         self.model = None
         for model_name in models_to_try:
             try:
-                print(f"[INFO] Testing Gemini model: {model_name}...")
+                log.debug("Testing Gemini model", model=model_name)
                 test_model = genai.GenerativeModel(model_name)
                 
                 # Active validation REMOVED to prevent startup hangs
                 # response = test_model.generate_content("Hi") # BLOCKING
                 # Always assume success, handle errors in chat()
                 self.model = test_model
-                print(f"[INFO] Selected Gemini model (Lazy Init): {model_name}")
+                log.info("Selected Gemini model", model=model_name)
                 break
             except Exception as e:
-                print(f"[WARN] Model {model_name} failed: {e}")
+                log.warning("Gemini model failed", model=model_name, error=str(e))
         
         if not self.model:
              # Fallback if everything fails
-             print("[ERROR] All Gemini models failed. Defaulting to 'gemini-2.0-flash' as hail mary.")
+             log.error("All Gemini models failed, defaulting to gemini-2.0-flash")
              self.model = genai.GenerativeModel('gemini-2.0-flash')
         
         # No in-memory dict for workers
@@ -62,7 +67,7 @@ class GeminiChatbot:
         # Build knowledge base
         self.system_prompt = self._build_knowledge_base()
         
-        print("[INFO] Gemini AI chatbot enabled (FREE tier)")
+        log.info("Gemini chatbot enabled")
     
     def _build_knowledge_base(self):
         """Knowledge base about UrbanEye - "Trained" Data"""
@@ -93,13 +98,15 @@ UrbanEye is a cutting-edge civic reporting system that utilizes AI and Cloud Int
 - Maintain a persona that feels 'future-ready' and 'advanced'.
 """
     
-    def chat(self, user_id, message):
+    def chat(self, user_id, message, use_history=True):
         """
         Process user message with Gemini AI
         
         Args:
             user_id: User identifier
             message: User's message
+            use_history: False answers without the stored conversation (the
+                turn is still appended to it), for answers shared between users
             
         Returns:
             AI-generated response
@@ -111,7 +118,7 @@ UrbanEye is a cutting-edge civic reporting system that utilizes AI and Cloud Int
             chat_history = history_doc.get('history', [])
 
         # Step 2: Start chat with history
-        chat = self.model.start_chat(history=chat_history)
+        chat = self.model.start_chat(history=chat_history if use_history else [])
         
         try:
             # Create full prompt with context
@@ -139,14 +146,15 @@ Respond as the UrbanEye AI. Be accurate, helpful, and professional."""
             for attempt, model_obj in enumerate(models_to_try + [genai.GenerativeModel(m) for m in backup_names]):
                 try:
                     if attempt > 0:
-                        print(f"[INFO] 🔄 Switching to backup model #{attempt} due to quota/error...")
+                        log.warning("Switching to backup model", attempt=attempt)
                         
-                    print(f"[INFO] Gemini processing with {model_obj.model_name}...")
-                    response = chat.send_message(full_prompt)
+                    log.debug("Gemini request", model=model_obj.model_name)
+                    with metrics.llm_call("gemini", "chat"):
+                        response = chat.send_message(full_prompt)
                     
                     # Step 3: Save updated history to MongoDB
                     # chat.history contains the new turns
-                    serializable_history = []
+                    serializable_history = [] if use_history else list(chat_history)
                     for turn in chat.history:
                         serializable_history.append({
                             'role': turn.role,
@@ -162,12 +170,12 @@ Respond as the UrbanEye AI. Be accurate, helpful, and professional."""
                         upsert=True
                     )
 
-                    print(f"[INFO] Gemini replied: '{response.text[:80]}...'")
+                    log.debug("Gemini replied", model=model_obj.model_name, reply_chars=len(response.text))
                     return response.text.strip()
                     
                 except Exception as e:
                     error_str = str(e)
-                    print(f"[WARN] Model failed: {error_str}")
+                    log.warning("Gemini model failed", model=model_obj.model_name, error=error_str)
                     errors.append(error_str)
                     
                     # If it's NOT a quota error (429), maybe we shouldn't retry? 
@@ -179,17 +187,15 @@ Respond as the UrbanEye AI. Be accurate, helpful, and professional."""
             
             # If we get here, all models failed.
             # FINAL FALLBACK: Mock AI/Offline Mode (Satisfies "working without disturbance")
-            print(f"[WARN] All AI Models exhausted. Switching to Mock AI.")
-            
             # FINAL FALLBACK: Local Intelligence Engine (Simulates AI)
-            print(f"[WARN] All Cloud AI Models exhausted. Switching to Local Intelligence.")
+            log.warning("All cloud AI models exhausted, switching to local intelligence", errors=len(errors))
             return self._local_intelligence_response(message)
 
 
 
         except Exception as e:
             # Fallback for any other unhandled errors
-            print(f"[ERROR] Chatbot Fatal Error: {e}")
+            log.error("Chatbot fatal error", error=str(e))
             raise e
     
     def clear_conversation(self, user_id):
@@ -258,5 +264,5 @@ def init_gemini():
         gemini_chatbot = GeminiChatbot()
         return True
     except Exception as e:
-        print(f"⚠️ Could not initialize Gemini: {e}")
+        log.warning("Could not initialize Gemini", error=str(e))
         return False
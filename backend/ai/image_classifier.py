@@ -9,6 +9,12 @@ This module performs real-time inference using either:
 The classifier automatically uses the fine-tuned model if it exists,
 otherwise falls back to the pretrained model.
 
+Backends (CLASSIFIER_BACKEND=auto|onnx|keras):
+- onnx:  onnxruntime on the exported artifact (ai/onnx_export.py). No
+         TensorFlow import, so worker cold start and RSS stay small.
+- keras: TensorFlow/Keras (.h5 or pretrained MobileNetV2).
+"auto" uses ONNX when the artifact exists and is not older than the .h5.
+
 Two-Phase System:
 - Inference (this file): Real-time predictions on uploads
 - Training (train_model.py): Offline fine-tuning on verified data
@@ -26,9 +32,17 @@ import os
 # Paths
 LABELS_PATH = os.path.join(os.path.dirname(__file__), "labels.json")
 TRAINED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "urbaneye_finetuned_model.h5")
+ONNX_MODEL_PATH = os.getenv("CLASSIFIER_ONNX_PATH") or os.path.join(os.path.dirname(__file__), "urbaneye_finetuned_model.onnx")
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "auto").lower()
+ONNX_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
 
 import google.generativeai as genai
-from PIL import Image
+
+from ai.image_context import ImageContext
+from services.metrics import metrics
+from services.log import get_logger
+
+log = get_logger(__name__)
 
 # Load labels
 with open(LABELS_PATH) as f:
@@ -36,20 +50,21 @@ with open(LABELS_PATH) as f:
 
 model = None
 # Check if fine-tuned model exists (Lazy Check)
-USING_FINETUNED = os.path.exists(TRAINED_MODEL_PATH)
+USING_FINETUNED = os.path.exists(TRAINED_MODEL_PATH) or os.path.exists(ONNX_MODEL_PATH)
 
-def _classify_with_gemini(image_path):
+def _classify_with_gemini(image):
     """Universal Object Detection using Gemini Vision"""
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         return None
         
     try:
-        genai.configure(api_key=api_key)
+        from ai.worker_runtime import configure_gemini
+        configure_gemini(api_key)
         # Use flash for speed
         vision_model = genai.GenerativeModel('gemini-1.5-flash')
         
-        img = Image.open(image_path)
+        img = ImageContext.ensure(image).pil
         
         prompt = """
         Analyze this image for UrbanEye Civic Intelligence.
@@ -66,25 +81,27 @@ def _classify_with_gemini(image_path):
         }
         """
         
-        response = vision_model.generate_content([prompt, img])
+        with metrics.llm_call("gemini", "vision"):
+            response = vision_model.generate_content([prompt, img])
         # Clean response text (remove markdown if any)
         text = response.text.replace('```json', '').replace('```', '').strip()
         return json.loads(text)
     except Exception as e:
-        print(f"⚠️ Gemini Vision Error: {e}")
+        log.warning("Gemini vision error", error=str(e))
         return None
 
 
 
-def classify_issue(image_path):
+def classify_issue(image):
     """
     Classify ANYTHING using Super-Intelligent Vision.
     Falls back to local MobileNet if Gemini is offline.
+    `image` is a file path or a shared ImageContext.
     """
     # Step 1: Try Super-Intelligent Gemini Vision (Universal Detection)
-    gemini_result = _classify_with_gemini(image_path)
+    gemini_result = _classify_with_gemini(image)
     if gemini_result:
-        print(f"🌟 Super AI Detected: {gemini_result['detected_object']}")
+        log.info("Gemini vision detection", detected_object=gemini_result["detected_object"])
         return {
             "status": "confident",
             "detected_type": gemini_result['detected_object'],
@@ -93,26 +110,75 @@ def classify_issue(image_path):
             "description": gemini_result['brief_description']
         }
 
-    # Step 2: Fallback to Local Classifier
+    # Step 2: Fallback to Local Classifier (owned by the inference service)
+    from ai.inference_service import run_inference
+    return run_inference("classifier", image)
+
+
+class OnnxClassifier:
+    """onnxruntime session with the Keras predict() interface used below"""
+
+    def __init__(self, path):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = ONNX_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.path = path
+
+    def predict(self, batch, verbose=0):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+def _use_onnx():
+    """Whether the ONNX artifact should serve predictions"""
+    if CLASSIFIER_BACKEND == "keras" or not os.path.exists(ONNX_MODEL_PATH):
+        return False
+    if CLASSIFIER_BACKEND == "onnx":
+        return True
+    # auto: a retrained .h5 newer than the export means the artifact is stale
+    if os.path.exists(TRAINED_MODEL_PATH) and os.path.getmtime(TRAINED_MODEL_PATH) > os.path.getmtime(ONNX_MODEL_PATH):
+        log.warning("ONNX model is older than the .h5, run: python -m ai.onnx_export")
+        return False
+    return True
+
+
+def _load_onnx_model():
+    global model
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        log.warning("onnxruntime not installed, using TensorFlow backend")
+        return None
+    model = OnnxClassifier(ONNX_MODEL_PATH)
+    log.info("ONNX classifier loaded", model=os.path.basename(ONNX_MODEL_PATH))
+    return model
+
+
+def _load_local_model():
+    """
+    Lazy-load the local MobileNetV2 classifier (ONNX Runtime or Keras).
+    Returns None when neither backend is available.
+    """
     global model
+    if model is not None:
+        return model
+    if _use_onnx() and _load_onnx_model() is not None:
+        return model
     
     # Lazy Import TensorFlow
     try:
         from tensorflow.keras.models import load_model
-        from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input
+        from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
         from tensorflow.keras.models import Sequential
         from tensorflow.keras.layers import Dense, GlobalAveragePooling2D
-        from tensorflow.keras.preprocessing.image import img_to_array
-        TF_AVAILABLE = True
     except ImportError:
-        print("⚠️ TensorFlow not available. Using Mock Classifier.")
-        import random
-        choice = random.choice(list(LABELS.values()))
-        return choice
+        return None
 
     # Load Model if not loaded
     if model is None:
-        print("⚡ Lazy Loading Model...")
+        log.info("Loading classifier model")
         if os.path.exists(TRAINED_MODEL_PATH):
             model = load_model(TRAINED_MODEL_PATH)
         else:
@@ -124,75 +190,110 @@ def classify_issue(image_path):
                 Dense(128, activation="relu"),
                 Dense(len(LABELS), activation="softmax")
              ])
-        print("✅ Model Loaded.")
+        log.info("Classifier model loaded")
+    return model
 
-    try:
-        # Load image
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"⚠️ Could not load image: {image_path}")
-            return "unknown"
-        
-        # Resize to model input size
-        img = cv2.resize(img, (224, 224))
-        
-        # Convert BGR to RGB (OpenCV loads as BGR)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        # Normalize to [0, 1]
-        img = img / 255.0
-        
-        # Expand dimensions for batch processing
-        img = np.expand_dims(img, axis=0)
-        
-        # Get predictions
-        preds = model.predict(img, verbose=0)
-        # PRODUCTION AI RULE: Set confidence threshold
-        CONFIDENCE_THRESHOLD = 0.60  # 60% minimum for asserting classification
-        
-        # Make prediction
-        predictions = model.predict(img, verbose=0)
-        predicted_class_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_class_idx])
-        
-        # Get class label
-        class_label = LABELS[str(predicted_class_idx)]
-        
-        # HONEST AI: Check confidence threshold
-        if confidence < CONFIDENCE_THRESHOLD:
-            # Get top 3 predictions for user to choose from
-            # Ensure indices are valid for LABELS
-            top_3_indices = np.argsort(predictions[0])[-3:][::-1]
-            suggestions = [
-                {
-                    "type": LABELS[str(idx)],
-                    "confidence": round(float(predictions[0][idx]) * 100, 1)
-                }
-                for idx in top_3_indices if str(idx) in LABELS
-            ]
-            
-            print(f"⚠️  Low confidence ({confidence:.2%}) - Requesting user confirmation")
-            
-            return {
-                "status": "uncertain",
-                "primary_guess": class_label,
-                "confidence": round(confidence * 100, 1),
-                "requires_confirmation": True,
-                "explanation": f"Confidence ({confidence:.0%}) is below threshold ({CONFIDENCE_THRESHOLD:.0%}). The image may be ambiguous or have low visual clarity. Human confirmation requested.",
-                "suggestions": suggestions
+
+def _preprocess(image):
+    """Load an image as a normalised 224x224 RGB array (None if unreadable)"""
+    ctx = ImageContext.ensure(image)
+    
+    # Resize to model input size (cached on the shared context)
+    img = ctx.resized(224, 224)
+    if img is None:
+        log.warning("Could not load image", image=ctx.name)
+        return None
+    
+    # Convert BGR to RGB (OpenCV loads as BGR)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    
+    # Normalize to [0, 1]
+    return img / 255.0
+
+
+def _interpret(probs):
+    """Turn one row of softmax output into the classifier response"""
+    # PRODUCTION AI RULE: Set confidence threshold
+    CONFIDENCE_THRESHOLD = 0.60  # 60% minimum for asserting classification
+    
+    predicted_class_idx = np.argmax(probs)
+    confidence = float(probs[predicted_class_idx])
+    
+    # Get class label
+    class_label = LABELS[str(predicted_class_idx)]
+    
+    # HONEST AI: Check confidence threshold
+    if confidence < CONFIDENCE_THRESHOLD:
+        # Get top 3 predictions for user to choose from
+        # Ensure indices are valid for LABELS
+        top_3_indices = np.argsort(probs)[-3:][::-1]
+        suggestions = [
+            {
+                "type": LABELS[str(idx)],
+                "confidence": round(float(probs[idx]) * 100, 1)
             }
+            for idx in top_3_indices if str(idx) in LABELS
+        ]
         
-        # Confident prediction
-        model_type = "fine-tuned" if USING_FINETUNED else "pretrained"
-        print(f"✅ Classified as: {class_label} (confidence: {confidence:.2f}, model: {model_type})")
+        log.info("Low confidence, requesting user confirmation", confidence=round(confidence, 4))
         
         return {
-            "status": "confident",
-            "detected_type": class_label,
+            "status": "uncertain",
+            "primary_guess": class_label,
             "confidence": round(confidence * 100, 1),
-            "requires_confirmation": False
+            "requires_confirmation": True,
+            "explanation": f"Confidence ({confidence:.0%}) is below threshold ({CONFIDENCE_THRESHOLD:.0%}). The image may be ambiguous or have low visual clarity. Human confirmation requested.",
+            "suggestions": suggestions
         }
+    
+    # Confident prediction
+    model_type = "fine-tuned" if USING_FINETUNED else "pretrained"
+    log.info("Classified", label=class_label, confidence=round(confidence, 4), model=model_type)
+    
+    return {
+        "status": "confident",
+        "detected_type": class_label,
+        "confidence": round(confidence * 100, 1),
+        "requires_confirmation": False
+    }
+
+
+def classify_local(image):
+    """Classify one image with the local MobileNetV2 model"""
+    return classify_local_batch([image])[0]
+
+
+def classify_local_batch(images):
+    """
+    Classify several images with a single model.predict() call.
+    
+    Args:
+        images (list): File paths or ImageContexts
+    
+    Returns:
+        list: One classifier response per input (same order)
+    """
+    local_model = _load_local_model()
+    if local_model is None:
+        log.warning("TensorFlow not available, using mock classifier")
+        import random
+        return [random.choice(list(LABELS.values())) for _ in images]
+
+    try:
+        arrays = [_preprocess(image) for image in images]
+        valid = [i for i, arr in enumerate(arrays) if arr is not None]
+        results = ["unknown"] * len(images)
+        if not valid:
+            return results
+        
+        # One forward pass for the whole batch
+        batch = np.stack([arrays[i] for i in valid])
+        predictions = local_model.predict(batch, verbose=0)
+        
+        for row, i in enumerate(valid):
+            results[i] = _interpret(predictions[row])
+        return results
         
     except Exception as e:
-        print(f"❌ Error classifying image: {e}")
-        return {"status": "error", "message": str(e)}
+        log.error("Error classifying image", error=str(e))
+        return [{"status": "error", "message": str(e)} for _ in images]
@@ -0,0 +1,191 @@
+"""
+Shared Image Context for UrbanEye AI
+Decode an upload ONCE and share it across every pipeline stage
+
+A single report used to decode the same file five or six times
+(dHash, severity, YOLO, forensics, Gemini, MobileNet). ImageContext reads
+the raw bytes once and lazily derives - then caches - everything the stages
+need: the full-resolution BGR array, grayscale, a PIL image, the EXIF block
+and any number of downscaled variants.
+
+Every ai/ stage accepts either a file path (old behaviour) or a context:
+
+    ctx = ImageContext.from_path(image_path)
+    image_dhash = dhash(ctx)
+    severity = estimate_severity(ctx, issue_type)
+
+When a context is sent to another process (inference pool / sidecar) only
+the raw bytes travel; the receiving side decodes again once and caches there.
+"""
+
+import io
+import os
+import threading
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+# EXIF sub-IFD pointers
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+
+
+class ImageContext:
+    """Lazily decoded, cached view of a single uploaded image"""
+
+    def __init__(self, data=None, path=None, array=None):
+        self.path = path
+        self.data = data
+        # Re-entrant: derived views (gray, resized) build on other cached views
+        self._lock = threading.RLock()
+        self._cache = {}
+        if array is not None:
+            self._cache["bgr"] = array
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_path(cls, path):
+        with open(path, "rb") as f:
+            return cls(data=f.read(), path=path)
+
+    @classmethod
+    def from_array(cls, bgr, path=None):
+        """Wrap an already decoded BGR frame (e.g. a video keyframe)"""
+        return cls(path=path, array=bgr)
+
+    @staticmethod
+    def ensure(image):
+        """Accept a path or an ImageContext and always return a context"""
+        if isinstance(image, ImageContext):
+            return image
+        return ImageContext.from_path(image)
+
+    # ------------------------------------------------------------------
+    # Pickling: ship raw bytes only, never the decoded arrays
+    # ------------------------------------------------------------------
+    def __getstate__(self):
+        state = {"path": self.path, "data": self.data}
+        if self.data is None and "bgr" in self._cache:
+            state["array"] = self._cache["bgr"]
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(data=state.get("data"), path=state.get("path"), array=state.get("array"))
+
+    # ------------------------------------------------------------------
+    # Lazily derived views
+    # ------------------------------------------------------------------
+    def _cached(self, key, build):
+        value = self._cache.get(key)
+        if value is None and key not in self._cache:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = build()
+                value = self._cache[key]
+        return value
+
+    @property
+    def size_bytes(self):
+        if self.data is not None:
+            return len(self.data)
+        return os.path.getsize(self.path) if self.path else 0
+
+    @property
+    def name(self):
+        return self.path or "<memory>"
+
+    @property
+    def bgr(self):
+        """Full-resolution BGR array (None if the bytes are not an image)"""
+        def decode():
+            if not self.data:
+                return None
+            buf = np.frombuffer(self.data, dtype=np.uint8)
+            return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        return self._cached("bgr", decode)
+
+    @property
+    def gray(self):
+        def convert():
+            bgr = self.bgr
+            return None if bgr is None else cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        return self._cached("gray", convert)
+
+    @property
+    def shape(self):
+        bgr = self.bgr
+        return None if bgr is None else bgr.shape
+
+    @property
+    def pil(self):
+        """PIL image (for Gemini Vision and EXIF access)"""
+        def open_pil():
+            from PIL import Image
+            if self.data:
+                return Image.open(io.BytesIO(self.data))
+            bgr = self._cache.get("bgr")
+            if bgr is not None:
+                return Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+            return None
+        return self._cached("pil", open_pil)
+
+    @property
+    def exif(self):
+        """
+        Flat {tag_id: value} dict of IFD0 + Exif sub-IFD tags (empty if none).
+        GPS tags are available separately via gps_info.
+        """
+        def read_exif():
+            img = self.pil
+            if img is None:
+                return {}
+            exif = img.getexif()
+            tags = {k: v for k, v in exif.items() if k not in (EXIF_IFD, GPS_IFD)}
+            tags.update(exif.get_ifd(EXIF_IFD))
+            return tags
+        return self._cached("exif", read_exif)
+
+    @property
+    def gps_info(self):
+        def read_gps():
+            img = self.pil
+            return dict(img.getexif().get_ifd(GPS_IFD)) if img is not None else {}
+        return self._cached("gps", read_gps)
+
+    def resized(self, width, height, gray=False, interpolation=None):
+        """
+        Exact-size resize of the full image (cached per size/mode).
+        Default interpolation matches cv2.resize (INTER_LINEAR).
+        """
+        interpolation = cv2.INTER_LINEAR if interpolation is None else interpolation
+        key = ("resized", width, height, gray, interpolation)
+
+        def build():
+            src = self.gray if gray else self.bgr
+            return None if src is None else cv2.resize(src, (width, height), interpolation=interpolation)
+        return self._cached(key, build)
+
+    def downscaled(self, max_side, gray=False):
+        """
+        Aspect-preserving downscale so the longest side is <= max_side.
+        Images already smaller are returned as-is (never upscaled).
+        """
+        key = ("downscaled", max_side, gray)
+
+        def build():
+            src = self.gray if gray else self.bgr
+            if src is None:
+                return None
+            h, w = src.shape[:2]
+            scale = max_side / float(max(h, w))
+            if scale >= 1.0:
+                return src
+            size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+            return cv2.resize(src, size, interpolation=cv2.INTER_AREA)
+        return self._cached(key, build)
@@ -1,33 +1,327 @@
+"""
+Civic Impact Radius for UrbanEye AI
+Affected-population estimates from a local density raster
+
+The impact radius comes from the issue severity; the affected population is
+the number of people (or POIs) inside that circle, read from a density
+raster instead of a city-wide constant:
+
+    density.npy    float32 [rows, cols]  people per cell, north-up grid
+    density.json   {"north", "west", "cell_deg_lat", "cell_deg_lng", "units"}
+    density.sat.npy float64 [rows+1, cols+1]  summed-area table (built offline)
+
+Both arrays are memory-mapped, so a country-sized raster costs no RAM and
+only the touched pages are read. Any rectangle sum is 4 lookups in the
+summed-area table; the circle is covered by CIRCLE_BANDS horizontal bands
+(one rectangle each), so a query is O(1) regardless of radius. The mean
+density of those bands times the true circle area gives the estimate.
+
+The summed-area table is built offline with --build-table (about 2x the
+raster on disk); the web workers never build it. Without a raster
+(IMPACT_DENSITY_RASTER unset), with a missing or stale table, or outside
+the raster's extent the old flat urban density is used.
+
+Usage (from backend/):
+    python -m ai.impact_radius --synthetic ai/density.npy     # test raster + table
+    python -m ai.impact_radius --build-table                  # after replacing the raster
+    python -m ai.impact_radius --query 12.97 77.59 150
+    python -m ai.impact_radius --recompute [--dry-run]        # open issues
+"""
+
+import json
 import math
+import os
+import threading
+
+import numpy as np
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+DENSITY_RASTER_PATH = os.getenv("IMPACT_DENSITY_RASTER")
+# Fallback: approx 0.05 persons per sqm in urban areas
+DEFAULT_DENSITY = 0.05
+METERS_PER_DEG = 111320.0
+CIRCLE_BANDS = 8
+SAT_CHUNK_ROWS = 4096
+
+# Base radius based on severity
+SEVERITY_RADIUS = {
+    "Low": 50,      # 50 meters
+    "Medium": 150,  # 150 meters
+    "High": 300     # 300 meters
+}
+DEFAULT_RADIUS = 100
+
+_raster = None
+_raster_loaded = False  # one attempt per process, failures included
+_raster_lock = threading.Lock()
+
+
+def _sidecar(path, suffix):
+    return os.path.splitext(path)[0] + suffix
+
+
+def write_raster(path, counts, north, west, cell_deg_lat, cell_deg_lng=None, units="people"):
+    """Save a density raster (.npy + .json georeference)"""
+    np.save(path, np.asarray(counts, dtype=np.float32))
+    with open(_sidecar(path, ".json"), "w") as f:
+        json.dump({"north": north, "west": west, "cell_deg_lat": cell_deg_lat,
+                   "cell_deg_lng": cell_deg_lng or cell_deg_lat, "units": units}, f)
 
-def calculate_impact_radius(latitude, longitude, severity_score, db_context=None):
+
+def build_summed_area_table(counts, out_path, chunk_rows=SAT_CHUNK_ROWS):
+    """
+    Summed-area table S with S[r, c] = sum(counts[:r, :c]), written as a
+    memory-mapped .npy in row chunks (never holds the whole raster in RAM).
+    Negative values (nodata) count as zero.
+    """
+    rows, cols = counts.shape
+    tmp = f"{out_path}.{os.getpid()}.tmp.npy"
+    sat = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=(rows + 1, cols + 1))
+    sat[0, :] = 0.0
+    running = np.zeros(cols + 1, dtype=np.float64)
+    for start in range(0, rows, chunk_rows):
+        chunk = np.clip(np.asarray(counts[start:start + chunk_rows], dtype=np.float64), 0, None)
+        block = np.zeros((chunk.shape[0], cols + 1), dtype=np.float64)
+        np.cumsum(chunk, axis=1, out=block[:, 1:])
+        np.cumsum(block, axis=0, out=block)
+        block += running
+        sat[start + 1:start + 1 + chunk.shape[0]] = block
+        running = block[-1].copy()
+    sat[:, 0] = 0.0
+    sat.flush()
+    del sat
+    os.replace(tmp, out_path)
+
+
+class DensityRaster:
+    """Memory-mapped density grid with an O(1) circle-sum query"""
+
+    def __init__(self, path, build_table=False):
+        """
+        Args:
+            path: Density .npy (with .json sidecar)
+            build_table: Build the summed-area table if it is missing or
+                older than the raster (offline only); otherwise that raises
+        """
+        self.path = path
+        with open(_sidecar(path, ".json")) as f:
+            meta = json.load(f)
+        self.north = float(meta["north"])
+        self.west = float(meta["west"])
+        self.cell_lat = float(meta["cell_deg_lat"])
+        self.cell_lng = float(meta.get("cell_deg_lng") or meta["cell_deg_lat"])
+        self.units = meta.get("units", "people")
+        self.counts = np.load(path, mmap_mode="r")
+        self.rows, self.cols = self.counts.shape
+
+        sat_path = _sidecar(path, ".sat.npy")
+        if not os.path.exists(sat_path) or os.path.getmtime(sat_path) < os.path.getmtime(path):
+            if not build_table:
+                raise RuntimeError(f"Summed-area table {sat_path} is missing or stale "
+                                   f"(python -m ai.impact_radius --build-table)")
+            log.info("Building summed-area table", raster=path, rows=self.rows, cols=self.cols)
+            build_summed_area_table(self.counts, sat_path)
+        self.sat = np.load(sat_path, mmap_mode="r")
+
+    def _rect_sums(self, r0, r1, c0, c1):
+        """sum(counts[r0:r1, c0:c1]) for arrays of bounds"""
+        s = self.sat
+        return s[r1, c1] - s[r0, c1] - s[r1, c0] + s[r0, c0]
+
+    def population_many(self, lats, lngs, radii):
+        """
+        People inside each circle.
+
+        Args:
+            lats, lngs: Circle centres (degrees)
+            radii: Radii in metres
+
+        Returns:
+            tuple: (float array of estimates, bool mask of circles the raster covers)
+        """
+        lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+        lngs = np.asarray(lngs, dtype=np.float64).reshape(-1)
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), lats.shape)
+
+        r_deg_lat = radii / METERS_PER_DEG
+        r_deg_lng = radii / (METERS_PER_DEG * np.maximum(np.cos(np.radians(lats)), 1e-6))
+
+        # Band edges from the top of the circle, in units of the radius
+        edges = np.linspace(1.0, -1.0, CIRCLE_BANDS + 1)
+        centres = (edges[:-1] + edges[1:]) / 2
+        half_width = np.sqrt(1.0 - centres ** 2)
+
+        # [n, bands] fractional row / column bounds of every band rectangle
+        top = lats[:, None] + edges[None, :-1] * r_deg_lat[:, None]
+        bottom = lats[:, None] + edges[None, 1:] * r_deg_lat[:, None]
+        left = lngs[:, None] - half_width[None, :] * r_deg_lng[:, None]
+        right = lngs[:, None] + half_width[None, :] * r_deg_lng[:, None]
+
+        r0 = np.floor((self.north - top) / self.cell_lat)
+        r1 = np.floor((self.north - bottom) / self.cell_lat) + 1
+        c0 = np.floor((left - self.west) / self.cell_lng)
+        c1 = np.floor((right - self.west) / self.cell_lng) + 1
+        r0, r1 = np.clip(r0, 0, self.rows).astype(np.int64), np.clip(r1, 0, self.rows).astype(np.int64)
+        c0, c1 = np.clip(c0, 0, self.cols).astype(np.int64), np.clip(c1, 0, self.cols).astype(np.int64)
+
+        people = self._rect_sums(r0, r1, c0, c1).sum(axis=1)
+        cells = ((r1 - r0) * (c1 - c0)).sum(axis=1)
+
+        # Mean density over the covered cells times the true circle area
+        cell_area = (self.cell_lat * METERS_PER_DEG) * (self.cell_lng * METERS_PER_DEG * np.cos(np.radians(lats)))
+        covered = cells > 0
+        density = np.where(covered, people / np.maximum(cells * cell_area, 1e-9), 0.0)
+        return density * math.pi * radii ** 2, covered
+
+    def population(self, lat, lng, radius):
+        estimate, covered = self.population_many([lat], [lng], [radius])
+        return float(estimate[0]) if covered[0] else None
+
+
+def get_density_raster():
+    """
+    Configured raster, loaded once per process. None when not configured,
+    missing or without an up-to-date summed-area table; the failure is
+    cached, so reports use the default density without retrying.
+    """
+    global _raster, _raster_loaded
+    if not _raster_loaded and DENSITY_RASTER_PATH:
+        with _raster_lock:
+            if not _raster_loaded:
+                try:
+                    _raster = DensityRaster(DENSITY_RASTER_PATH)
+                except Exception as e:
+                    log.warning("Density raster unavailable, using the default density",
+                                raster=DENSITY_RASTER_PATH, error=str(e))
+                _raster_loaded = True
+    return _raster
+
+
+def calculate_impact_radius(latitude, longitude, severity_score, db_context=None, raster=None):
     """
     Calculate civic impact radius based on GPS data and issue severity.
-    
+
     Args:
         latitude (float): Latitude of the reported issue
         longitude (float): Longitude of the reported issue
         severity_score (str): 'Low', 'Medium', or 'High'
         db_context (dict): Optional DB objects for nearby issue lookup (for advanced logic)
-        
+        raster (DensityRaster): Density raster (default: IMPACT_DENSITY_RASTER)
+
     Returns:
-        dict: impact_radius (meters) and affected_population (estimate)
+        dict: impact_radius (meters), affected_population (estimate) and population_source
     """
-    # Base radius based on severity
-    severity_weights = {
-        "Low": 50,      # 50 meters
-        "Medium": 150,  # 150 meters
-        "High": 300     # 300 meters
-    }
-    
-    base_radius = severity_weights.get(severity_score, 100)
-    
-    # Simple affected population estimate (approx 0.05 persons per sqm in urban areas)
-    # Area = pi * r^2
-    area_sqm = math.pi * (base_radius ** 2)
-    population_estimate = int(area_sqm * 0.05)
-    
+    base_radius = SEVERITY_RADIUS.get(severity_score, DEFAULT_RADIUS)
+
+    raster = raster or get_density_raster()
+    population = None
+    if raster is not None:
+        try:
+            population = raster.population(float(latitude), float(longitude), base_radius)
+        except (TypeError, ValueError):
+            population = None
+
+    if population is None:
+        # Area = pi * r^2 at the flat urban density, truncated as before the raster existed
+        population = int(math.pi * (base_radius ** 2) * DEFAULT_DENSITY)
+        source = "default"
+    else:
+        population = int(round(population))
+        source = "raster"
+
     return {
         "impact_radius": base_radius,
-        "affected_population": population_estimate
+        "affected_population": population,
+        "population_source": source,
     }
+
+
+def recompute_open_issues(collection=None, raster=None, batch_size=500, dry_run=False):
+    """
+    Re-estimate affected_population for every open issue in one vectorised pass.
+
+    Returns:
+        dict: Job statistics
+    """
+    from pymongo import UpdateOne
+    if collection is None:
+        from config import issues_collection as collection
+    raster = raster or get_density_raster()
+    if raster is None:
+        raise RuntimeError("No usable density raster (set IMPACT_DENSITY_RASTER, then --build-table)")
+
+    docs, lats, lngs, radii = [], [], [], []
+    cursor = collection.find({"status": {"$ne": "Resolved"}},
+                             {"latitude": 1, "longitude": 1, "impact_radius": 1,
+                              "severity_label": 1, "affected_population": 1})
+    for issue in cursor:
+        try:
+            lat, lng = float(issue.get("latitude")), float(issue.get("longitude"))
+        except (TypeError, ValueError):
+            continue
+        docs.append(issue)
+        lats.append(lat)
+        lngs.append(lng)
+        radii.append(issue.get("impact_radius") or SEVERITY_RADIUS.get(issue.get("severity_label"), DEFAULT_RADIUS))
+
+    estimates, covered = raster.population_many(lats, lngs, radii) if docs else (np.array([]), np.array([], bool))
+    ops = []
+    for issue, radius, estimate, inside in zip(docs, radii, estimates, covered):
+        if not inside:
+            continue
+        population = int(round(float(estimate)))
+        if issue.get("affected_population") != population or issue.get("impact_radius") != radius:
+            ops.append(UpdateOne({"_id": issue["_id"]}, {"$set": {
+                "impact_radius": radius, "affected_population": population, "population_source": "raster"}}))
+
+    modified = 0
+    if not dry_run:
+        for start in range(0, len(ops), batch_size):
+            modified += collection.bulk_write(ops[start:start + batch_size], ordered=False).modified_count
+    return {"open_issues": len(docs), "inside_raster": int(np.count_nonzero(covered)),
+            "changed": len(ops), "modified": modified, "dry_run": dry_run}
+
+
+def synthetic_raster(path, north=13.1, west=77.45, size=2000, cell_deg=0.0009, seed=7):
+    """
+    Write a test raster: a few Gaussian urban centres over a rural floor
+    (~100 m cells, people per cell).
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32)
+    counts = np.full((size, size), 0.5, dtype=np.float32)
+    for _ in range(5):
+        cy, cx = rng.uniform(0.2, 0.8, 2) * size
+        spread = rng.uniform(0.03, 0.12) * size
+        counts += rng.uniform(200, 800) * np.exp(-((y - cy) ** 2 + (x - cx) ** 2) / (2 * spread ** 2))
+    write_raster(path, counts, north, west, cell_deg)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Density-raster impact estimates")
+    parser.add_argument("--raster", default=DENSITY_RASTER_PATH, help="Density .npy (with .json sidecar)")
+    parser.add_argument("--synthetic", metavar="PATH", help="Write a synthetic test raster to PATH")
+    parser.add_argument("--build-table", action="store_true", help="(Re)build the summed-area table if stale")
+    parser.add_argument("--query", nargs=3, type=float, metavar=("LAT", "LNG", "RADIUS_M"))
+    parser.add_argument("--recompute", action="store_true", help="Re-estimate all open issues")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        synthetic_raster(args.synthetic)
+        print(f"✅ Synthetic raster written to {args.synthetic}")
+        args.raster = args.raster or args.synthetic
+    raster = DensityRaster(args.raster, build_table=args.build_table or bool(args.synthetic)) if args.raster else None
+    if args.build_table and raster:
+        print(f"✅ Summed-area table ready for {args.raster}")
+    if args.query:
+        lat, lng, radius = args.query
+        print(f"👥 ~{raster.population(lat, lng, radius) if raster else None} people within {radius:.0f} m")
+    if args.recompute:
+        print(f"✅ Impact recompute finished: {recompute_open_issues(raster=raster, dry_run=args.dry_run)}")
@@ -0,0 +1,395 @@
+"""
+Inference Service for UrbanEye AI
+Runs the CPU-heavy OpenCV / TensorFlow / YOLO stages away from web workers
+
+Stages:
+    dhash       - ai.perceptual_hash.dhash (packed 64-bit int)
+    severity    - ai.severity_model.estimate_severity
+    yolo        - ai.yolo_detector.detect_issue (batched predict)
+    classifier  - ai.image_classifier.classify_local (batched predict)
+    video       - ai.video_analyzer.analyze_video (keyframes, one batched predict)
+    embedding   - ai.embedding_store.compute_embedding (batched MobileNetV2 features)
+    volume      - ai.volumetric_analyzer.analyze_volume (pothole depth map + volume)
+
+Backends (picked automatically, see get_inference_service()):
+    inline   - call the stage in the request thread (default, no extra RAM)
+    pool     - local process pool (INFERENCE_POOL_WORKERS > 0). Models live
+               in the pool process, not in the web worker.
+    sidecar  - one shared service reached over a Unix socket
+               (INFERENCE_SOCKET). All gunicorn workers share ONE copy of
+               each model. Start it with:
+                   python ai/inference_service.py --serve
+
+Concurrent requests for the same stage are collected for up to
+INFERENCE_BATCH_WINDOW_MS and shipped to the pool as one batch, so the
+classifier runs a single model.predict() for the whole batch.
+
+Usage:
+    from ai.inference_service import run_inference
+    image_dhash = run_inference("dhash", image_ctx)
+
+Stages take a path or an ai.image_context.ImageContext; a context crosses
+the process boundary as raw bytes only.
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import importlib
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+# Add backend to path so the sidecar / pool processes can import AI modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from services.log import get_logger, log_context
+
+log = get_logger(__name__)
+
+INFERENCE_POOL_WORKERS = int(os.getenv("INFERENCE_POOL_WORKERS", "0"))
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "urbaneye-inference").encode()
+BATCH_WINDOW_MS = int(os.getenv("INFERENCE_BATCH_WINDOW_MS", "15"))
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH", "8"))
+# Upper bound on one run(): a request never waits forever on a lost batch
+INFERENCE_TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "120"))
+
+# stage -> (module, single-item function, optional batch function)
+STAGES = {
+    "dhash": ("ai.perceptual_hash", "dhash", None),
+    "severity": ("ai.severity_model", "estimate_severity", None),
+    "yolo": ("ai.yolo_detector", "detect_issue", "detect_issues_batch"),
+    "classifier": ("ai.image_classifier", "classify_local", "classify_local_batch"),
+    "video": ("ai.video_analyzer", "analyze_video", None),
+    "embedding": ("ai.embedding_store", "compute_embedding", "compute_embeddings"),
+    "volume": ("ai.volumetric_analyzer", "analyze_volume", None),
+}
+
+
+def _resolve(stage, batch=False):
+    module_name, single_fn, batch_fn = STAGES[stage]
+    module = importlib.import_module(module_name)
+    if batch:
+        return getattr(module, batch_fn) if batch_fn else None
+    return getattr(module, single_fn)
+
+
+def _run_batch(stage, jobs):
+    """
+    Executed inside the pool process. Models stay loaded between batches
+    because the stage modules cache them at module level.
+
+    Returns:
+        list: ("ok", result) or ("error", message) per job
+    """
+    batch_fn = _resolve(stage, batch=True)
+    if batch_fn and all(len(args) == 1 for args in jobs):
+        try:
+            return [("ok", r) for r in batch_fn([args[0] for args in jobs])]
+        except Exception as e:
+            return [("error", str(e))] * len(jobs)
+
+    fn = _resolve(stage)
+    results = []
+    for args in jobs:
+        try:
+            results.append(("ok", fn(*args)))
+        except Exception as e:
+            results.append(("error", str(e)))
+    return results
+
+
+class StageStats:
+    """Queue depth and latency counters for one stage"""
+
+    def __init__(self):
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.batches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def as_dict(self):
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "errors": self.errors,
+            "batches": self.batches,
+            "avg_batch_size": round(self.completed / self.batches, 2) if self.batches else 0,
+            "avg_latency_ms": round(self.total_latency / self.completed * 1000, 1) if self.completed else 0,
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+        }
+
+
+class InferenceService:
+    """
+    Micro-batching front-end for a process pool.
+
+    One dispatcher thread per stage drains its queue, waits up to the batch
+    window for more work, and submits the batch to the pool. If a pool
+    process dies the pool is broken for good: the affected batches fail and
+    the pool is replaced, so later requests work again.
+    """
+
+    def __init__(self, workers=1, batch_window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE,
+                 timeout=INFERENCE_TIMEOUT_S):
+        self.backend = "pool"
+        self.workers = workers
+        self.pool = self._new_pool()
+        self.pool_restarts = 0
+        self.window = batch_window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._queues = {stage: queue.Queue() for stage in STAGES}
+        self._stats = {stage: StageStats() for stage in STAGES}
+        for stage in STAGES:
+            threading.Thread(target=self._dispatch, args=(stage,), daemon=True).start()
+        log.info("Inference pool ready", workers=workers, batch_window_ms=batch_window_ms)
+
+    def submit(self, stage, *args):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown inference stage: {stage}")
+        future = Future()
+        with self._lock:
+            self._stats[stage].queued += 1
+        self._queues[stage].put((args, future, time.perf_counter()))
+        return future
+
+    def run(self, stage, *args):
+        try:
+            return self.submit(stage, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise RuntimeError(f"{stage} inference timed out after {self.timeout:.0f}s") from None
+
+    def _new_pool(self):
+        import multiprocessing
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_pool(self, broken):
+        """Swap in a fresh pool unless another thread already did"""
+        with self._lock:
+            if self.pool is not broken:
+                return
+            self.pool = self._new_pool()
+            self.pool_restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        log.warning("Inference pool replaced after a worker crash", restarts=self.pool_restarts)
+
+    def _dispatch(self, stage):
+        q = self._queues[stage]
+        while True:
+            batch = [q.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stats = self._stats[stage]
+            with self._lock:
+                stats.queued -= len(batch)
+                stats.in_flight += len(batch)
+                stats.batches += 1
+
+            pool = self.pool
+            try:
+                pool_future = pool.submit(_run_batch, stage, [args for args, _, _ in batch])
+            except Exception as e:  # BrokenProcessPool: a worker died earlier
+                log.error("Inference pool unavailable", stage=stage, error=str(e))
+                self._finish(stage, batch, [("error", str(e))] * len(batch))
+                self._replace_pool(pool)
+                continue
+            pool_future.add_done_callback(lambda f, b=batch, s=stage, p=pool: self._complete(s, b, f, p))
+
+    def _complete(self, stage, batch, pool_future, pool):
+        try:
+            outcomes = pool_future.result()
+        except Exception as e:  # pool process crashed
+            outcomes = [("error", str(e))] * len(batch)
+            if isinstance(e, BrokenProcessPool):
+                self._replace_pool(pool)
+        self._finish(stage, batch, outcomes)
+
+    def _finish(self, stage, batch, outcomes):
+        now = time.perf_counter()
+        stats = self._stats[stage]
+        with self._lock:
+            stats.in_flight -= len(batch)
+            for (_, _, submitted), (status, _) in zip(batch, outcomes):
+                latency = now - submitted
+                stats.completed += 1
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+                if status == "error":
+                    stats.errors += 1
+
+        for (_, future, _), (status, value) in zip(batch, outcomes):
+            if status == "ok":
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(f"{stage} inference failed: {value}"))
+
+    def stats(self):
+        with self._lock:
+            return {stage: s.as_dict() for stage, s in self._stats.items()}
+
+
+class InlineInferenceService:
+    """Runs stages in the caller (sync profile default)"""
+
+    backend = "inline"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {stage: StageStats() for stage in STAGES}
+
+    def run(self, stage, *args):
+        from ai.worker_runtime import run_cpu
+        stats = self._stats[stage]
+        with self._lock:
+            stats.in_flight += 1
+        start = time.perf_counter()
+        error = False
+        try:
+            return run_cpu(_resolve(stage), *args)
+        except Exception:
+            error = True
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                stats.in_flight -= 1
+                stats.completed += 1
+                stats.batches += 1
+                stats.errors += int(error)
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+
+    def stats(self):
+        with self._lock:
+            return {stage: s.as_dict() for stage, s in self._stats.items()}
+
+
+class SidecarClient:
+    """Proxy to the shared sidecar service over a Unix socket"""
+
+    backend = "sidecar"
+
+    def __init__(self, address):
+        self.address = address
+        self._local = threading.local()
+
+    def _proxy(self):
+        # Manager connections are not shared between threads
+        if not hasattr(self._local, "service"):
+            manager = _make_manager(self.address)
+            manager.connect()
+            self._local.service = manager.get_service()
+        return self._local.service
+
+    def run(self, stage, *args):
+        from ai.worker_runtime import run_cpu
+        return run_cpu(lambda: self._proxy().run(stage, *args))
+
+    def stats(self):
+        return self._proxy().stats()
+
+
+def _make_manager(address):
+    from multiprocessing.managers import BaseManager
+
+    class InferenceManager(BaseManager):
+        pass
+
+    InferenceManager.register("get_service", callable=_sidecar_service, exposed=("run", "stats"))
+    return InferenceManager(address=address, authkey=INFERENCE_AUTHKEY)
+
+
+_sidecar_instance = None
+
+
+def _sidecar_service():
+    return _sidecar_instance
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_inference_service():
+    """Return the process-wide inference service for this worker"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                from ai.worker_runtime import is_cooperative
+                if INFERENCE_SOCKET and os.path.exists(INFERENCE_SOCKET):
+                    _service = SidecarClient(INFERENCE_SOCKET)
+                    log.info("Using inference sidecar", socket=INFERENCE_SOCKET)
+                elif INFERENCE_POOL_WORKERS > 0 and not is_cooperative():
+                    _service = InferenceService(workers=INFERENCE_POOL_WORKERS)
+                else:
+                    # gevent workers can't host the pool's helper threads;
+                    # they reach shared models through the sidecar instead.
+                    _service = InlineInferenceService()
+    return _service
+
+
+def run_inference(stage, *args):
+    """Run an inference stage on the configured backend (blocking)"""
+    from services.metrics import metrics
+    from services.tracing import tracer
+    service = get_inference_service()
+    with log_context(stage=stage), tracer.span(stage, kind="inference", backend=service.backend), \
+            metrics.timer("urbaneye_ai_stage_seconds", stage=stage, backend=service.backend):
+        return service.run(stage, *args)
+
+
+def get_inference_stats():
+    service = get_inference_service()
+    stats = {"backend": service.backend, "stages": service.stats()}
+    if isinstance(service, InferenceService):
+        stats["pool_restarts"] = service.pool_restarts
+    return stats
+
+
+def serve(address, workers):
+    """Run the shared inference sidecar until interrupted"""
+    global _sidecar_instance
+    if os.path.exists(address):
+        os.remove(address)
+
+    _sidecar_instance = InferenceService(workers=workers)
+    manager = _make_manager(address)
+    server = manager.get_server()
+    print(f"🚀 UrbanEye Inference Sidecar listening on {address}")
+    print("Press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Inference sidecar stopped.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="UrbanEye shared inference sidecar")
+    parser.add_argument("--serve", action="store_true", help="Start the sidecar server")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET or "/tmp/urbaneye-inference.sock")
+    parser.add_argument("--workers", type=int, default=max(INFERENCE_POOL_WORKERS, 1))
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.socket, args.workers)
+    else:
+        parser.print_help()
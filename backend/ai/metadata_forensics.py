@@ -1,110 +1,145 @@
-from PIL import Image, ExifTags
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 
-def analyze_metadata(image_path):
+from ai.exif_reader import read_exif, haversine_m
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+# EXIF GPS further than this from the submitted location is a mismatch
+GPS_TOLERANCE_M = float(os.getenv("FORENSICS_GPS_TOLERANCE_M", "500"))
+
+# Editors that leave their name in the Software tag
+EDITING_SOFTWARE = ("photoshop", "gimp", "lightroom", "snapseed", "picsart", "canva", "pixlr")
+
+
+def _time_check(date_taken_str, report_time):
+    """Fresh / Stale / Suspicious / Unknown from DateTimeOriginal"""
+    if not date_taken_str:
+        return {
+            "status": "Unknown",
+            "capture_time": None,
+            "report_time": report_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "age_hours": None,
+            "details": "No 'Date Taken' timestamp in metadata"
+        }
+
+    # Parse Date (Format: YYYY:MM:DD HH:MM:SS)
+    try:
+        capture_time = datetime.strptime(date_taken_str[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return {
+            "status": "Unknown",
+            "capture_time": date_taken_str,
+            "report_time": report_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "age_hours": None,
+            "details": "Unrecognized date format in metadata"
+        }
+
+    # Calculate Age
+    age_hours = (report_time - capture_time).total_seconds() / 3600
+    result = {
+        "capture_time": str(capture_time),
+        "report_time": str(report_time),
+        "age_hours": round(age_hours, 1),
+    }
+
+    # Fraud Logic: If photo is older than 24 hours
+    if age_hours > 24:
+        result.update(status="Stale", details=f"Photo is {round(age_hours, 1)} hours old (>24h limit)")
+    # If capture time is effectively in the future (permitting small clock skew)
+    elif age_hours < -1:
+        result.update(status="Suspicious", details="Future timestamp detected (Clock manipulation?)")
+    else:
+        result.update(status="Fresh", details="Verified recent capture")
+    return result
+
+
+def _location_check(gps, latitude, longitude):
+    """Compare EXIF GPS with the location submitted with the report"""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        latitude = longitude = None
+    if gps is None or latitude is None:
+        return {"status": "Unavailable", "exif_gps": list(gps) if gps else None, "distance_m": None}
+
+    distance = haversine_m(gps[0], gps[1], latitude, longitude)
+    return {
+        "status": "Mismatch" if distance > GPS_TOLERANCE_M else "Match",
+        "exif_gps": list(gps),
+        "distance_m": round(distance, 1),
+    }
+
+
+def analyze_metadata(image, latitude=None, longitude=None, report_time=None):
     """
-    Extract EXIF metadata to determine if an image is 'Fresh' or 'Stale'.
-    
+    Extract EXIF metadata to determine if an image is 'Fresh' or 'Stale' and
+    whether it was taken where the report says.
+    `image` is a file path or a shared ImageContext (its buffer is reused);
+    only the EXIF header is parsed, never the image data.
+
+    Args:
+        latitude, longitude: Location submitted with the report (optional)
+        report_time: Time to measure photo age against (default: now)
+
     Returns:
         dict: {
-            "status": "Fresh" | "Stale" | "Unknown",
+            "status": "Fresh" | "Stale" | "Suspicious" | "Unknown" | "Error",
             "capture_time": str | None,
             "report_time": str,
             "age_hours": float | None,
-            "details": str
+            "details": str,
+            "camera": str | None,
+            "software": str | None,
+            "location_check": {"status": "Match" | "Mismatch" | "Unavailable", ...}
         }
     """
     try:
-        report_time = datetime.now()
-        
-        if not os.path.exists(image_path):
-             return {
-                "status": "Error",
-                "details": "Image file not found on server"
-            }
-            
-        if os.path.getsize(image_path) == 0:
-             return {
-                "status": "Error",
-                "details": "Uploaded file is empty (0 bytes)"
-            }
+        report_time = report_time or datetime.now()
+
+        if isinstance(image, str):
+            if not os.path.exists(image):
+                return {"status": "Error", "details": "Image file not found on server"}
+            if os.path.getsize(image) == 0:
+                return {"status": "Error", "details": "Uploaded file is empty (0 bytes)"}
+        elif image.data is not None and len(image.data) == 0:
+            return {"status": "Error", "details": "Uploaded file is empty (0 bytes)"}
 
-        img = Image.open(image_path)
-        exif_data = img._getexif()
-        
-        if not exif_data:
-            return {
+        tags = read_exif(image)
+        has_exif = any(tags[k] for k in ("datetime_original", "datetime", "make", "model", "software", "gps"))
+
+        if not has_exif:
+            result = {
                 "status": "Unknown",
                 "capture_time": None,
                 "report_time": report_time.strftime("%Y-%m-%d %H:%M:%S"),
                 "age_hours": None,
                 "details": "No EXIF metadata found (Metadata stripped or screenshot)"
             }
-            
-        # Find DateTimeOriginal (Tag 36867)
-        date_taken_str = None
-        for tag, value in exif_data.items():
-            tag_name = ExifTags.TAGS.get(tag, tag)
-            if tag_name == "DateTimeOriginal":
-                date_taken_str = value
-                break
-                
-        if not date_taken_str:
-            return {
-                "status": "Unknown",
-                "capture_time": None,
-                "report_time": report_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "age_hours": None,
-                "details": "No 'Date Taken' timestamp in metadata"
-            }
-            
-        # Parse Date (Format: YYYY:MM:DD HH:MM:SS)
-        try:
-            capture_time = datetime.strptime(date_taken_str, "%Y:%m:%d %H:%M:%S")
-        except ValueError:
-             return {
-                "status": "Unknown",
-                "capture_time": date_taken_str,
-                "report_time": report_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "age_hours": None,
-                "details": "Unrecognized date format in metadata"
-            }
-            
-        # Calculate Age
-        age = report_time - capture_time
-        age_hours = age.total_seconds() / 3600
-        
-        # Fraud Logic: If photo is older than 24 hours
-        if age_hours > 24:
-            return {
-                "status": "Stale",
-                "capture_time": str(capture_time),
-                "report_time": str(report_time),
-                "age_hours": round(age_hours, 1),
-                "details": f"Photo is {round(age_hours, 1)} hours old (>24h limit)"
-            }
-        
-        # If capture time is effectively in the future (permitting small clock skew)
-        if age_hours < -1: 
-             return {
-                "status": "Suspicious",
-                "capture_time": str(capture_time),
-                "report_time": str(report_time),
-                "age_hours": round(age_hours, 1),
-                "details": "Future timestamp detected (Clock manipulation?)"
-            }
+        else:
+            result = _time_check(tags["datetime_original"], report_time)
 
-        return {
-            "status": "Fresh",
-            "capture_time": str(capture_time),
-            "report_time": str(report_time),
-            "age_hours": round(age_hours, 1),
-            "details": "Verified recent capture"
-        }
+        camera = " ".join(p for p in (tags["make"], tags["model"]) if p) or None
+        software = tags["software"]
+        result["camera"] = camera
+        result["software"] = software
+        result["location_check"] = _location_check(tags["gps"], latitude, longitude)
+
+        # Photo taken somewhere else than reported
+        location = result["location_check"]
+        if location["status"] == "Mismatch":
+            reason = f"Photo GPS is {location['distance_m'] / 1000:.1f} km from the reported location"
+            result["details"] = reason if result["status"] in ("Fresh", "Unknown") else f"{result['details']}; {reason}"
+            result["status"] = "Suspicious"
+
+        if software and any(editor in software.lower() for editor in EDITING_SOFTWARE):
+            result["details"] += f" (edited with {software})"
+
+        return result
 
     except Exception as e:
-        print(f"Forensics Error: {e}")
+        log.error("Forensics error", error=str(e))
         return {
             "status": "Error",
             "details": str(e)
@@ -0,0 +1,135 @@
+"""
+ONNX Export for UrbanEye AI
+Converts the fine-tuned Keras classifier into an ONNX Runtime artifact
+
+The web workers only need a forward pass. Loading TensorFlow for that costs
+seconds of cold start and hundreds of MB of RSS per worker; onnxruntime
+runs the same graph in a fraction of both. image_classifier.py picks the
+ONNX artifact automatically when it exists and is newer than the .h5.
+
+Artifacts (next to the Keras model):
+    ai/urbaneye_finetuned_model.onnx        - float32, same outputs as Keras
+    ai/urbaneye_finetuned_model.int8.onnx   - optional int8 (static, QDQ),
+                                              calibrated on training_data/
+
+    ai/mobilenetv2_embedding.onnx           - --backbone: frozen ImageNet base
+                                              with average pooling, 1280-d
+                                              features for ai/embedding_store.py
+
+Input is NHWC float32 [N, 224, 224, 3] RGB in [0, 1], exactly what
+image_classifier._preprocess produces.
+
+Usage (from backend/, after train_classifier.py):
+    python -m ai.onnx_export [--int8] [--calibration-dir training_data]
+    python -m ai.onnx_export --backbone
+"""
+
+import argparse
+import glob
+import os
+
+AI_DIR = os.path.dirname(__file__)
+KERAS_MODEL_PATH = os.path.join(AI_DIR, "urbaneye_finetuned_model.h5")
+ONNX_MODEL_PATH = os.path.join(AI_DIR, "urbaneye_finetuned_model.onnx")
+ONNX_INT8_MODEL_PATH = os.path.join(AI_DIR, "urbaneye_finetuned_model.int8.onnx")
+
+INPUT_NAME = "input"
+IMG_SIZE = 224
+OPSET = 13
+CALIBRATION_IMAGES = 100
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def export_keras_model(model, output_path=ONNX_MODEL_PATH):
+    """
+    Write a Keras model as ONNX (dynamic batch dimension).
+
+    Returns:
+        str: Path of the ONNX file
+    """
+    import tensorflow as tf
+
+    spec = (tf.TensorSpec((None, IMG_SIZE, IMG_SIZE, 3), tf.float32, name=INPUT_NAME),)
+    try:
+        import tf2onnx
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=OPSET, output_path=output_path)
+    except ImportError:
+        # Keras 3 ships its own exporter (still needs tf2onnx/onnx underneath on some versions)
+        if not hasattr(model, "export"):
+            raise RuntimeError("ONNX export requires tf2onnx (pip install tf2onnx onnx)")
+        model.export(output_path, format="onnx")
+    print(f"✅ ONNX model saved to: {output_path} ({os.path.getsize(output_path) / 1024 / 1024:.1f} MB)")
+    return output_path
+
+
+def _calibration_batches(calibration_dir, limit=CALIBRATION_IMAGES):
+    """Preprocessed images for int8 calibration, one per batch"""
+    from ai.image_classifier import _preprocess
+    import numpy as np
+
+    paths = sorted(p for p in glob.glob(os.path.join(calibration_dir, "**", "*"), recursive=True)
+                   if p.lower().endswith(IMAGE_EXTS))
+    # Spread the sample across categories instead of taking the first folder
+    step = max(1, len(paths) // limit)
+    for path in paths[::step][:limit]:
+        arr = _preprocess(path)
+        if arr is not None:
+            yield arr[np.newaxis].astype(np.float32)
+
+
+def quantize_int8(onnx_path=ONNX_MODEL_PATH, output_path=ONNX_INT8_MODEL_PATH, calibration_dir="training_data"):
+    """
+    Static int8 quantisation (per-channel QDQ) calibrated on real images.
+    Falls back to dynamic (weight-only) quantisation without calibration data.
+
+    Returns:
+        str: Path of the int8 ONNX file
+    """
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+
+    batches = list(_calibration_batches(calibration_dir)) if os.path.isdir(calibration_dir) else []
+    if not batches:
+        print("⚠️ No calibration images found - using dynamic quantisation")
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QInt8)
+    else:
+        class _Reader(CalibrationDataReader):
+            def __init__(self):
+                self._it = iter(batches)
+
+            def get_next(self):
+                batch = next(self._it, None)
+                return None if batch is None else {INPUT_NAME: batch}
+
+        quantize_static(
+            onnx_path, output_path, _Reader(),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+        )
+        print(f"   Calibrated on {len(batches)} images")
+    print(f"✅ int8 model saved to: {output_path} ({os.path.getsize(output_path) / 1024 / 1024:.1f} MB)")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the fine-tuned classifier to ONNX")
+    parser.add_argument("--model", default=KERAS_MODEL_PATH, help="Keras .h5 model to export")
+    parser.add_argument("--output", default=ONNX_MODEL_PATH)
+    parser.add_argument("--int8", action="store_true", help="Also write an int8-quantised model")
+    parser.add_argument("--calibration-dir", default="training_data")
+    parser.add_argument("--backbone", action="store_true",
+                        help="Export the embedding backbone instead of the classifier")
+    args = parser.parse_args()
+
+    if args.backbone:
+        from tensorflow.keras.applications import MobileNetV2
+        from ai.embedding_store import BACKBONE_ONNX_PATH
+        base = MobileNetV2(weights="imagenet", include_top=False, pooling="avg", input_shape=(IMG_SIZE, IMG_SIZE, 3))
+        export_keras_model(base, BACKBONE_ONNX_PATH)
+        raise SystemExit(0)
+
+    from tensorflow.keras.models import load_model
+    path = export_keras_model(load_model(args.model), args.output)
+    if args.int8:
+        quantize_int8(path, os.path.splitext(path)[0] + ".int8.onnx", calibration_dir=args.calibration_dir)
@@ -0,0 +1,165 @@
+"""
+Perceptual Hashing for UrbanEye AI
+64-bit dHash / pHash / aHash packed as integers, compared with vectorised popcount
+
+Hashes are built with np.packbits (row-major, most significant bit first), so
+a dHash integer formats to exactly the same hex string as the old
+"image_hash" field. MongoDB stores 64-bit integers signed, so the
+`image_dhash` field holds to_signed64(hash); NumPy code keeps them as an
+int64 array and compares thousands of candidates in one call:
+
+    from ai.perceptual_hash import dhash, hamming_many
+    query = dhash(image_ctx)
+    distances = hamming_many(query, candidate_hashes)   # np.ndarray[int]
+
+This module deliberately has no database/config imports so it can be loaded
+cheaply inside inference pool processes.
+"""
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+from ai.image_context import ImageContext
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+HASH_SIZE = 8
+MAX_DISTANCE = 64
+
+# popcount of every byte value (fallback for NumPy < 2.0)
+POPCOUNT_LUT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8) if CV2_AVAILABLE else None
+
+
+def popcount64(xor):
+    """Per-element popcount of an int64 array (any shape)"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor.view(np.uint64)).astype(np.uint8)
+    return POPCOUNT_LUT[xor.view(np.uint8)].reshape(xor.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def pack_bits(bits):
+    """Pack a boolean array (any shape, 64 values) into an unsigned int"""
+    return int.from_bytes(np.packbits(np.asarray(bits, dtype=bool).ravel()).tobytes(), "big")
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Difference hash: compare horizontally adjacent pixels of a
+    (hash_size + 1) x hash_size grayscale thumbnail.
+
+    Args:
+        image: File path or shared ImageContext
+
+    Returns:
+        int: Unsigned hash (None if the image cannot be decoded)
+    """
+    try:
+        resized = ImageContext.ensure(image).resized(hash_size + 1, hash_size, gray=True)
+        if resized is None:
+            return None
+        return pack_bits(resized[:, 1:] > resized[:, :-1])
+    except Exception as e:
+        log.error("Error computing dHash", error=str(e))
+        return None
+
+
+def ahash(image, hash_size=HASH_SIZE):
+    """Average hash: pixels of a hash_size x hash_size thumbnail above the mean"""
+    try:
+        resized = ImageContext.ensure(image).resized(hash_size, hash_size, gray=True,
+                                                     interpolation=cv2.INTER_AREA)
+        if resized is None:
+            return None
+        return pack_bits(resized > resized.mean())
+    except Exception as e:
+        log.error("Error computing aHash", error=str(e))
+        return None
+
+
+def phash(image, hash_size=HASH_SIZE, highfreq_factor=4):
+    """
+    DCT hash: low-frequency DCT coefficients above their median.
+    More robust to re-compression and small crops than dHash, ~3x the cost.
+    """
+    try:
+        side = hash_size * highfreq_factor
+        resized = ImageContext.ensure(image).resized(side, side, gray=True,
+                                                     interpolation=cv2.INTER_AREA)
+        if resized is None:
+            return None
+        low = cv2.dct(resized.astype(np.float32))[:hash_size, :hash_size]
+        # Median without the DC term, which only encodes overall brightness
+        return pack_bits(low > np.median(low.ravel()[1:]))
+    except Exception as e:
+        log.error("Error computing pHash", error=str(e))
+        return None
+
+
+# ----------------------------------------------------------------------
+# Storage helpers
+# ----------------------------------------------------------------------
+def to_signed64(value):
+    """Unsigned 64-bit hash -> signed int64 (BSON long)"""
+    if value is None:
+        return None
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned64(value):
+    if value is None:
+        return None
+    return value + (1 << 64) if value < 0 else value
+
+
+def to_hex(value):
+    """Format like the legacy image_hash field (no zero padding)"""
+    return None if value is None else format(to_unsigned64(value), "x")
+
+
+def from_hex(text):
+    """Parse a legacy hex image_hash (None if missing/invalid)"""
+    try:
+        return int(text, 16) if text else None
+    except (TypeError, ValueError):
+        return None
+
+
+def as_hash_array(values):
+    """List of (signed or unsigned) hashes -> np.int64 array"""
+    return np.array([to_signed64(v) for v in values], dtype=np.int64)
+
+
+# ----------------------------------------------------------------------
+# Distance
+# ----------------------------------------------------------------------
+def hamming(a, b):
+    """Hamming distance between two hashes (MAX_DISTANCE if either is missing)"""
+    if a is None or b is None:
+        return MAX_DISTANCE
+    return ((to_unsigned64(a) ^ to_unsigned64(b)) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+def hamming_many(query, candidates):
+    """
+    Hamming distance from one hash to an array of hashes.
+
+    Args:
+        query: int hash (signed or unsigned)
+        candidates: np.int64 array (see as_hash_array)
+
+    Returns:
+        np.ndarray: uint8 distances, same length as candidates
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    return popcount64(np.bitwise_xor(candidates, np.int64(to_signed64(query))))
+
+
+def hamming_matrix(hashes):
+    """Pairwise n x n distances (for offline clustering of small groups)"""
+    hashes = np.asarray(hashes, dtype=np.int64)
+    return popcount64(np.bitwise_xor(hashes[:, None], hashes[None, :]))
@@ -2,106 +2,250 @@
 Dataset Preparation Script for UrbanEye AI
 Human-in-the-Loop Learning System
 
-This script collects verified uploaded images from MongoDB and organizes them
+This script collects admin-verified uploads from MongoDB and organizes them
 into class-specific folders for training. This is the first phase of the
 two-phase ML system: preparing labeled training data from user uploads.
 
+Incremental: only issues verified since the last run are read (watermark on
+`verified_at`, `_id` in ai/dataset/.watermark.json). The label is the
+admin's `corrected_type` (falling back to the AI `issue_type`); issues marked
+invalid are removed from the dataset, re-labelled ones are moved.
+
+Images are hard-linked (or symlinked, or copied as a last resort) as
+<class>/<sha256><ext>, so identical uploads are stored once and no bytes are
+duplicated. ai/dataset/manifest.csv lists every sample and is what
+ai/training_pipeline.py reads.
+
 Usage:
-    python ai/prepare_dataset.py
+    python ai/prepare_dataset.py [--full] [--link-mode hard|symlink|copy]
 
 Output:
     ai/dataset/
+        ├── manifest.csv      (path, label, sha256, issue_id, verified_at)
         ├── pothole/
         ├── garbage/
-        ├── water_leak/
-        └── streetlight/
+        └── ...
 """
 
-import shutil
+import argparse
+import csv
+import json
 import os
-from pymongo import MongoClient
+import shutil
+import sys
+from datetime import datetime
 
-# MongoDB connection
-client = MongoClient("mongodb://localhost:27017")
-db = client["urbaneye"]
-issues = db["issues"]
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from config import db
+from services.storage import storage, file_sha256
 
 # Dataset directory structure
 BASE_DATASET = "ai/dataset"
-CLASSES = ["pothole", "garbage", "water_leak", "streetlight"]
-
-# Create class directories
-for class_name in CLASSES:
-    os.makedirs(os.path.join(BASE_DATASET, class_name), exist_ok=True)
-
-print("🔄 Preparing training dataset from uploaded images...")
-print("=" * 60)
-
-# Statistics
-stats = {class_name: 0 for class_name in CLASSES}
-skipped = 0
-
-# Collect images from MongoDB
-for issue in issues.find({"issue_type": {"$ne": "unknown"}}):
-    image_path = issue.get("image_path")
-    issue_type = issue.get("issue_type")
-    
-    # Validate data
-    if not image_path or not issue_type:
-        skipped += 1
-        continue
-    
-    # Check if image file exists
-    if not os.path.exists(image_path):
-        print(f"⚠️  Image not found: {image_path}")
-        skipped += 1
-        continue
-    
-    # Check if issue type is valid
-    if issue_type not in CLASSES:
-        print(f"⚠️  Invalid issue type: {issue_type}")
-        skipped += 1
-        continue
-    
-    # Copy image to appropriate class folder
-    dest_dir = os.path.join(BASE_DATASET, issue_type)
-    filename = os.path.basename(image_path)
-    dest_path = os.path.join(dest_dir, filename)
-    
-    # Avoid duplicates
-    if os.path.exists(dest_path):
-        print(f"ℹ️  Already exists: {dest_path}")
-        continue
-    
-    # Copy file
-    shutil.copy(image_path, dest_path)
-    stats[issue_type] += 1
-    print(f"✅ Copied: {image_path} → {dest_path}")
-
-print("=" * 60)
-print("📊 Dataset Preparation Complete!")
-print()
-print("Class Distribution:")
-for class_name, count in stats.items():
-    print(f"  {class_name:15s}: {count:3d} images")
-print(f"  {'Skipped':15s}: {skipped:3d} images")
-print()
-
-total_images = sum(stats.values())
-print(f"Total training images: {total_images}")
-
-if total_images < 20:
-    print()
-    print("⚠️  WARNING: Very few training images!")
-    print("   Recommendation: Collect at least 50-100 images per class")
-    print("   for meaningful model improvement.")
-elif total_images < 100:
+MANIFEST_NAME = "manifest.csv"
+WATERMARK_NAME = ".watermark.json"
+MANIFEST_FIELDS = ["path", "label", "sha256", "issue_id", "verified_at"]
+LABELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "labels.json")
+
+with open(LABELS_PATH) as f:
+    CLASSES = set(json.load(f).values())
+
+issues = db["issues"]
+
+
+def normalise_label(value):
+    label = str(value or "").replace("Advisory: ", "").strip().lower().replace(" ", "_")
+    return label or None
+
+
+def read_manifest(dataset_dir):
+    """{issue_id: row} of the current manifest"""
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="") as f:
+        return {row["issue_id"]: row for row in csv.DictReader(f)}
+
+
+def write_manifest(dataset_dir, rows):
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        for row in sorted(rows.values(), key=lambda r: (r["label"], r["path"])):
+            writer.writerow(row)
+    os.replace(tmp, path)
+
+
+def read_watermark(dataset_dir):
+    path = os.path.join(dataset_dir, WATERMARK_NAME)
+    if not os.path.exists(path):
+        return None, None
+    with open(path) as f:
+        state = json.load(f)
+    return datetime.fromisoformat(state["verified_at"]), state["issue_id"]
+
+
+def write_watermark(dataset_dir, verified_at, issue_id):
+    with open(os.path.join(dataset_dir, WATERMARK_NAME), "w") as f:
+        json.dump({"verified_at": verified_at.isoformat(), "issue_id": str(issue_id)}, f)
+
+
+def link_file(src, dest, mode="hard"):
+    """Hard link -> symlink -> copy, whichever the filesystem allows first"""
+    modes = {"hard": ["hard", "symlink", "copy"], "symlink": ["symlink", "copy"], "copy": ["copy"]}[mode]
+    for attempt in modes:
+        try:
+            if attempt == "hard":
+                os.link(src, dest)
+            elif attempt == "symlink":
+                os.symlink(os.path.abspath(src), dest)
+            else:
+                shutil.copy2(src, dest)
+            return attempt
+        except OSError:
+            continue
+    raise OSError(f"Could not link {src} -> {dest}")
+
+
+def _remove_sample(dataset_dir, row, rows):
+    """Drop a sample; the file goes only if no other issue uses the same path"""
+    path = os.path.join(dataset_dir, row["path"])
+    if not any(r["path"] == row["path"] for k, r in rows.items() if k != row["issue_id"]):
+        if os.path.lexists(path):
+            os.remove(path)
+
+
+def new_verifications(watermark):
+    """Verified issues after the (verified_at, _id) watermark, oldest first"""
+    from bson import ObjectId
+
+    query = {"verified": True, "verified_at": {"$ne": None}}
+    verified_at, issue_id = watermark
+    if verified_at is not None:
+        query["$or"] = [
+            {"verified_at": {"$gt": verified_at}},
+            {"verified_at": verified_at, "_id": {"$gt": ObjectId(issue_id)}},
+        ]
+    return issues.find(
+        query,
+        {"image_path": 1, "issue_type": 1, "corrected_type": 1, "is_valid": 1,
+         "media_type": 1, "content_sha256": 1, "verified_at": 1}
+    ).sort([("verified_at", 1), ("_id", 1)])
+
+
+def prepare(dataset_dir=BASE_DATASET, full=False, link_mode="hard"):
+    """
+    Bring the dataset up to date with new admin verifications.
+
+    Returns:
+        dict: Counters for this run
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    issues.create_index([("verified", 1), ("verified_at", 1), ("_id", 1)])
+
+    rows = {} if full else read_manifest(dataset_dir)
+    watermark = (None, None) if full else read_watermark(dataset_dir)
+    stats = {"added": 0, "relabelled": 0, "removed": 0, "skipped": 0, "links": {}}
+    last = None
+
+    for issue in new_verifications(watermark):
+        last = (issue["verified_at"], issue["_id"])
+        issue_id = str(issue["_id"])
+        existing = rows.get(issue_id)
+        label = normalise_label(issue.get("corrected_type") or issue.get("issue_type"))
+
+        # Rejected by the admin, not an image, or not a class we train on
+        if (issue.get("is_valid") is False or issue.get("media_type") == "video"
+                or not issue.get("image_path") or label not in CLASSES):
+            if existing:
+                _remove_sample(dataset_dir, existing, rows)
+                del rows[issue_id]
+                stats["removed"] += 1
+            else:
+                stats["skipped"] += 1
+            continue
+
+        try:
+            src = storage.local_path(issue["image_path"])
+        except Exception:
+            src = None
+        if not src or not os.path.exists(src):
+            print(f"⚠️  Image not found: {issue['image_path']}")
+            stats["skipped"] += 1
+            continue
+
+        sha256 = issue.get("content_sha256") or file_sha256(src)
+        rel_path = f"{label}/{sha256}{os.path.splitext(src)[1].lower()}"
+        if existing and existing["path"] == rel_path:
+            existing["verified_at"] = issue["verified_at"].isoformat()
+            continue
+        if existing:
+            _remove_sample(dataset_dir, existing, rows)
+            stats["relabelled"] += 1
+        else:
+            stats["added"] += 1
+
+        dest = os.path.join(dataset_dir, rel_path)
+        if not os.path.lexists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            how = link_file(src, dest, link_mode)
+            stats["links"][how] = stats["links"].get(how, 0) + 1
+        rows[issue_id] = {
+            "path": rel_path, "label": label, "sha256": sha256,
+            "issue_id": issue_id, "verified_at": issue["verified_at"].isoformat(),
+        }
+
+    write_manifest(dataset_dir, rows)
+    if last:
+        write_watermark(dataset_dir, *last)
+    stats["total"] = len(rows)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build ai/dataset from admin-verified issues")
+    parser.add_argument("--dataset-dir", default=BASE_DATASET)
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and rebuild the manifest")
+    parser.add_argument("--link-mode", choices=["hard", "symlink", "copy"], default="hard")
+    args = parser.parse_args()
+
+    print("🔄 Preparing training dataset from verified uploads...")
+    print("=" * 60)
+    stats = prepare(args.dataset_dir, full=args.full, link_mode=args.link_mode)
+
+    print("=" * 60)
+    print("📊 Dataset Preparation Complete!")
+    print(f"  Added: {stats['added']}, relabelled: {stats['relabelled']}, "
+          f"removed: {stats['removed']}, skipped: {stats['skipped']}")
+    if stats["links"]:
+        print(f"  Links: {stats['links']}")
     print()
-    print("ℹ️  Note: Dataset is small. Model may overfit.")
-    print("   Recommendation: Collect more images for better accuracy.")
-else:
+
+    counts = {}
+    for row in read_manifest(args.dataset_dir).values():
+        counts[row["label"]] = counts.get(row["label"], 0) + 1
+    print("Class Distribution:")
+    for class_name in sorted(counts):
+        print(f"  {class_name:15s}: {counts[class_name]:3d} images")
     print()
-    print("✅ Dataset size is sufficient for training!")
 
-print()
-print("Next step: Run 'python ai/train_model.py' to fine-tune the model")
+    total_images = stats["total"]
+    print(f"Total training images: {total_images}")
+
+    if total_images < 20:
+        print()
+        print("⚠️  WARNING: Very few training images!")
+        print("   Recommendation: Collect at least 50-100 images per class")
+        print("   for meaningful model improvement.")
+    elif total_images < 100:
+        print()
+        print("ℹ️  Note: Dataset is small. Model may overfit.")
+        print("   Recommendation: Collect more images for better accuracy.")
+    else:
+        print()
+        print("✅ Dataset size is sufficient for training!")
+
+    print()
+    print("Next step: Run 'python ai/train_model.py' to fine-tune the model")
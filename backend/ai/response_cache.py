@@ -0,0 +1,168 @@
+"""
+Chatbot Response Cache for UrbanEye AI
+Serves FAQ-style answers without an LLM round-trip
+
+Most chatbot traffic is the quick-reply buttons ("How do I report?",
+"How long to fix?") and close paraphrases of them. Those answers do not
+depend on the conversation history, so once Gemini/OpenAI has answered
+one we can replay it for every similar question until the entry expires.
+
+Questions are normalised (lowercased, punctuation and stop-words removed,
+light stemming) and must match a known FAQ question exactly: every content
+token has to be the same, only stop-words may differ. "How do I delete my
+report?" is therefore never answered with "How do I report?". Questions
+about the user's own data ("my", "our") are personal and never cached, so
+they and all follow-up questions always reach the model.
+"""
+
+import os
+import re
+import time
+import threading
+
+from services.metrics import metrics
+
+# Words that carry no meaning for FAQ matching
+STOP_WORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "it", "its",
+    "is", "am", "are", "was", "were", "be", "been", "do", "does", "did",
+    "can", "could", "will", "would", "should", "shall", "may", "might",
+    "to", "of", "in", "on", "at", "for", "with", "about", "from", "by",
+    "and", "or", "so", "this", "that", "these", "those", "there", "here",
+    "please", "pls", "hi", "hello", "hey", "tell", "know", "want", "need",
+    "just", "any", "some", "get", "us"
+}
+
+# First-person possessives: the answer depends on who is asking
+PERSONAL_WORDS = {"my", "mine", "our", "ours", "myself"}
+
+# Words that keep their meaning even though they are short question words
+KEEP_WORDS = {"how", "what", "long", "when", "where", "who", "why", "login"}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(text):
+    """
+    Reduce a question to its meaningful tokens.
+
+    Returns:
+        tuple: Sorted, de-duplicated content tokens ('' tokens are dropped)
+    """
+    tokens = TOKEN_RE.findall(str(text).lower())
+    kept = {
+        _stem(t) for t in tokens
+        if t in KEEP_WORDS or (t not in STOP_WORDS and len(t) > 1)
+    }
+    return tuple(sorted(kept))
+
+
+def _stem(token):
+    """Very small suffix stripper so 'reports'/'reporting' match 'report'"""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+
+def is_personal(text):
+    """True for questions about the asker's own data (never shared)"""
+    return any(t in PERSONAL_WORDS for t in TOKEN_RE.findall(str(text).lower()))
+
+
+class ResponseCache:
+    """
+    TTL cache of chatbot answers keyed by normalised FAQ question.
+
+    Only questions whose content tokens equal those of a registered FAQ
+    question are cacheable; the normalised tokens are the key, so
+    rewordings that differ only in stop-words share a single entry.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=500):
+        self.ttl = ttl_seconds if ttl_seconds is not None else int(os.getenv("CHATBOT_CACHE_TTL", "3600"))
+        self.max_entries = max_entries
+        self.enabled = os.getenv("CHATBOT_CACHE_ENABLED", "true").lower() == "true"
+
+        self._lock = threading.Lock()
+        self._faq = {}        # canonical key -> original question
+        self._entries = {}    # canonical key -> (answer, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def register_faq(self, questions):
+        """Register the FAQ questions (usually the quick replies); personal ones are skipped"""
+        with self._lock:
+            for question in questions:
+                key = normalize_question(question)
+                if not key or key in self._faq or is_personal(question):
+                    continue
+                self._faq[key] = question
+
+    def canonical_key(self, message):
+        """
+        Map a user message to its FAQ key, or None if it is not an FAQ.
+        """
+        if is_personal(message):
+            return None
+        tokens = normalize_question(message)
+        return tokens if tokens in self._faq else None
+
+    def get(self, message):
+        """
+        Look up a cached answer.
+
+        Returns:
+            tuple: (answer or None, canonical key or None)
+        """
+        if not self.enabled:
+            return None, None
+
+        key = self.canonical_key(message)
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.time():
+                self.hits += 1
+                metrics.cache_result("chatbot_faq", hit=True)
+                return entry[0], key
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+        metrics.cache_result("chatbot_faq", hit=False)
+        return None, key
+
+    def put(self, key, answer):
+        """Store an answer under a canonical key returned by get()"""
+        if not self.enabled or key is None or not answer:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            self._entries[key] = (answer, time.time() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit-rate metrics for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "faq_questions": len(self._faq),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
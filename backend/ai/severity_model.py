@@ -1,3 +1,5 @@
+import os
+
 try:
     import cv2
     import numpy as np
@@ -5,10 +7,58 @@ try:
 except ImportError:
     CV2_AVAILABLE = False
 
+from ai.image_context import ImageContext
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+# Visual analysis can run on a fixed pyramid level: the longest side is
+# reduced to ANALYSIS_MAX_SIDE (INTER_AREA) so cost no longer grows with
+# megapixels. Opt-in (SEVERITY_ANALYSIS_SIDE=512): on larger images the
+# downscaled labels do not yet match the full-resolution ones (see
+# verify_severity_parity.py), so the default stays full resolution.
+ANALYSIS_MAX_SIDE = 512
+ANALYSIS_SIDE = int(os.getenv("SEVERITY_ANALYSIS_SIDE", "0")) or None
+
+BASE_SCORES = {
+    "pothole": 5,
+    "water_leak": 7,  # Water is urgent
+    "garbage": 3,
+    "streetlight": 4,
+    "unknown": 1
+}
+
+# (low, high) bucket thresholds for the two visual modifiers.
+# NATIVE: images already at/below the analysis level keep the original
+# full-resolution thresholds, so their scores are unchanged.
+# DOWNSCALED: fitted for the 512px level against the full-resolution buckets
+# of the FIT half of the larger images in training_data/ and uploads/ (split
+# by content hash); agreement is measured on the other half only - edge
+# density rises once fine texture is averaged away, RMS contrast drops
+# slightly. Re-fit with `python verify_severity_parity.py --fit`.
+NATIVE_THRESHOLDS = {"edge": (0.05, 0.15), "contrast": (40, 60)}
+DOWNSCALED_THRESHOLDS = {"edge": (0.05, 0.1339), "contrast": (40, 57.9)}
+
 
-def estimate_severity(image_path, issue_type):
+def visual_features(gray):
+    """(edge density, RMS contrast) of a grayscale image"""
+    edges = cv2.Canny(gray, 100, 200)
+    return np.count_nonzero(edges) / edges.size, float(gray.std())
+
+
+def _bucket(value, thresholds):
+    low, high = thresholds
+    if value > high: return 2
+    if value > low: return 1
+    return 0
+
+
+def estimate_severity(image, issue_type, analysis_side=ANALYSIS_SIDE):
     """
     Estimate the severity of a civic issue (1-10 scale).
+    `image` is a file path or a shared ImageContext.
+    `analysis_side` is the pyramid level used for the visual modifiers
+    (None = full resolution, the default; see SEVERITY_ANALYSIS_SIDE).
     
     Logic:
     1. Base Score: Dependent on Issue Type (e.g., Pothole=5, Garbage=3).
@@ -21,36 +71,25 @@ def estimate_severity(image_path, issue_type):
     """
     try:
         # 1. Base Score Rules
-        base_scores = {
-            "pothole": 5,
-            "water_leak": 7,  # Water is urgent
-            "garbage": 3,
-            "streetlight": 4,
-            "unknown": 1
-        }
-        base = base_scores.get(str(issue_type).lower(), 3)
+        base = BASE_SCORES.get(str(issue_type).lower(), 3)
         if str(issue_type).startswith("Advisory"): # For video
             base = 5
             
         # 2. Visual Analysis
-        img = cv2.imread(image_path)
-        if img is None:
+        ctx = ImageContext.ensure(image)
+        full = ctx.gray
+        if full is None:
             return {"score": base, "label": get_label(base), "details": {"method": "base_only"}}
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = ctx.downscaled(analysis_side, gray=True) if analysis_side else full
+        downscaled = gray.shape != full.shape
+        thresholds = DOWNSCALED_THRESHOLDS if downscaled else NATIVE_THRESHOLDS
         
         # A. Edge Density (Canny) -> Complexity
-        edges = cv2.Canny(gray, 100, 200)
-        edge_ratio = np.count_nonzero(edges) / edges.size
-        edge_modifier = 0
-        if edge_ratio > 0.15: edge_modifier = 2
-        elif edge_ratio > 0.05: edge_modifier = 1
-        
         # B. Contrast (RMS) -> Depth/Shadows
-        contrast = gray.std()
-        contrast_modifier = 0
-        if contrast > 60: contrast_modifier = 2
-        elif contrast > 40: contrast_modifier = 1
+        edge_ratio, contrast = visual_features(gray)
+        edge_modifier = _bucket(edge_ratio, thresholds["edge"])
+        contrast_modifier = _bucket(contrast, thresholds["contrast"])
         
         # 3. Final Calculation
         final_score = base + edge_modifier + contrast_modifier
@@ -64,12 +103,14 @@ def estimate_severity(image_path, issue_type):
             "details": {
                 "base": base,
                 "edge_mod": edge_modifier,
-                "contrast_mod": contrast_modifier
+                "contrast_mod": contrast_modifier,
+                "analysis_size": [int(gray.shape[1]), int(gray.shape[0])],
+                "downscaled": downscaled
             }
         }
         
     except Exception as e:
-        print(f"Error estimating severity: {e}")
+        log.error("Error estimating severity", error=str(e))
         return {"score": 1, "label": "Low", "details": {"error": str(e)}}
 
 def get_label(score):
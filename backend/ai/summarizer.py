@@ -6,6 +6,10 @@ Powered by Google Gemini (FREE)
 
 import os
 import json
+from services.metrics import metrics
+from services.log import get_logger
+
+log = get_logger(__name__)
 
 class IssueSummarizer:
     """
@@ -22,9 +26,9 @@ class IssueSummarizer:
                 from ai.gemini_chatbot import gemini_chatbot
             self.ai = gemini_chatbot.model
             self.model_available = True
-            print("[INFO] Summarizer using Google Gemini (FREE)")
+            log.info("Summarizer using Google Gemini")
         except Exception as e:
-            print(f"[WARN] Gemini not available for summarizer: {e}")
+            log.warning("Gemini not available for summarizer", error=str(e))
             self.model_available = False
     
     def summarize(self, description, issue_type=None, location=None, severity=None):
@@ -32,7 +36,7 @@ class IssueSummarizer:
         Generate 1-2 sentence summary for admins
         """
         if not self.model_available:
-            print("[INFO] Model unavailable. Using Local Intelligence Summary.")
+            log.info("Model unavailable, using local summary")
             return self._generate_local_summary(description, issue_type, location, severity)
             
         # Build context
@@ -61,27 +65,29 @@ Return ONLY the summary."""
             # BUT we need to implement the same loop here or add a method to GeminiChatbot.
             # To keep it clean, I will try the primary, then manual fallback here.
             
-            print(f"[INFO] Summarizing with {self.ai.model_name}...")
-            response = self.ai.generate_content(prompt)
+            log.debug("Summarizing", model=self.ai.model_name)
+            with metrics.llm_call("gemini", "summarize"):
+                response = self.ai.generate_content(prompt)
             return response.text.strip().strip('"')
 
         except Exception as e:
-            print(f"[WARN] Primary summarizer failed: {e}. Trying backups...")
+            log.warning("Primary summarizer failed, trying backups", error=str(e))
             # Manual fallback loop for summarizer (similar to chatbot)
             backup_names = ['gemini-1.5-flash', 'gemini-1.5-pro']
             import google.generativeai as genai
             
             for name in backup_names:
                 try:
-                    print(f"[INFO] 🔄 Backup Summarizer: Switching to {name}...")
+                    log.info("Switching to backup summarizer", model=name)
                     backup_model = genai.GenerativeModel(name)
-                    response = backup_model.generate_content(prompt)
+                    with metrics.llm_call("gemini", "summarize_backup"):
+                        response = backup_model.generate_content(prompt)
                     return response.text.strip().strip('"')
                 except Exception as backup_error:
-                    print(f"[WARN] Backup {name} failed: {backup_error}")
+                    log.warning("Backup summarizer failed", model=name, error=str(backup_error))
                     continue
             
-            print(f"[WARN] Cloud Summarizer failed. using Local Intelligence Summary.")
+            log.warning("Cloud summarizer failed, using local summary")
             return self._generate_local_summary(description, issue_type, location, severity)
 
     def generate_generative_summary(self, description, location, image_caption="No image caption provided"):
@@ -117,11 +123,12 @@ Suggested Department:
 Urgency Level:"""
 
         try:
-            print("[INFO] ✨ GEN MODE: Running Generative Prompt...")
-            response = self.ai.generate_content(prompt)
+            log.debug("Running generative prompt")
+            with metrics.llm_call("gemini", "generative_summary"):
+                response = self.ai.generate_content(prompt)
             return response.text.strip()
         except Exception as e:
-            print(f"[WARN] Generative Mode Failed: {e}")
+            log.warning("Generative mode failed", error=str(e))
             return f"Error: {str(e)}"
 
     def _generate_local_summary(self, description, issue_type=None, location=None, severity=None):
@@ -166,7 +173,8 @@ Return JSON with:
 """
         
         try:
-            response = self.ai.generate_content(prompt)
+            with metrics.llm_call("gemini", "key_points"):
+                response = self.ai.generate_content(prompt)
             text = response.text.strip()
             # Clean up markdown code blocks if present
             if "```json" in text:
@@ -177,7 +185,7 @@ Return JSON with:
             return json.loads(text)
             
         except Exception as e:
-            print(f"[ERROR] Extraction error: {e}")
+            log.error("Key point extraction error", error=str(e))
             return {"error": f"AI Parsing Error: {str(e)}"}
 
     def generate_admin_briefing(self, issue_data):
@@ -207,5 +215,6 @@ Return JSON with:
             
         return briefing.strip()
 
-# Initialize global summarizer (Commented out to prevent startup crashes)
-# summarizer = IssueSummarizer()
+# Global summarizer. Only imported lazily from inside routes, so creating it
+# here no longer runs at app startup (and __init__ falls back to local mode)
+summarizer = IssueSummarizer()
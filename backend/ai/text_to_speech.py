@@ -7,6 +7,9 @@ Powered by gTTS (Google Text-to-Speech) - 100% FREE
 import os
 import hashlib
 from gtts import gTTS
+from services.log import get_logger
+
+log = get_logger(__name__)
 
 class VoiceSynthesizer:
     """
@@ -17,36 +20,41 @@ class VoiceSynthesizer:
         # Audio cache directory
         self.audio_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads', 'audio')
         os.makedirs(self.audio_dir, exist_ok=True)
-        print("[INFO] Voice Synthesizer initialized (using FREE gTTS)")
+        log.info("Voice synthesizer initialized (gTTS)")
     
     def generate_speech(self, text, issue_id=None, voice="en", speed=1.0):
         """
         Generate audio from text
         """
+        from services.storage import storage
+
         # Generate unique filename
         text_hash = hashlib.md5(text.encode()).hexdigest()[:12]
         filename = f"{issue_id}_{text_hash}.mp3" if issue_id else f"summary_{text_hash}.mp3"
-        audio_path = os.path.join(self.audio_dir, filename)
+        audio_key = f"uploads/audio/{filename}"
         
-        # Check cache
-        if os.path.exists(audio_path):
-            print(f"[INFO] Using cached audio: {filename}")
+        # Check cache (shared storage, so every worker reuses the audio)
+        if storage.exists(audio_key):
+            log.debug("Using cached audio", audio=filename)
             return f"audio/{filename}"
         
         try:
-            print(f"[INFO] Generating audio (FREE): {text[:50]}...")
+            log.info("Generating audio", audio=filename, text_chars=len(text))
             
-            # Use gTTS (Google Text-to-Speech)
+            # Use gTTS (Google Text-to-Speech), then hand the file to storage
             tts = gTTS(text=text, lang=voice, slow=(speed < 1.0))
-            tts.save(audio_path)
+            tmp_path = os.path.join(self.audio_dir, f".{filename}.{os.getpid()}.tmp")
+            tts.save(tmp_path)
+            storage.put_file(tmp_path, key=audio_key)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             
-            print(f"[INFO] Audio generated: {filename}")
+            log.debug("Audio generated", audio=filename)
             return f"audio/{filename}"
             
         except Exception as e:
-            print(f"[ERROR] TTS error: {e}")
+            log.error("TTS error, falling back to mock audio", error=str(e))
             # Fallback: Mock Audio (to prevent "Failed to generate" error)
-            print("[WARN] Switching to Mock Audio Fallback")
             return "audio/mock_audio.mp3"
     
     def get_available_voices(self):
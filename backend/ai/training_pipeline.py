@@ -0,0 +1,376 @@
+"""
+Training Pipeline for UrbanEye AI
+tf.data input pipeline + MobileNetV2 fine-tuning shared by the training scripts
+
+ImageDataGenerator.flow_from_directory decoded and augmented every JPEG in
+one Python thread, every epoch. This pipeline instead:
+
+- decodes and resizes in parallel (num_parallel_calls=AUTOTUNE),
+- cache()s the resized uint8 tensors after the first epoch (in memory, or
+  in a file with --cache-file for datasets larger than RAM), so later
+  epochs never touch a JPEG again,
+- augments whole batches with Keras preprocessing layers (flip, rotation,
+  translation, zoom - the same ranges as the old generator),
+- prefetches the next batch while the model trains on the current one,
+- logs training throughput in images/sec per epoch.
+
+Inputs match inference (image_classifier._preprocess): RGB, 224x224, [0, 1].
+Samples come from the dataset's manifest.csv (ai/prepare_dataset.py) when
+it has one, else from the class folders. Class indices are the sorted
+class names, as with flow_from_directory.
+
+train_head_from_embeddings() skips the images altogether: it trains the
+same head on cached 1280-d backbone features (ai/embedding_store.py) and
+grafts it onto the frozen base, so a retrain takes seconds. It gives up
+image augmentation in exchange.
+
+Used by ai/train_classifier.py and ai/train_model.py.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.applications import MobileNetV2
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.models import Model
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ModelCheckpoint
+
+IMG_SIZE = (224, 224)
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+MANIFEST_NAME = "manifest.csv"
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def add_training_args(parser, **defaults):
+    """CLI flags shared by the training scripts (defaults per script)"""
+    parser.add_argument("--data-dir", default=defaults.get("data_dir", "training_data"))
+    parser.add_argument("--model-path", default=defaults.get("model_path"))
+    parser.add_argument("--epochs", type=int, default=defaults.get("epochs", 20))
+    parser.add_argument("--batch-size", type=int, default=defaults.get("batch_size", 16))
+    parser.add_argument("--learning-rate", type=float, default=defaults.get("learning_rate", 1e-3))
+    parser.add_argument("--validation-split", type=float, default=0.2)
+    parser.add_argument("--patience", type=int, default=defaults.get("patience", 5))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-file", default="",
+                        help="Cache decoded tensors in this file instead of RAM (large datasets)")
+    parser.add_argument("--min-images", type=int, default=defaults.get("min_images", 20),
+                        help="Refuse to train on fewer images unless --force")
+    parser.add_argument("--force", action="store_true", help="Train even if the dataset is small")
+    return parser
+
+
+def read_manifest(data_dir):
+    """
+    Rows of <data_dir>/manifest.csv (written by ai/prepare_dataset.py), streamed.
+
+    Yields:
+        tuple: (absolute image path, label, sha256)
+    """
+    with open(os.path.join(data_dir, MANIFEST_NAME), newline="") as f:
+        for row in csv.DictReader(f):
+            yield os.path.join(data_dir, row["path"]), row["label"], row.get("sha256") or None
+
+
+def manifest_hashes(data_dir):
+    """{path: sha256} from the manifest, so embeddings skip re-hashing"""
+    if not os.path.exists(os.path.join(data_dir, MANIFEST_NAME)):
+        return {}
+    return {path: sha for path, _, sha in read_manifest(data_dir) if sha}
+
+
+def list_dataset(data_dir):
+    """
+    Image paths and labels from <data_dir>/manifest.csv if present,
+    otherwise from <data_dir>/<class>/<image>.
+
+    Returns:
+        tuple: (paths, label indices, sorted class names)
+    """
+    if os.path.exists(os.path.join(data_dir, MANIFEST_NAME)):
+        samples = [(path, label) for path, label, _ in read_manifest(data_dir) if os.path.exists(path)]
+        class_names = sorted({label for _, label in samples})
+        index = {name: i for i, name in enumerate(class_names)}
+        return [p for p, _ in samples], [index[l] for _, l in samples], class_names
+
+    class_names = sorted(
+        d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d))
+    )
+    paths, labels = [], []
+    for index, name in enumerate(class_names):
+        folder = os.path.join(data_dir, name)
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith(IMAGE_EXTS):
+                paths.append(os.path.join(folder, filename))
+                labels.append(index)
+    return paths, labels, class_names
+
+
+def split_dataset(paths, labels, validation_split=0.2, seed=42):
+    """Stratified, reproducible train/validation split"""
+    rng = random.Random(seed)
+    train, val = [], []
+    for label in sorted(set(labels)):
+        items = [p for p, l in zip(paths, labels) if l == label]
+        rng.shuffle(items)
+        n_val = int(round(len(items) * validation_split)) if len(items) > 1 else 0
+        val += [(p, label) for p in items[:n_val]]
+        train += [(p, label) for p in items[n_val:]]
+    rng.shuffle(train)
+    return train, val
+
+
+def _decode(path, label, num_classes):
+    data = tf.io.read_file(path)
+    image = tf.io.decode_image(data, channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMG_SIZE, method="bilinear", antialias=True)
+    # uint8 keeps the cache at 150 KB per image instead of 600 KB
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+    return image, tf.one_hot(label, num_classes)
+
+
+def build_augmenter(seed=42):
+    """Batch-level augmentation with the old ImageDataGenerator ranges"""
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomFlip("horizontal", seed=seed),
+        tf.keras.layers.RandomRotation(20 / 360, fill_mode="nearest", seed=seed),
+        tf.keras.layers.RandomTranslation(0.2, 0.2, fill_mode="nearest", seed=seed),
+        tf.keras.layers.RandomZoom(0.2, fill_mode="nearest", seed=seed),
+    ], name="augmentation")
+
+
+def make_dataset(items, num_classes, batch_size, training, cache_file="", seed=42):
+    """
+    tf.data pipeline: parallel decode -> cache -> (shuffle) -> batch -> (augment) -> prefetch
+    """
+    paths = [p for p, _ in items]
+    labels = [l for _, l in items]
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(lambda p, l: _decode(p, l, num_classes), num_parallel_calls=AUTOTUNE)
+    ds = ds.cache(cache_file)
+    if training:
+        ds = ds.shuffle(max(len(items), 1), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+
+    rescale = lambda x: tf.cast(x, tf.float32) / 255.0
+    if training:
+        augment = build_augmenter(seed)
+        ds = ds.map(lambda x, y: (augment(rescale(x), training=True), y), num_parallel_calls=AUTOTUNE)
+    else:
+        ds = ds.map(lambda x, y: (rescale(x), y), num_parallel_calls=AUTOTUNE)
+    return ds.prefetch(AUTOTUNE)
+
+
+class ThroughputLogger(Callback):
+    """Prints training images/sec for every epoch (validation excluded)"""
+
+    def __init__(self, num_images):
+        super().__init__()
+        self.num_images = num_images
+        self.rates = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._train_end = None
+
+    def on_test_begin(self, logs=None):
+        if self._train_end is None:
+            self._train_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = (self._train_end or time.perf_counter()) - self._start
+        rate = self.num_images / elapsed if elapsed > 0 else 0.0
+        self.rates.append(rate)
+        print(f"   ⏱️  Epoch {epoch + 1}: {rate:.1f} images/sec ({elapsed:.1f}s)")
+
+
+def build_model(num_classes, head=((128, 0.5),)):
+    """
+    Frozen ImageNet MobileNetV2 with a dense head.
+
+    Args:
+        head: (units, dropout) per hidden layer
+    """
+    base_model = MobileNetV2(weights="imagenet", include_top=False, input_shape=IMG_SIZE + (3,))
+    base_model.trainable = False
+
+    x = GlobalAveragePooling2D()(base_model.output)
+    for units, dropout in head:
+        x = Dense(units, activation="relu")(x)
+        if dropout:
+            x = Dropout(dropout)(x)
+    outputs = Dense(num_classes, activation="softmax")(x)
+    return Model(inputs=base_model.input, outputs=outputs)
+
+
+def train(args, head=((128, 0.5),), early_stop_monitor="val_accuracy", labels_path=None):
+    """
+    Run the whole training job for a parsed add_training_args() namespace.
+
+    Returns:
+        dict: model, history, class_names, train_ds, val_ds, throughput
+              (None if the dataset is missing or too small)
+    """
+    if not os.path.isdir(args.data_dir):
+        print(f"❌ Error: Dataset directory not found: {args.data_dir}")
+        return None
+
+    paths, labels, class_names = list_dataset(args.data_dir)
+    print(f"\n📂 Found {len(class_names)} categories, {len(paths)} images:")
+    for index, name in enumerate(class_names):
+        count = labels.count(index)
+        print(f"  {'✅' if count >= 15 else '⚠️'} {name}: {count} images")
+
+    if len(paths) < args.min_images and not args.force:
+        print(f"\n⚠️  Only {len(paths)} images (< {args.min_images}). Re-run with --force to train anyway.")
+        return None
+
+    train_items, val_items = split_dataset(paths, labels, args.validation_split, args.seed)
+    print(f"\n📊 Training samples: {len(train_items)}, validation samples: {len(val_items)}")
+
+    if labels_path:
+        with open(labels_path, "w") as f:
+            json.dump({str(i): name for i, name in enumerate(class_names)}, f, indent=2)
+        print(f"✅ Labels saved to: {labels_path}")
+
+    num_classes = len(class_names)
+    cache = args.cache_file
+    if cache:
+        # TF reuses an existing cache file blindly; key it by the file list
+        fingerprint = hashlib.md5("\n".join(f"{p}|{l}" for p, l in train_items + val_items).encode()).hexdigest()[:10]
+        cache = f"{cache}.{fingerprint}"
+    train_ds = make_dataset(train_items, num_classes, args.batch_size, True,
+                            f"{cache}.train" if cache else "", args.seed)
+    val_ds = make_dataset(val_items, num_classes, args.batch_size, False,
+                          f"{cache}.val" if cache else "", args.seed) if val_items else None
+
+    model = build_model(num_classes, head)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=args.learning_rate),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"]
+    )
+    print(f"\n🧠 Model built: {model.count_params():,} parameters, {num_classes} classes")
+
+    monitor_val = val_ds is not None
+    throughput = ThroughputLogger(len(train_items))
+    callbacks = [throughput]
+    if monitor_val:
+        callbacks += [
+            EarlyStopping(monitor=early_stop_monitor, patience=args.patience,
+                          restore_best_weights=True, verbose=1),
+            ModelCheckpoint(args.model_path, monitor="val_accuracy", save_best_only=True, verbose=1),
+        ]
+
+    print("\n🔥 Starting training...")
+    start = time.perf_counter()
+    history = model.fit(train_ds, validation_data=val_ds, epochs=args.epochs,
+                        callbacks=callbacks, verbose=2)
+    elapsed = time.perf_counter() - start
+    if not monitor_val:
+        model.save(args.model_path)
+
+    # First epoch includes decoding; later epochs read the cache
+    steady = throughput.rates[1:] or throughput.rates
+    print(f"\n⏱️  Training took {elapsed:.0f}s; steady-state {sum(steady) / len(steady):.1f} images/sec")
+
+    return {
+        "model": model,
+        "history": history,
+        "class_names": class_names,
+        "train_ds": train_ds,
+        "val_ds": val_ds,
+        "throughput": throughput.rates,
+    }
+
+
+def _head_model(num_classes, head):
+    from tensorflow.keras import Input
+    inputs = Input(shape=(1280,))
+    x = inputs
+    for units, dropout in head:
+        x = Dense(units, activation="relu")(x)
+        if dropout:
+            x = Dropout(dropout)(x)
+    return Model(inputs, Dense(num_classes, activation="softmax")(x))
+
+
+def train_head_from_embeddings(args, head=((128, 0.5),), early_stop_monitor="val_accuracy", labels_path=None):
+    """
+    Train only the dense head on stored embeddings, then save the full model.
+
+    Returns:
+        dict: model, history, class_names, throughput (None on a missing/small dataset)
+    """
+    from ai.embedding_store import ensure_embeddings
+
+    if not os.path.isdir(args.data_dir):
+        print(f"❌ Error: Dataset directory not found: {args.data_dir}")
+        return None
+    paths, labels, class_names = list_dataset(args.data_dir)
+    print(f"\n📂 Found {len(class_names)} categories, {len(paths)} images")
+    if len(paths) < args.min_images and not args.force:
+        print(f"\n⚠️  Only {len(paths)} images (< {args.min_images}). Re-run with --force to train anyway.")
+        return None
+
+    start = time.perf_counter()
+    vectors, usable, _ = ensure_embeddings(paths, path_hashes=manifest_hashes(args.data_dir))
+    print(f"✅ {int(usable.sum())} embeddings ready in {time.perf_counter() - start:.1f}s")
+
+    row_of = {p: i for i, p in enumerate(paths)}
+    train_items, val_items = split_dataset(paths, labels, args.validation_split, args.seed)
+    train_items = [(p, l) for p, l in train_items if usable[row_of[p]]]
+    val_items = [(p, l) for p, l in val_items if usable[row_of[p]]]
+
+    num_classes = len(class_names)
+
+    def arrays(items):
+        x = vectors[[row_of[p] for p, _ in items]] if items else np.zeros((0, 1280), np.float32)
+        y = tf.keras.utils.to_categorical([l for _, l in items], num_classes)
+        return x, y
+
+    x_train, y_train = arrays(train_items)
+    validation = arrays(val_items) if val_items else None
+
+    if labels_path:
+        with open(labels_path, "w") as f:
+            json.dump({str(i): name for i, name in enumerate(class_names)}, f, indent=2)
+        print(f"✅ Labels saved to: {labels_path}")
+
+    head_model = _head_model(num_classes, head)
+    head_model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=args.learning_rate),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"]
+    )
+    throughput = ThroughputLogger(len(train_items))
+    callbacks = [throughput]
+    if validation:
+        callbacks.append(EarlyStopping(monitor=early_stop_monitor, patience=args.patience,
+                                       restore_best_weights=True, verbose=1))
+
+    print(f"\n🔥 Training head on {len(train_items)} embeddings...")
+    start = time.perf_counter()
+    history = head_model.fit(x_train, y_train, validation_data=validation, epochs=args.epochs,
+                             batch_size=args.batch_size, shuffle=True, callbacks=callbacks, verbose=2)
+    print(f"\n⏱️  Head training took {time.perf_counter() - start:.1f}s")
+
+    # Graft the trained head onto the frozen base (same layout as build_model)
+    model = build_model(num_classes, head)
+    full_dense = [layer for layer in model.layers if isinstance(layer, Dense)]
+    head_dense = [layer for layer in head_model.layers if isinstance(layer, Dense)]
+    for target, source in zip(full_dense, head_dense):
+        target.set_weights(source.get_weights())
+    model.save(args.model_path)
+
+    return {
+        "model": model,
+        "history": history,
+        "class_names": class_names,
+        "throughput": throughput.rates,
+    }
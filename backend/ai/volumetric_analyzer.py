@@ -1,18 +1,331 @@
+"""
+Volumetric Analyzer for UrbanEye AI
+Pothole depth map, volume, fill material and repair cost from one photo
+
+Runs on CPU inside the pothole's YOLO bounding box (plus a margin of road
+around it, which gives the surface level):
+
+1. Relative depth of the crop from either
+   - a small monocular-depth ONNX model (MiDaS-small style, inverse depth
+     output) when VOLUMETRIC_DEPTH_MODEL points to one and onnxruntime is
+     installed, or
+   - classical shape-from-shading: after dividing out the large-scale
+     illumination, a pothole's walls and floor are darker than the road
+     (self-shadowing), so the shading deficit against the road ring is
+     used as a relative depth profile.
+2. The pothole is the largest connected region clearly below road level
+   inside the box.
+3. Metric scale from two documented assumptions: the photo spans
+   VOLUMETRIC_GROUND_WIDTH_M of road, and the deepest point is
+   DEPTH_TO_WIDTH of the pothole's equivalent diameter (clamped to
+   MIN/MAX_DEPTH_M). Volume is the integral of the scaled profile.
+
+A colourised depth map is stored next to the uploads
+(uploads/depth/ab/<sha256>_<box>.jpg, served by /uploads/depth/...) and
+the result JSON beside it, so the same image + box is never analysed twice
+by any worker.
+
+The report request never waits for this: schedule_volume_enrichment() runs
+the "volume" inference stage on a small background executor and writes
+`volumetric_data` onto the issue when it finishes.
+"""
+
+import hashlib
+import json
+import contextvars
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+# Bump when the estimate changes so cached results are recomputed
+VOLUME_VERSION = 1
+
+VOLUMETRIC_ENRICHMENT = os.getenv("VOLUMETRIC_ENRICHMENT", "true").lower() == "true"
+VOLUMETRIC_WORKERS = int(os.getenv("VOLUMETRIC_WORKERS", "1"))
+DEPTH_MODEL_PATH = os.getenv("VOLUMETRIC_DEPTH_MODEL")
+DEPTH_MODEL_SIZE = 256
+
+# Scale assumptions (no camera calibration is available for user photos)
+GROUND_WIDTH_M = float(os.getenv("VOLUMETRIC_GROUND_WIDTH_M", "2.5"))
+DEPTH_TO_WIDTH = 0.12
+MIN_DEPTH_M = 0.02
+MAX_DEPTH_M = 0.25
+
+# Crop: margin of road around the box (fraction of box size), working size
+BOX_MARGIN = 0.25
+WORK_SIDE = 256
+# Shading deficit below this is asphalt texture, not a depression
+MIN_SHADING_DEFICIT = 0.05
+
+# Cold-mix asphalt, compacted (kg per litre) and supplied cost (INR per kg)
+ASPHALT_KG_PER_L = 2.4
+COST_PER_KG = 15.0
+
+DEPTH_KEY_PREFIX = "uploads/depth"
+
+depth_session = None
+_session_lock = threading.Lock()
+_executor = None
+
+
+# ----------------------------------------------------------------------
+# Relative depth
+# ----------------------------------------------------------------------
+def _load_depth_model():
+    global depth_session
+    if depth_session is None and ONNX_AVAILABLE and DEPTH_MODEL_PATH and os.path.exists(DEPTH_MODEL_PATH):
+        with _session_lock:
+            if depth_session is None:
+                options = ort.SessionOptions()
+                options.intra_op_num_threads = 1
+                depth_session = ort.InferenceSession(DEPTH_MODEL_PATH, options, providers=["CPUExecutionProvider"])
+    return depth_session
+
+
+def _onnx_depth(crop_bgr):
+    """Relative depth (larger = deeper) from the ONNX inverse-depth model"""
+    session = _load_depth_model()
+    h, w = crop_bgr.shape[:2]
+    rgb = cv2.cvtColor(cv2.resize(crop_bgr, (DEPTH_MODEL_SIZE, DEPTH_MODEL_SIZE)), cv2.COLOR_BGR2RGB)
+    x = (rgb.astype(np.float32) / 255.0 - (0.485, 0.456, 0.406)) / (0.229, 0.224, 0.225)
+    x = x.transpose(2, 0, 1)[None].astype(np.float32)
+    inverse = np.squeeze(session.run(None, {session.get_inputs()[0].name: x})[0]).astype(np.float32)
+    inverse = cv2.resize(inverse, (w, h), interpolation=cv2.INTER_LINEAR)
+    return inverse.max() - inverse  # farther from the camera = deeper
+
+
+def _shading_depth(crop_bgr):
+    """Relative depth from the shading deficit against the local illumination"""
+    gray = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32) + 1.0
+    side = max(gray.shape)
+    illumination = cv2.GaussianBlur(gray, (0, 0), sigmaX=side / 3.0)
+    shading = gray / illumination
+    # Suppress asphalt texture, keep the bowl
+    shading = cv2.GaussianBlur(shading, (0, 0), sigmaX=max(1.0, side / 64.0))
+    return 1.0 - shading
+
+
+def _crop(bgr, box):
+    """Box grown by BOX_MARGIN, the box position inside the crop, downscale factor"""
+    h, w = bgr.shape[:2]
+    if box is None:
+        # No detection: assume the subject is centred
+        box = [w * 0.2, h * 0.2, w * 0.8, h * 0.8]
+    x1, y1, x2, y2 = [float(v) for v in box]
+    mx, my = (x2 - x1) * BOX_MARGIN, (y2 - y1) * BOX_MARGIN
+    cx1, cy1 = int(max(0, x1 - mx)), int(max(0, y1 - my))
+    cx2, cy2 = int(min(w, x2 + mx)), int(min(h, y2 + my))
+    crop = bgr[cy1:cy2, cx1:cx2]
+    scale = min(1.0, WORK_SIDE / float(max(crop.shape[:2]) or 1))
+    if scale < 1.0:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    inner = [int((x1 - cx1) * scale), int((y1 - cy1) * scale), int((x2 - cx1) * scale), int((y2 - cy1) * scale)]
+    return crop, inner, scale
+
+
+def _pothole_mask(depth, inner, min_contrast=0.0):
+    """Largest region clearly below the surrounding road level inside the box"""
+    x1, y1, x2, y2 = inner
+    ring = np.ones(depth.shape, dtype=bool)
+    ring[y1:y2, x1:x2] = False
+    road_level = float(np.median(depth[ring])) if ring.any() else float(np.percentile(depth, 10))
+    relative = np.clip(depth - road_level, 0, None)
+
+    inside = relative[y1:y2, x1:x2]
+    if inside.size == 0 or inside.max() <= max(min_contrast, 1e-6):
+        return None, relative
+    scaled = (inside / inside.max() * 255).astype(np.uint8)
+    _, binary = cv2.threshold(scaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary)
+    if count < 2:
+        return None, relative
+    largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    mask = np.zeros(depth.shape, dtype=bool)
+    mask[y1:y2, x1:x2] = labels == largest
+    return mask, relative
+
+
+def _depth_map_image(crop, relative, mask, inner):
+    norm = (relative / max(float(relative.max()), 1e-6) * 255).astype(np.uint8)
+    colour = cv2.applyColorMap(norm, cv2.COLORMAP_INFERNO)
+    blended = cv2.addWeighted(colour, 0.65, crop, 0.35, 0)
+    contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cv2.drawContours(blended, contours, -1, (255, 255, 255), 1)
+    cv2.rectangle(blended, tuple(inner[:2]), tuple(inner[2:]), (0, 255, 0), 1)
+    return blended
+
 
-def analyze_volume(image_path):
+def estimate_volume(bgr, box=None):
     """
-    Mock version to prevent crashes during debugging.
+    Volume estimate for the pothole in `box` of a decoded image.
+
+    Returns:
+        tuple: (result dict without storage fields, depth-map BGR image) or (None, None)
     """
+    crop, inner, scale = _crop(bgr, box)
+    if min(crop.shape[:2]) < 16:
+        return None, None
+
+    method = "shape_from_shading"
+    depth = None
+    if _load_depth_model() is not None:
+        try:
+            depth = _onnx_depth(crop)
+            method = "onnx_depth"
+        except Exception as e:
+            log.warning("Depth model failed, using shape-from-shading", error=str(e))
+    if depth is None:
+        depth = _shading_depth(crop)
+
+    mask, relative = _pothole_mask(depth, inner, MIN_SHADING_DEFICIT if method == "shape_from_shading" else 0.0)
+    if mask is None or not mask.any():
+        return None, None
+
+    # Ground size of one working pixel
+    pixel_m = GROUND_WIDTH_M / float(bgr.shape[1]) / scale
+    area_m2 = float(mask.sum()) * pixel_m ** 2
+    diameter_m = 2.0 * np.sqrt(area_m2 / np.pi)
+    max_depth_m = float(np.clip(DEPTH_TO_WIDTH * diameter_m, MIN_DEPTH_M, MAX_DEPTH_M))
+
+    profile = relative[mask]
+    profile = profile / max(float(profile.max()), 1e-6)
+    volume_l = float(profile.sum()) * pixel_m ** 2 * max_depth_m * 1000.0
+    material_kg = volume_l * ASPHALT_KG_PER_L
+
+    result = {
+        "volume_liters": round(volume_l, 1),
+        "material_kg": round(material_kg, 1),
+        "repair_cost": round(material_kg * COST_PER_KG, 0),
+        "surface_area_m2": round(area_m2, 3),
+        "max_depth_cm": round(max_depth_m * 100, 1),
+        "method": method,
+        "bounding_box": [round(float(v), 1) for v in box] if box is not None else None,
+        "assumptions": {"ground_width_m": GROUND_WIDTH_M, "depth_to_width": DEPTH_TO_WIDTH},
+        "version": VOLUME_VERSION,
+    }
+    return result, _depth_map_image(crop, relative, mask, inner)
+
+
+# ----------------------------------------------------------------------
+# Cached entry point
+# ----------------------------------------------------------------------
+def _cache_keys(digest, box):
+    box_tag = hashlib.md5(json.dumps([round(float(v)) for v in box] if box is not None else None)
+                          .encode()).hexdigest()[:8]
+    stem = f"{DEPTH_KEY_PREFIX}/{digest[:2]}/{digest}_{box_tag}_v{VOLUME_VERSION}"
+    return f"{stem}.json", f"{stem}.jpg"
+
+
+def analyze_volume(image, bounding_box=None, digest=None):
+    """
+    Depth map and volume/material/cost estimate for a pothole photo.
+    Cached by image content hash + box in storage, shared by all workers.
+
+    Args:
+        image: File path or ImageContext
+        bounding_box: [x1, y1, x2, y2] of the YOLO pothole box (None: image centre)
+        digest: SHA-256 of the image bytes if already known
+
+    Returns:
+        dict: volume_liters, material_kg, repair_cost, depth_map_filename, ... or None
+    """
+    if not CV2_AVAILABLE:
+        return None
     try:
-        # Simulate successful analysis
-        return {
-            "volume_liters": 12.5,
-            "material_kg": 30.0,
-            "repair_cost": 450.0,
-            "depth_map_filename": "mock_depth.jpg", # Placeholder
-            "depth_map_path": image_path 
-        }
+        from ai.image_context import ImageContext
+        from services.metrics import metrics
+        from services.storage import storage
+
+        ctx = ImageContext.ensure(image)
+        digest = digest or hashlib.sha256(ctx.data).hexdigest()
+        result_key, depth_key = _cache_keys(digest, bounding_box)
+        cached = storage.exists(result_key)
+        metrics.cache_result("volume", hit=cached)
+        if cached:
+            with open(storage.local_path(result_key)) as f:
+                return json.load(f)
+
+        bgr = ctx.bgr
+        if bgr is None:
+            return None
+        result, depth_map = estimate_volume(bgr, bounding_box)
+        if result is None:
+            return None
+
+        tmp_dir = tempfile.mkdtemp(prefix="depth_")
+        try:
+            depth_tmp = os.path.join(tmp_dir, "depth.jpg")
+            cv2.imwrite(depth_tmp, depth_map, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            storage.put_file(depth_tmp, key=depth_key)
+            result["depth_map_filename"] = depth_key[len("uploads/"):]
+            result["content_sha256"] = digest
+
+            result_tmp = os.path.join(tmp_dir, "result.json")
+            with open(result_tmp, "w") as f:
+                json.dump(result, f)
+            storage.put_file(result_tmp, key=result_key)
+        finally:
+            for name in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, name))
+            os.rmdir(tmp_dir)
+        return result
     except Exception as e:
-        print(f"Volumetric Error: {e}")
+        log.error("Volumetric error", error=str(e))
+        return None
+
+
+# ----------------------------------------------------------------------
+# Async enrichment
+# ----------------------------------------------------------------------
+def enrich_issue_volume(issue_id, image_path, bounding_box=None, digest=None):
+    """Run the volume stage for a stored issue and save `volumetric_data`"""
+    try:
+        from bson import ObjectId
+        from config import issues_collection
+        from ai.inference_service import run_inference
+        from services.storage import storage
+
+        result = run_inference("volume", storage.local_path(image_path), bounding_box, digest)
+        if result is None:
+            return None
+        issues_collection.update_one({"_id": ObjectId(issue_id)}, {"$set": {"volumetric_data": result}})
+        log.info("Volume estimated", issue_id=str(issue_id), volume_liters=result["volume_liters"], method=result["method"])
+        return result
+    except Exception as e:
+        log.warning("Volume enrichment failed", issue_id=str(issue_id), error=str(e))
+        return None
+
+
+def schedule_volume_enrichment(issue_id, image_path, bounding_box=None, digest=None):
+    """
+    Queue volume estimation off the request thread (no-op when disabled).
+    A small bounded executor keeps at most VOLUMETRIC_WORKERS running in
+    the web process.
+    """
+    global _executor
+    if not VOLUMETRIC_ENRICHMENT or not CV2_AVAILABLE:
         return None
+    with _session_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=VOLUMETRIC_WORKERS, thread_name_prefix="volume")
+    # Run in a copy of the caller's context so the request ID follows the job
+    ctx = contextvars.copy_context()
+    return _executor.submit(ctx.run, enrich_issue_volume, str(issue_id), image_path, bounding_box, digest)
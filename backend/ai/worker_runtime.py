@@ -0,0 +1,82 @@
+"""
+Worker Runtime Helpers for UrbanEye AI
+Keeps the AI pipeline friendly to both gunicorn worker profiles
+
+- sync profile (default): every request owns an OS thread, nothing special.
+- gevent profile (GUNICORN_WORKER_PROFILE=gevent): sockets are monkey-patched
+  so Gemini/OpenAI/Mongo calls yield to other requests while they wait.
+  CPU-bound OpenCV/TensorFlow work must NOT run on the event loop, so it is
+  pushed onto a small pool of real OS threads (cv2 and TF release the GIL).
+"""
+
+import contextvars
+import os
+import threading
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+CPU_EXECUTOR_THREADS = int(os.getenv("CPU_EXECUTOR_THREADS", "2"))
+
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
+
+def is_cooperative():
+    """True when running inside a gevent-patched (cooperative) worker"""
+    try:
+        from gevent import monkey
+        return monkey.is_module_patched("socket")
+    except ImportError:
+        return False
+
+
+def _get_cpu_pool():
+    global _cpu_pool
+    if _cpu_pool is None:
+        with _cpu_pool_lock:
+            if _cpu_pool is None:
+                from gevent.threadpool import ThreadPool
+                _cpu_pool = ThreadPool(maxsize=CPU_EXECUTOR_THREADS)
+                log.info("CPU executor ready", threads=CPU_EXECUTOR_THREADS)
+    return _cpu_pool
+
+
+def run_cpu(fn, *args, **kwargs):
+    """
+    Run a CPU-bound function without starving the event loop.
+
+    In the sync profile this is a plain call. In the gevent profile the call
+    is executed on a bounded native thread pool and the calling greenlet
+    waits cooperatively, so at most CPU_EXECUTOR_THREADS OpenCV/TF jobs run
+    at once while other requests keep streaming through Gemini/Mongo.
+    The caller's context (request ID, log fields) travels with the call.
+    """
+    if not is_cooperative():
+        return fn(*args, **kwargs)
+    ctx = contextvars.copy_context()
+    return _get_cpu_pool().spawn(ctx.run, fn, *args, **kwargs).get()
+
+
+def configure_gemini(api_key):
+    """
+    Configure google-generativeai for the current worker profile.
+
+    The default gRPC transport blocks the gevent hub, so cooperative workers
+    use the REST transport (plain HTTP through the patched sockets).
+    GEMINI_TRANSPORT overrides the choice and GEMINI_API_ENDPOINT points the
+    client at a different host (e.g. a local stub for load tests).
+    """
+    import google.generativeai as genai
+
+    options = {}
+    transport = os.getenv("GEMINI_TRANSPORT") or ("rest" if is_cooperative() else None)
+    if transport:
+        options["transport"] = transport
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    if endpoint:
+        options["client_options"] = {"api_endpoint": endpoint}
+
+    genai.configure(api_key=api_key, **options)
+    return genai
@@ -1,5 +1,6 @@
 try:
     import cv2
+    import numpy as np
     CV2_AVAILABLE = True
 except ImportError:
     CV2_AVAILABLE = False
@@ -13,85 +14,175 @@ except ImportError:
 import os
 import json
 
+from ai.image_context import ImageContext
+from services.log import get_logger
+
+log = get_logger(__name__)
+
 # Load YOLOv8 Nano model lazily - skip on cloud if not available
 MODEL_PATH = "yolov8n.pt"
 model = None
 
+# Inference settings (imgsz/half trade accuracy for throughput; half needs a GPU)
+IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+HALF = os.getenv("YOLO_HALF", "false").lower() == "true"
+CONF = float(os.getenv("YOLO_CONF", "0.25"))
+IOU = float(os.getenv("YOLO_IOU", "0.45"))
+BATCH_SIZE = int(os.getenv("YOLO_BATCH_SIZE", "16"))
+MAX_DET = 100
+
+# Severity from the damaged share of the image. The old cut-offs were
+# 5,000 / 15,000 px box areas in original-image pixels (ultralytics returns
+# boxes in source coordinates), so they meant a different share at every
+# resolution. The ratios reproduce them exactly at the median size of the
+# photos in uploads/ (187,500 px, ~500x375) and stay fixed above and below it.
+SEVERITY_REFERENCE_PIXELS = 187_500
+SEVERITY_RATIOS = ((5000 / SEVERITY_REFERENCE_PIXELS, "Low", 500),
+                   (15000 / SEVERITY_REFERENCE_PIXELS, "Medium", 1500))
+HIGH_SEVERITY = ("High", 3000)
+
+# Mapping COCO/Generic classes to UrbanEye classes (Fallback logic)
+# Note: In a real scenario, the model would be trained on pothole, garbage, etc.
+ISSUE_MAPPING = {
+    "pothole": "pothole",
+    "garbage": "garbage",
+    "water_leak": "water_leak",
+    "streetlight": "streetlight"
+}
+
+
 def _get_model():
     global model
     if model is None and YOLO_AVAILABLE and os.path.exists(MODEL_PATH):
         try:
             model = YOLO(MODEL_PATH)
         except Exception as e:
-            print(f"⚠️ Could not load YOLO model: {e}")
+            log.warning("Could not load YOLO model", error=str(e))
     return model
 
 
-def detect_issue(image_path):
+def union_area(boxes, width, height):
+    """
+    Pixel area covered by a set of (x1, y1, x2, y2) boxes, overlaps counted once.
+    Rasterised on the compressed grid of box edges, so it is exact.
+    """
+    if len(boxes) == 0:
+        return 0.0
+    boxes = np.clip(np.asarray(boxes, dtype=np.float64), 0, [width, height, width, height])
+    xs = np.unique(boxes[:, [0, 2]])
+    ys = np.unique(boxes[:, [1, 3]])
+    covered = np.zeros((len(ys) - 1, len(xs) - 1), dtype=bool)
+    for x1, y1, x2, y2 in boxes:
+        covered[np.searchsorted(ys, y1):np.searchsorted(ys, y2),
+                np.searchsorted(xs, x1):np.searchsorted(xs, x2)] = True
+    cell_areas = np.outer(np.diff(ys), np.diff(xs))
+    return float(cell_areas[covered].sum())
+
+
+def severity_for_ratio(ratio):
+    """(label, repair cost) for the damaged share of the image"""
+    for limit, label, cost in SEVERITY_RATIOS:
+        if ratio < limit:
+            return label, cost
+    return HIGH_SEVERITY
+
+
+def _summarise(detections, width, height):
+    """Reduce all detections of one image to the detect_issue result"""
+    if not detections:
+        return None
+
+    # Primary issue: class of the most confident detection (as before).
+    # Only boxes of that class count as damage: unmapped COCO classes share
+    # "infrastructure_anomaly", and cars or people must not add to the area.
+    primary = max(detections, key=lambda d: d["confidence"])
+    issue_type = primary["issue_type"]
+    same_issue = [d["bounding_box"] for d in detections if d["class_name"] == primary["class_name"]]
+
+    area = union_area(same_issue, width, height)
+    ratio = area / float(width * height) if width and height else 0.0
+    severity, cost = severity_for_ratio(ratio)
+
+    return {
+        "issue_type": issue_type,
+        "bounding_box": primary["bounding_box"],
+        "detected_area_pixels": round(area, 2),
+        "damaged_area_ratio": round(ratio, 5),
+        "severity_score": severity,
+        "estimated_repair_cost": cost,
+        "confidence": primary["confidence"],
+        "detection_count": len(same_issue),
+        "detections": detections,
+    }
+
+
+def _detections(result, names):
+    """All boxes of one ultralytics result as plain dicts"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return []
+    xyxy = boxes.xyxy.cpu().numpy().tolist()
+    conf = boxes.conf.cpu().numpy().tolist()
+    cls = boxes.cls.cpu().numpy().astype(int).tolist()
+    detections = []
+    for coords, score, class_id in zip(xyxy, conf, cls):
+        class_name = names[class_id]
+        detections.append({
+            "class_name": class_name,
+            # If the detected class isn't in our mapping, we label it as 'other'
+            "issue_type": class_name if class_name in ISSUE_MAPPING else "infrastructure_anomaly",
+            "bounding_box": [round(c, 2) for c in coords],
+            "confidence": float(score),
+        })
+    return detections
+
+
+def detect_issues_batch(images):
+    """
+    Detect civic issues in many images with batched YOLOv8 predicts.
+    Keeps every detection (class-aware NMS) and rates severity from the
+    total damaged area relative to the image size.
+
+    Args:
+        images: Paths or shared ImageContexts
+
+    Returns:
+        list: One detect_issue result (or None) per image
+    """
+    yolo_model = _get_model()
+    if not yolo_model:
+        return [None] * len(images)  # YOLO not available on this server
+
+    out = [None] * len(images)
+    # Feed the already decoded BGR arrays (no second decode)
+    frames = [(i, ImageContext.ensure(image).bgr) for i, image in enumerate(images)]
+    frames = [(i, f) for i, f in frames if f is not None]
+
+    for start in range(0, len(frames), BATCH_SIZE):
+        chunk = frames[start:start + BATCH_SIZE]
+        try:
+            results = yolo_model.predict(
+                [f for _, f in chunk], imgsz=IMGSZ, half=HALF, conf=CONF, iou=IOU,
+                agnostic_nms=False, max_det=MAX_DET, verbose=False
+            )
+        except Exception as e:
+            log.error("YOLO detection error", error=str(e))
+            continue
+        for (i, frame), result in zip(chunk, results):
+            height, width = frame.shape[:2]
+            out[i] = _summarise(_detections(result, yolo_model.names), width, height)
+    return out
+
+
+def detect_issue(image):
     """
     Detect civic issues using YOLOv8.
     Predicts issue type, severity, and repair cost.
-    
+
     Args:
-        image_path (str): Path to the uploaded image
-        
+        image: Path to the uploaded image or a shared ImageContext
+
     Returns:
         dict: Detection results including issue_type, bounding_box, area, severity, and cost.
     """
-    yolo_model = _get_model()
-    if not yolo_model:
-        return None  # YOLO not available on this server
-    try:
-        results = yolo_model.predict(image_path, conf=0.25)
-        
-        if not results or len(results[0].boxes) == 0:
-            return None
-            
-        # Get the primary detection (highest confidence)
-        box = results[0].boxes[0]
-        class_id = int(box.cls[0])
-        class_name = model.names[class_id]
-        
-        # Calculate bounding box coordinates and area
-        # box.xyxy returns [x1, y1, x2, y2]
-        coords = box.xyxy[0].tolist()
-        x1, y1, x2, y2 = coords
-        width = x2 - x1
-        height = y2 - y1
-        area = width * height
-        
-        # Mapping COCO/Generic classes to UrbanEye classes (Fallback logic)
-        # Note: In a real scenario, the model would be trained on pothole, garbage, etc.
-        issue_mapping = {
-            "pothole": "pothole",
-            "garbage": "garbage",
-            "water_leak": "water_leak",
-            "streetlight": "streetlight"
-        }
-        
-        # If the detected class isn't in our mapping, we label it as 'other'
-        issue_type = class_name if class_name in issue_mapping else "infrastructure_anomaly"
-        
-        # Severity Logic based on bounding box area
-        if area < 5000:
-            severity = "Low"
-            cost = 500
-        elif area < 15000:
-            severity = "Medium"
-            cost = 1500
-        else:
-            severity = "High"
-            cost = 3000
-            
-        return {
-            "issue_type": issue_type,
-            "bounding_box": coords,
-            "detected_area_pixels": round(area, 2),
-            "severity_score": severity,
-            "estimated_repair_cost": cost,
-            "confidence": float(box.conf[0])
-        }
-        
-    except Exception as e:
-        print(f"❌ YOLO Detection Error: {e}")
-        return None
+    return detect_issues_batch([image])[0]
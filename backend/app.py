@@ -1,7 +1,9 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, send_from_directory, send_file, request, jsonify, redirect, g, Response, abort
+from werkzeug.security import safe_join
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import time
 
 # Optional local .env loading
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -9,8 +11,15 @@ env_path = os.path.join(basedir, '.env')
 if os.path.exists(env_path):
     load_dotenv(env_path)
 
+from services.upload_streaming import StreamingRequest, MAX_CONTENT_LENGTH
+from services.metrics import metrics
+from services.log import new_request_id, get_request_id, clear_request_id
+from services.tracing import tracer
+
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = None 
+# Uploads stream straight to disk with per-media limits (services/upload_streaming.py)
+app.request_class = StreamingRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 @app.route("/")
@@ -23,6 +32,50 @@ def health_check():
     """Ultra-fast health check for Render"""
     return {"status": "ok", "message": "UrbanEye Live"}, 200
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Tags every log record of this request (and the stages it runs)
+    rid = new_request_id(request.headers.get("X-Request-ID"))
+    # Root span: stage spans nest under it and its timings feed pipeline_timings
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.trace_span = tracer.begin(f"{request.method} {route}", traceparent=request.headers.get("traceparent"),
+                                **{"http.method": request.method, "http.route": route, "request.id": rid})
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # Route template (not the raw path) keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe("urbaneye_http_request_seconds", time.perf_counter() - started,
+                        method=request.method, route=route, status=response.status_code)
+    response.headers["X-Request-ID"] = get_request_id() or ""
+    span = g.get("trace_span")
+    if span is not None:
+        span.set(**{"http.status_code": response.status_code})
+        response.headers["X-Trace-ID"] = span.trace_id
+    return response
+
+@app.teardown_request
+def end_request_context(exc):
+    span = g.pop("trace_span", None)
+    if span is not None:
+        tracer.end(span, error=exc)
+    clear_request_id()
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint (all gunicorn workers, see services/metrics.py)"""
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.errorhandler(413)
+def handle_413(error):
+    return jsonify({"error": "Payload Too Large", "message": error.description}), 413
+
 @app.errorhandler(500)
 def handle_500(error):
     return jsonify({"error": "Internal Server Error", "message": str(error)}), 500
@@ -50,10 +103,43 @@ app.register_blueprint(features_bp, url_prefix="/api/features")
 if CHATBOT_AVAILABLE:
     app.register_blueprint(chatbot_bp)
 
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
 @app.route("/uploads/<path:filename>")
 def uploaded_file(filename):
+    """
+    Serve an upload. ?size=thumb|medium returns a small WebP (JPEG if the
+    client does not accept WebP) rendition with a strong ETag; Range and
+    conditional requests are handled by send_file.
+    """
     clean_name = filename.replace("uploads/", "").replace("uploads\\", "")
-    return send_from_directory("uploads", clean_name)
+    if not safe_join("uploads", clean_name):
+        abort(404)  # path traversal (../x), whatever the storage backend
+    size = request.args.get("size")
+
+    if size:
+        from services.image_renditions import rendition_service
+        # Browsers list image/webp explicitly; anything else gets JPEG
+        accept_webp = any(mime == "image/webp" for mime, _ in request.accept_mimetypes)
+        rendition = rendition_service.resolve(clean_name, size, accept_webp=accept_webp)
+        if rendition:
+            path, mimetype, etag = rendition
+            response = send_file(path, mimetype=mimetype, etag=etag, conditional=True,
+                                 max_age=31536000)
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE
+            response.vary.add("Accept")
+            return response
+
+    from services.storage import storage
+    if storage.is_remote:
+        # S3/MinIO: hand the client a short-lived signed URL
+        return redirect(storage.url(f"uploads/{clean_name}"))
+
+    # Upload names are content hashes or unique (timestamp + uuid), never overwritten
+    response = send_from_directory(os.path.join(storage.root, "uploads"), clean_name,
+                                   conditional=True, max_age=31536000)
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE
+    return response
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,43 @@
+"""
+Issue-batch analytics: hotspot clustering, auto-resolution scoring and
+contractor matching as the number of issues / registry entries grows.
+"""
+
+import pytest
+
+from ai.auto_resolution_engine import analyze_issue, recommend_contractor
+from ai.predictive_analytics import detect_hotspots
+
+from conftest import ISSUE_BATCH_SIZES, REGISTRY_SIZES, make_contractors
+
+# detect_hotspots is quadratic: keep the large batches to a few rounds
+HOTSPOT_ROUNDS = {100: 20, 500: 5, 2000: 3}
+
+
+@pytest.mark.parametrize("issues", ISSUE_BATCH_SIZES)
+def bench_detect_hotspots(benchmark, memory, issue_batch, issues):
+    batch = issue_batch(issues)
+    hotspots = benchmark.pedantic(detect_hotspots, args=(batch,), rounds=HOTSPOT_ROUNDS[issues])
+    memory(detect_hotspots, batch)
+    assert isinstance(hotspots, list)
+
+
+@pytest.mark.parametrize("issues", ISSUE_BATCH_SIZES)
+def bench_analyze_issue(benchmark, memory, issue_batch, issues):
+    batch = issue_batch(issues)
+
+    def analyze_all():
+        return [analyze_issue(issue) for issue in batch]
+
+    results = benchmark(analyze_all)
+    memory(analyze_all)
+    assert len(results) == issues
+
+
+@pytest.mark.parametrize("registry", REGISTRY_SIZES)
+def bench_recommend_contractor(benchmark, memory, issue_batch, registry):
+    issue = next(i for i in issue_batch(100) if i["issue_type"] == "pothole")
+    contractors = make_contractors(registry)
+    result = benchmark(recommend_contractor, issue, contractors)
+    memory(recommend_contractor, issue, contractors)
+    assert result["status"] == "success"
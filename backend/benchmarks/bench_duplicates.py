@@ -0,0 +1,32 @@
+"""
+Duplicate detection: single hash comparisons and the candidate scan of
+find_potential_duplicate as the number of open nearby issues grows.
+"""
+
+import pytest
+
+import ai.duplicate_detector as duplicate_detector
+from ai.duplicate_detector import find_potential_duplicate, hamming_distance
+from ai.perceptual_hash import to_hex
+
+from conftest import CANDIDATE_SIZES, InMemoryIssues, make_candidates
+
+QUERY_HASH = 0x9F3A5C7E1B2D4F60
+LAT, LNG = 12.9716, 77.5946
+
+
+@pytest.mark.parametrize("kind", ["hex", "int"])
+def bench_hamming_distance(benchmark, kind):
+    a, b = QUERY_HASH, QUERY_HASH ^ 0xFF00FF
+    if kind == "hex":
+        a, b = to_hex(a), to_hex(b)
+    assert benchmark(hamming_distance, a, b) == 16
+
+
+@pytest.mark.parametrize("candidates", CANDIDATE_SIZES)
+def bench_find_potential_duplicate(benchmark, memory, monkeypatch, candidates):
+    monkeypatch.setattr(duplicate_detector, "issues_collection",
+                        InMemoryIssues(make_candidates(candidates, LAT, LNG, QUERY_HASH)))
+    match = benchmark(find_potential_duplicate, QUERY_HASH, LAT, LNG)
+    memory(find_potential_duplicate, QUERY_HASH, LAT, LNG)
+    assert match is not None
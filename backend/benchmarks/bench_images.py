@@ -0,0 +1,43 @@
+"""
+Per-image stages: dHash, severity and EXIF forensics across resolutions.
+Every round gets a fresh ImageContext, so JPEG decoding is part of the cost
+(as in a real report, where these stages share one context).
+"""
+
+import pytest
+
+from ai.duplicate_detector import compute_dhash
+from ai.image_context import ImageContext
+from ai.metadata_forensics import analyze_metadata
+from ai.severity_model import estimate_severity
+
+RESOLUTIONS = ["vga", "hd", "12mp"]
+ROUNDS = {"vga": 40, "hd": 20, "12mp": 8}
+
+
+@pytest.mark.parametrize("resolution", RESOLUTIONS)
+def bench_compute_dhash(benchmark, memory, image_bytes, fresh_context, resolution):
+    data = image_bytes(resolution)
+    result = benchmark.pedantic(compute_dhash, setup=fresh_context(data), rounds=ROUNDS[resolution])
+    memory(compute_dhash, ImageContext(data=data))
+    assert len(result) == 16
+
+
+@pytest.mark.parametrize("analysis_side", [512, None], ids=["pyramid512", "fullres"])
+@pytest.mark.parametrize("resolution", RESOLUTIONS)
+def bench_estimate_severity(benchmark, memory, image_bytes, fresh_context, resolution, analysis_side):
+    data = image_bytes(resolution)
+    result = benchmark.pedantic(estimate_severity, setup=fresh_context(data, "pothole", analysis_side=analysis_side),
+                                rounds=ROUNDS[resolution])
+    memory(estimate_severity, ImageContext(data=data), "pothole", analysis_side=analysis_side)
+    assert 1 <= result["score"] <= 10
+
+
+@pytest.mark.parametrize("exif", [True, False], ids=["exif", "stripped"])
+@pytest.mark.parametrize("resolution", RESOLUTIONS)
+def bench_analyze_metadata(benchmark, memory, image_bytes, resolution, exif):
+    # Header-only parsing: the cost should not grow with resolution
+    ctx = ImageContext(data=image_bytes(resolution, exif=exif))
+    result = benchmark(analyze_metadata, ctx, 12.9716, 77.5946)
+    memory(analyze_metadata, ctx, 12.9716, 77.5946)
+    assert result["status"] == ("Fresh" if exif else "Unknown")
@@ -0,0 +1,245 @@
+"""
+Micro-benchmarks for the ai/ hot functions
+pytest-benchmark timings + tracemalloc memory, fully offline
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest benchmarks                                # run all
+    python -m pytest benchmarks -k hotspots                    # one group
+    python -m pytest benchmarks --benchmark-autosave           # save to .benchmarks/
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:10%
+
+Inputs are generated here, deterministically:
+- images: synthetic road textures at several resolutions, with and without
+  EXIF (camera, capture time, GPS), as encoded JPEG bytes
+- candidate sets: what the duplicate query returns from MongoDB, served
+  from memory (InMemoryIssues) so only the Python/NumPy side is timed
+- issue batches: loadtest.seed documents (geo clusters, statuses)
+- contractor registries of growing size
+
+Nothing touches the network: importing config still tries to ping MongoDB
+once (up to 10 s without a local mongod), every query then hits
+InMemoryIssues.
+
+Memory: after the timed rounds (so one-time imports/caches are warm) the
+`memory` fixture runs the function once more under tracemalloc and stores
+peak and retained KiB in benchmark.extra_info (saved with --benchmark-json
+/ --benchmark-autosave, summarised at the end of the run). Retained is what
+is still allocated afterwards, e.g. views cached on an ImageContext.
+NumPy buffers are traced; OpenCV's internal scratch memory is not.
+"""
+
+import io
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+SEED = 1234
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "12mp": (4000, 3000),
+}
+CANDIDATE_SIZES = [100, 1000, 10000, 100000]
+ISSUE_BATCH_SIZES = [100, 500, 2000]
+REGISTRY_SIZES = [10, 100, 1000]
+
+_memory_results = []
+
+
+# ----------------------------------------------------------------------
+# Images
+# ----------------------------------------------------------------------
+def make_image(width, height, seed=SEED, exif=False):
+    """
+    JPEG bytes of an asphalt-like texture with dark pothole blobs and cracks.
+
+    Args:
+        exif: add camera, capture time and GPS tags (like a phone photo)
+    """
+    import cv2
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    gray = rng.normal(110, 18, (height, width)).clip(0, 255).astype(np.uint8)
+    img = cv2.cvtColor(cv2.GaussianBlur(gray, (5, 5), 0), cv2.COLOR_GRAY2BGR)
+    scale = width / 640
+    for _ in range(rng.integers(2, 6)):
+        center = (int(rng.integers(width)), int(rng.integers(height)))
+        axes = (int(rng.integers(20, 90) * scale), int(rng.integers(10, 50) * scale))
+        cv2.ellipse(img, center, axes, float(rng.integers(180)), 0, 360, (35, 35, 40), -1)
+    for _ in range(rng.integers(5, 15)):
+        pts = np.cumsum(rng.integers(-int(12 * scale) - 1, int(12 * scale) + 2, (12, 2)), axis=0)
+        pts += [int(rng.integers(width)), int(rng.integers(height))]
+        cv2.polylines(img, [pts.astype(np.int32)], False, (20, 20, 20), max(1, int(scale)))
+
+    pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    buf = io.BytesIO()
+    if exif:
+        pil.save(buf, "JPEG", quality=90, exif=_phone_exif())
+    else:
+        pil.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _phone_exif():
+    from PIL import Image
+
+    taken = (datetime.now() - timedelta(hours=2)).strftime("%Y:%m:%d %H:%M:%S")
+    exif = Image.Exif()
+    exif[0x010F] = "Google"          # Make
+    exif[0x0110] = "Pixel 8"         # Model
+    exif[0x0131] = "HDR+ 1.0"        # Software
+    exif.get_ifd(0x8769)[0x9003] = taken  # DateTimeOriginal
+    gps = exif.get_ifd(0x8825)
+    gps[1], gps[2] = "N", (12.0, 58.0, 17.76)
+    gps[3], gps[4] = "E", (77.0, 35.0, 40.56)
+    return exif
+
+
+@pytest.fixture(scope="session")
+def image_bytes():
+    """Cached factory: image_bytes("hd", exif=True) -> JPEG bytes"""
+    cache = {}
+
+    def get(resolution, exif=False):
+        key = (resolution, exif)
+        if key not in cache:
+            cache[key] = make_image(*RESOLUTIONS[resolution], exif=exif)
+        return cache[key]
+    return get
+
+
+@pytest.fixture
+def fresh_context():
+    """
+    Factory of setup callables for benchmark.pedantic: every round gets a
+    new ImageContext, so decoding is timed instead of the cached views.
+    """
+    from ai.image_context import ImageContext
+
+    def setup_for(data, *args, **kwargs):
+        def setup():
+            return (ImageContext(data=data), *args), kwargs
+        return setup
+    return setup_for
+
+
+# ----------------------------------------------------------------------
+# Candidate sets and issue batches
+# ----------------------------------------------------------------------
+class InMemoryIssues:
+    """
+    The parts of the issues collection find_potential_duplicate uses.
+    find() returns the candidates as given, i.e. what MongoDB would return
+    for the 7-day / open / same-media filter.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs
+        self._by_id = {doc["_id"]: doc for doc in docs}
+
+    def find(self, query=None, projection=None):
+        return iter(self.docs)
+
+    def find_one(self, query):
+        return self._by_id.get(query.get("_id"))
+
+
+def make_candidates(count, lat, lng, query_hash, seed=SEED):
+    """
+    Candidate issues around (lat, lng): ~10% inside the 30 m duplicate box,
+    random dHashes, and one near-duplicate of `query_hash` placed last so
+    the whole set is scanned before a match is found.
+    """
+    from bson import ObjectId
+    from ai.perceptual_hash import to_signed64
+
+    rng = np.random.default_rng(seed)
+    spread = np.where(rng.random(count) < 0.1, 0.0002, 0.01)
+    lats = lat + rng.normal(0, 1, count) * spread
+    lngs = lng + rng.normal(0, 1, count) * spread
+    hashes = rng.integers(0, 2 ** 63, count, dtype=np.int64)
+    hashes[-1] = to_signed64(query_hash ^ 0b101)  # 2 bits away
+    lats[-1], lngs[-1] = lat + 0.00005, lng - 0.00005
+    return [{"_id": ObjectId(), "latitude": f"{la:.6f}", "longitude": f"{lo:.6f}", "image_dhash": int(h)}
+            for la, lo, h in zip(lats, lngs, hashes)]
+
+
+@pytest.fixture(scope="session")
+def issue_batch():
+    """Cached factory: issue_batch(n) -> n loadtest.seed issue documents"""
+    from loadtest.seed import generate_issues
+
+    cache = {}
+    now = datetime.now()
+
+    def get(count):
+        if count not in cache:
+            cache[count] = list(generate_issues(count, seed=SEED, now=now))
+        return cache[count]
+    return get
+
+
+def make_contractors(count, seed=SEED):
+    """Contractor registry entries shaped like the admin Contractor Registry"""
+    rng = np.random.default_rng(seed)
+    specialties = ["pothole", "garbage", "water_leak", "streetlight", "General"]
+    registry = []
+    for i in range(count):
+        picked = [str(s) for s in rng.choice(specialties, size=int(rng.integers(1, 3)), replace=False)]
+        registry.append({
+            "name": f"Contractor {i}",
+            "specialty": picked[0],
+            "specialties": picked,
+            "rating": round(float(rng.uniform(2.5, 5.0)), 1),
+            "cost_rate": int(rng.integers(300, 2500)),
+            "available": bool(rng.random() < 0.8),
+            "verified": True,
+            "phone": f"+91 80 {rng.integers(10 ** 7, 10 ** 8)}",
+            "address": f"{i} Industrial Layout, Bengaluru",
+        })
+    return registry
+
+
+# ----------------------------------------------------------------------
+# Memory
+# ----------------------------------------------------------------------
+@pytest.fixture
+def memory(benchmark, request):
+    """
+    memory(fn, *args, **kwargs): one extra call under tracemalloc, made
+    after the timed rounds; peak and retained KiB go to benchmark.extra_info.
+    """
+    def measure(fn, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            result = fn(*args, **kwargs)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+        stats = {"tracemalloc_peak_kib": round((peak - before) / 1024, 1),
+                 "tracemalloc_retained_kib": round((current - before) / 1024, 1)}
+        benchmark.extra_info.update(stats)
+        _memory_results.append((request.node.nodeid.split("::", 1)[-1], stats))
+        return stats
+    return measure
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _memory_results:
+        return
+    terminalreporter.section("tracemalloc (one call, KiB)")
+    width = max(len(name) for name, _ in _memory_results)
+    terminalreporter.write_line(f"{'benchmark':<{width}}  {'peak':>10}  {'retained':>10}")
+    for name, stats in sorted(_memory_results):
+        terminalreporter.write_line(f"{name:<{width}}  {stats['tracemalloc_peak_kib']:>10}"
+                                    f"  {stats['tracemalloc_retained_kib']:>10}")
@@ -2,6 +2,12 @@ import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from services.metrics import metrics, MongoCommandMetrics
+from services.tracing import tracer, MongoCommandTracer
+from services.log import get_logger
+
+log = get_logger(__name__)
+
 # Optional local .env loading (ignored on Render if file doesn't exist)
 basedir = os.path.abspath(os.path.dirname(__file__))
 env_path = os.path.join(basedir, '.env')
@@ -13,12 +19,13 @@ if os.path.exists(env_path):
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 
 try:
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=10000)
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=10000,
+                         event_listeners=[MongoCommandMetrics(metrics), MongoCommandTracer(tracer)])
     # Trigger a ping to verify connection works
     client.admin.command('ping')
-    print("Successfully connected to MongoDB Cloud/Local")
+    log.info("Connected to MongoDB")
 except Exception as e:
-    print(f"MongoDB Connection Error: {e}")
+    log.error("MongoDB connection error", error=str(e))
 
 db = client["urbaneye"]
 issues_collection = db["issues"]
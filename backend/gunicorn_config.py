@@ -8,15 +8,27 @@ import os
 bind = "0.0.0.0:5000"
 
 # Workers: Reduced to 2 for Render Free Tier stability
-workers = 2
-
-# Worker Class: Use 'gevent' or 'eventlet' for high I/O concurrency 
-# (Requires gevent/eventlet in requirements.txt)
-# Default is 'sync' which is safer for standard Flask apps
-worker_class = "sync"
-
-# Threads: Multiple threads per worker process
-threads = 4
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+
+# Worker Profile (GUNICORN_WORKER_PROFILE):
+#   sync   - default, 'sync' workers x 4 threads (max 8 requests in flight)
+#   gevent - cooperative workers for the I/O-bound AI routes. Gemini (REST
+#            transport), OpenAI and Mongo calls yield while waiting, so each
+#            worker holds hundreds of in-flight requests. OpenCV/TF stages run
+#            on a bounded native thread pool (see ai/worker_runtime.py,
+#            CPU_EXECUTOR_THREADS) so they never block the event loop.
+worker_profile = os.getenv("GUNICORN_WORKER_PROFILE", "sync").lower()
+
+if worker_profile == "gevent":
+    worker_class = "gevent"
+    # Max simultaneous greenlets (requests) per worker
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "200"))
+    threads = 1
+else:
+    # Default is 'sync' which is safer for standard Flask apps
+    worker_class = "sync"
+    # Threads: Multiple threads per worker process
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
 
 # Timeout: Allow up to 120s for AI processing (Gemini latency)
 timeout = 120
@@ -32,3 +44,11 @@ loglevel = "info"
 # Security: Limit request size to 10MB (Photos/Videos)
 limit_request_line = 4094
 limit_request_field_size = 8190
+
+# Metrics: one snapshot file per worker in METRICS_MULTIPROC_DIR, summed on
+# scrape (services/metrics.py). Start every deploy from an empty directory.
+def on_starting(server):
+    from services.metrics import clear_multiproc_dir, MULTIPROC_DIR
+    if MULTIPROC_DIR:
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+        clear_multiproc_dir(MULTIPROC_DIR)
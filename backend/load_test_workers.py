@@ -0,0 +1,171 @@
+"""
+Load Test: sync vs gevent gunicorn worker profiles
+
+Starts a stub Gemini REST server that answers after a fixed delay (simulating
+real LLM latency), boots the API once per worker profile and fires a burst of
+concurrent chatbot requests at it. The I/O-bound chatbot route is the one
+that benefits from the gevent profile, so it shows the concurrency gain.
+
+Requires a reachable mongod (chat history is stored in MongoDB) and
+gunicorn/gevent. Without one every chat request blocks on the 10 s server
+selection timeout instead of the stub LLM, so the run refuses to start.
+
+Usage:
+    python load_test_workers.py [--requests 64] [--concurrency 32] [--latency 1.0]
+                                [--mongo-uri mongodb://127.0.0.1:27017]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+STUB_PORT = 8089
+API_PORT = 5055
+
+
+def start_stub_gemini(latency):
+    """Minimal generateContent endpoint with injected latency"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            time.sleep(latency)
+            body = json.dumps({
+                "candidates": [{
+                    "content": {"parts": [{"text": "Stub reply from load test."}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0
+                }]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", STUB_PORT), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_mongo(uri):
+    """True if `uri` answers a ping within 2 s"""
+    from pymongo import MongoClient
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+        return True
+    except Exception:
+        return False
+    finally:
+        client.close()
+
+
+def start_api(profile, mongo_uri):
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URI": mongo_uri,
+        "GUNICORN_WORKER_PROFILE": profile,
+        "GEMINI_API_KEY": "loadtest-stub-key-0000000000",
+        "GEMINI_API_ENDPOINT": f"http://127.0.0.1:{STUB_PORT}",
+        "GEMINI_TRANSPORT": "rest",
+        "CHATBOT_CACHE_ENABLED": "false",  # measure the LLM path, not the cache
+    })
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py",
+         "-b", f"127.0.0.1:{API_PORT}", "app:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    for _ in range(60):
+        try:
+            if requests.get(f"http://127.0.0.1:{API_PORT}/api/health", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    proc.terminate()
+    raise RuntimeError(f"API did not start with profile '{profile}'")
+
+
+def fire(total, concurrency):
+    url = f"http://127.0.0.1:{API_PORT}/api/chatbot/message"
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            res = requests.post(url, json={
+                "message": f"Load test question {i} {uuid.uuid4().hex[:6]}",
+                "user_id": f"loadtest_{i}"
+            }, timeout=120)
+            ok = res.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    # Warm-up (lazy chatbot init)
+    one(-1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(lat for _, lat in results)
+    return {
+        "requests": total,
+        "errors": sum(1 for ok, _ in results if not ok),
+        "wall_seconds": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_seconds": round(latencies[len(latencies) // 2], 2),
+        "p95_seconds": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare gunicorn worker profiles")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub Gemini latency (seconds)")
+    parser.add_argument("--profiles", default="sync,gevent")
+    parser.add_argument("--mongo-uri", default="mongodb://127.0.0.1:27017", help="MongoDB for chat history")
+    args = parser.parse_args()
+
+    if not check_mongo(args.mongo_uri):
+        raise SystemExit(f"❌ MongoDB not reachable at {args.mongo_uri}: results would measure "
+                         f"connection timeouts, not LLM concurrency")
+
+    stub = start_stub_gemini(args.latency)
+    print(f"🧪 Stub Gemini on :{STUB_PORT} (latency {args.latency}s)")
+
+    report = {}
+    for profile in args.profiles.split(","):
+        print(f"\n🚀 Profile: {profile}")
+        proc = start_api(profile, args.mongo_uri)
+        try:
+            report[profile] = fire(args.requests, args.concurrency)
+            print(f"   {report[profile]}")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    stub.shutdown()
+
+    if "sync" in report and "gevent" in report:
+        gain = report["gevent"]["throughput_rps"] / max(report["sync"]["throughput_rps"], 0.001)
+        print(f"\n📊 gevent throughput gain: {gain:.1f}x")
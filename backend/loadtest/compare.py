@@ -0,0 +1,114 @@
+"""
+Load Test Result Comparison
+Diffs two loadtest/run.py result files endpoint by endpoint
+
+A regression is a p95 latency more than `threshold` above the baseline
+(and at least MIN_DELTA_MS slower, so fast endpoints don't flap) or an
+error rate that went up by more than ERROR_RATE_SLACK.
+
+Usage:
+    python -m loadtest.compare loadtest/results/abc1234.json loadtest/results/def5678.json [--threshold 0.1]
+    (exit code 1 when something regressed)
+"""
+
+import argparse
+import json
+import sys
+
+MIN_DELTA_MS = 5.0
+ERROR_RATE_SLACK = 0.01
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return round((new - old) / old, 4)
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Compare per-endpoint stats of two result dicts.
+
+    Args:
+        baseline: result JSON of the reference run
+        current: result JSON of the new run
+        threshold: allowed relative p95 increase
+
+    Returns:
+        dict with per-endpoint deltas, regressions and config differences
+    """
+    endpoints = {}
+    regressions = []
+    for name in sorted(set(baseline.get("endpoints", {})) | set(current.get("endpoints", {}))):
+        old = baseline.get("endpoints", {}).get(name)
+        new = current.get("endpoints", {}).get(name)
+        if old is None or new is None:
+            endpoints[name] = {"only_in": "current" if old is None else "baseline"}
+            continue
+        endpoints[name] = {metric: {"baseline": old.get(metric), "current": new.get(metric),
+                                    "change": _change(old.get(metric), new.get(metric))}
+                           for metric in METRICS}
+
+        p95_old, p95_new = old.get("p95_ms") or 0, new.get("p95_ms") or 0
+        if p95_new > p95_old * (1 + threshold) and p95_new - p95_old >= MIN_DELTA_MS:
+            regressions.append(f"{name}: p95 {p95_old} -> {p95_new} ms")
+        if new.get("error_rate", 0) > old.get("error_rate", 0) + ERROR_RATE_SLACK:
+            regressions.append(f"{name}: error rate {old.get('error_rate', 0):.2%} -> {new.get('error_rate', 0):.2%}")
+
+    # Different workloads make the numbers incomparable: say so
+    config_diff = {key: {"baseline": baseline.get("config", {}).get(key), "current": value}
+                   for key, value in current.get("config", {}).items()
+                   if baseline.get("config", {}).get(key) != value}
+    return {
+        "baseline_commit": (baseline.get("git") or {}).get("commit"),
+        "current_commit": (current.get("git") or {}).get("commit"),
+        "threshold": threshold,
+        "config_diff": config_diff,
+        "endpoints": endpoints,
+        "regressions": regressions,
+    }
+
+
+def print_comparison(report):
+    base = (report["baseline_commit"] or "unknown")[:7]
+    cur = (report["current_commit"] or "unknown")[:7]
+    print(f"\n📈 {base} -> {cur}")
+    if report["config_diff"]:
+        print(f"⚠️ Workload differs: {report['config_diff']}")
+    print(f"   {'endpoint':<14}{'req/s':>16}{'p95 ms':>20}{'errors':>18}")
+    for name, stats in report["endpoints"].items():
+        if "only_in" in stats:
+            print(f"   {name:<14} only in {stats['only_in']}")
+            continue
+        rps, p95, err = stats["rps"], stats["p95_ms"], stats["error_rate"]
+        change = f"{p95['change']:+.0%}" if p95["change"] is not None else "n/a"
+        print(f"   {name:<14}{rps['baseline']:>7} -> {rps['current']:<6}"
+              f"{p95['baseline']:>8} -> {p95['current']:<7}({change:>5})"
+              f"{err['baseline']:>9.2%} -> {err['current']:.2%}")
+    if report["regressions"]:
+        print("❌ Regressions:")
+        for line in report["regressions"]:
+            print(f"   - {line}")
+    else:
+        print(f"✅ No regressions (p95 threshold +{report['threshold']:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two load test result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    report = compare(baseline, current, threshold=args.threshold)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_comparison(report)
+    sys.exit(1 if report["regressions"] else 0)
@@ -0,0 +1,467 @@
+"""
+API Load Test
+Seeds MongoDB, boots the API against stub LLMs and drives a request mix
+
+    1. (optional) seed <scale> synthetic issues into a local mongod
+       (loadtest/seed.py; --spawn-mongod starts a throwaway one)
+    2. start the stub Gemini/OpenAI server with injected latency
+       (loadtest/stubs.py)
+    3. start gunicorn (or use --api-url) pointed at both
+    4. run --concurrency closed-loop clients for --duration seconds over
+       the weighted endpoint mix
+    5. write throughput and latency percentiles per endpoint to JSON
+       (loadtest/results/<commit>.json), and compare with --compare
+
+Endpoints in the mix:
+    report        POST /api/issues/report (fresh and re-uploaded photos)
+    admin_issues  GET  /api/admin/issues
+    analytics     GET  /api/analytics/stats
+    hotspots      GET  /api/analytics/hotspots
+    chatbot       POST /api/chatbot/message (FAQ repeats and unique questions)
+    issue_status  GET  /api/issues/<id>/status
+
+Everything random derives from --seed, so two commits run the same
+workload. Results depend on the machine: compare runs from the same host.
+
+Usage:
+    python -m loadtest.run --scale 100000 --drop --duration 60 --concurrency 32
+    python -m loadtest.run --scale 0 --api-url http://127.0.0.1:5000 --compare loadtest/results/abc1234.json
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from loadtest.compare import compare, print_comparison
+from loadtest.seed import CITY_CENTRE, check_local, seed_database
+from loadtest.stubs import StubLLMServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "loadtest", "results")
+API_PORT = 5055
+DEFAULT_MIX = "report=1,admin_issues=1,analytics=2,hotspots=1,chatbot=3,issue_status=4"
+IDENTICAL_UPLOAD_SHARE = 0.2   # reports re-sending a photo seen before
+FAQ_SHARE = 0.6                # chatbot questions repeated across users
+IMAGE_POOL = 24
+PERCENTILES = (50, 90, 95, 99)
+
+FAQ_QUESTIONS = [
+    "How do I report a pothole?",
+    "How long does it take to fix a streetlight?",
+    "Can I track the status of my complaint?",
+    "Which department handles garbage collection?",
+    "What happens after I submit a report?",
+]
+
+
+# ----------------------------------------------------------------------
+# Environment: mongod, API server
+# ----------------------------------------------------------------------
+def spawn_mongod(port):
+    """Throwaway mongod on a temporary dbpath (removed on stop)"""
+    binary = shutil.which("mongod")
+    if not binary:
+        raise RuntimeError("mongod not found on PATH (install MongoDB or pass --mongo-uri)")
+    dbpath = tempfile.mkdtemp(prefix="urbaneye-loadtest-")
+    proc = subprocess.Popen([binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    uri = f"mongodb://127.0.0.1:{port}"
+    from pymongo import MongoClient
+    client = MongoClient(uri, serverSelectionTimeoutMS=1000)
+    for _ in range(60):
+        try:
+            client.admin.command("ping")
+            client.close()
+            return proc, dbpath, uri
+        except Exception:
+            time.sleep(0.5)
+    proc.terminate()
+    shutil.rmtree(dbpath, ignore_errors=True)
+    raise RuntimeError("mongod did not start")
+
+
+def start_api(args, stub, mongo_uri):
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URI": mongo_uri,
+        "GUNICORN_WORKER_PROFILE": args.profile,
+        "GEMINI_API_KEY": "loadtest-stub-key-0000000000",
+        "GEMINI_API_ENDPOINT": stub.url,
+        "GEMINI_TRANSPORT": "rest",
+        "OPENAI_BASE_URL": f"{stub.url}/v1",
+        # chatbot_engine prefers OpenAI whenever a key is set
+        "OPENAI_API_KEY": "sk-loadtest-stub-key-000000000000" if args.chatbot_provider == "openai" else "",
+        "LOG_LEVEL": "WARNING",
+    })
+    if args.workers:
+        env["GUNICORN_WORKERS"] = str(args.workers)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py",
+         "-b", f"127.0.0.1:{API_PORT}", "app:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{API_PORT}"
+    for _ in range(120):
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited during startup (code {proc.returncode})")
+        try:
+            if requests.get(f"{url}/api/health", timeout=1).ok:
+                return proc, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("API did not become healthy within 60s")
+
+
+def git_revision():
+    def run(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=BACKEND_DIR, capture_output=True,
+                                  text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": run("rev-parse", "HEAD") or None,
+            "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+
+
+# ----------------------------------------------------------------------
+# Workload
+# ----------------------------------------------------------------------
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def make_image_pool(rng, count=IMAGE_POOL):
+    """Small JPEGs of coloured blobs; callers append bytes for unique hashes"""
+    from PIL import Image, ImageDraw
+
+    pool = []
+    for _ in range(count):
+        img = Image.new("RGB", (640, 480), tuple(rng.randrange(60, 140) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(rng.randint(3, 8)):
+            x, y = rng.randrange(600), rng.randrange(440)
+            draw.ellipse([x, y, x + rng.randint(20, 200), y + rng.randint(20, 120)],
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=85)
+        pool.append(buf.getvalue())
+    return pool
+
+
+class Workload:
+    """Inputs shared by the client threads (images, issue ids)"""
+
+    def __init__(self, base_url, seed, issue_ids):
+        rng = random.Random(seed)
+        self.base_url = base_url
+        self.images = make_image_pool(rng)
+        self.issue_ids = issue_ids
+        self.sent_images = []
+        self._lock = threading.Lock()
+
+    def image_for(self, rng):
+        with self._lock:
+            if self.sent_images and rng.random() < IDENTICAL_UPLOAD_SHARE:
+                return rng.choice(self.sent_images)
+        # JPEG decoders ignore trailing bytes: same picture, new content hash
+        data = rng.choice(self.images) + rng.getrandbits(64).to_bytes(8, "big")
+        with self._lock:
+            if len(self.sent_images) < 256:
+                self.sent_images.append(data)
+        return data
+
+
+def do_report(session, work, rng, timeout):
+    lat = CITY_CENTRE[0] + rng.uniform(-0.1, 0.1)
+    lng = CITY_CENTRE[1] + rng.uniform(-0.1, 0.1)
+    return session.post(f"{work.base_url}/api/issues/report", timeout=timeout, data={
+        "title": "Load test report",
+        "description": "Pothole on the left lane, getting bigger after the rain.",
+        "latitude": f"{lat:.6f}",
+        "longitude": f"{lng:.6f}",
+        "address": "Load test street, Bengaluru",
+        "ai_mode": "AGENTIC" if rng.random() < 0.3 else "GENERATIVE",
+    }, files={"image": ("report.jpg", work.image_for(rng), "image/jpeg")})
+
+
+def do_admin_issues(session, work, rng, timeout):
+    return session.get(f"{work.base_url}/api/admin/issues", timeout=timeout)
+
+
+def do_analytics(session, work, rng, timeout):
+    return session.get(f"{work.base_url}/api/analytics/stats", timeout=timeout)
+
+
+def do_hotspots(session, work, rng, timeout):
+    return session.get(f"{work.base_url}/api/analytics/hotspots", timeout=timeout)
+
+
+def do_chatbot(session, work, rng, timeout):
+    if rng.random() < FAQ_SHARE:
+        message = rng.choice(FAQ_QUESTIONS)
+    else:
+        message = f"Is issue {rng.randrange(10 ** 6)} near {rng.choice(['MG Road', 'Hosur Road'])} fixed yet?"
+    return session.post(f"{work.base_url}/api/chatbot/message", timeout=timeout,
+                        json={"message": message, "user_id": f"loadtest_{rng.randrange(500)}"})
+
+
+def do_issue_status(session, work, rng, timeout):
+    issue_id = rng.choice(work.issue_ids) if work.issue_ids else "000000000000000000000000"
+    return session.get(f"{work.base_url}/api/issues/{issue_id}/status", timeout=timeout)
+
+
+ENDPOINTS = {
+    "report": do_report,
+    "admin_issues": do_admin_issues,
+    "analytics": do_analytics,
+    "hotspots": do_hotspots,
+    "chatbot": do_chatbot,
+    "issue_status": do_issue_status,
+}
+
+
+def sample_issue_ids(mongo_uri, count=2000, seed=0):
+    """Existing ids for issue_status, drawn in a stable order"""
+    from pymongo import MongoClient
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+    try:
+        ids = [str(doc["_id"]) for doc in
+               client["urbaneye"]["issues"].aggregate([{"$sample": {"size": count}}, {"$project": {"_id": 1}}])]
+    finally:
+        client.close()
+    ids.sort()
+    random.Random(seed).shuffle(ids)
+    return ids
+
+
+# ----------------------------------------------------------------------
+# Load generation and statistics
+# ----------------------------------------------------------------------
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(0, min(rank, len(sorted_values)) - 1)]
+
+
+def summarize(samples, seconds):
+    """Per-endpoint stats from (endpoint, seconds, status) samples"""
+    by_endpoint = {}
+    for name, elapsed, status in samples:
+        by_endpoint.setdefault(name, []).append((elapsed, status))
+
+    endpoints = {}
+    for name, rows in sorted(by_endpoint.items()):
+        latencies = sorted(elapsed * 1000 for elapsed, _ in rows)
+        statuses = Counter(str(status) for _, status in rows)
+        errors = sum(n for status, n in statuses.items() if not status.startswith(("2", "3")))
+        stats = {
+            "requests": len(rows),
+            "rps": round(len(rows) / seconds, 2),
+            "error_rate": round(errors / len(rows), 4),
+            "mean_ms": round(sum(latencies) / len(latencies), 1),
+            "max_ms": round(latencies[-1], 1),
+            "status_codes": dict(statuses),
+        }
+        for pct in PERCENTILES:
+            stats[f"p{pct}_ms"] = round(percentile(latencies, pct), 1)
+        endpoints[name] = stats
+
+    total = len(samples)
+    return {
+        "requests": total,
+        "rps": round(total / seconds, 2) if seconds else 0,
+        "error_rate": round(sum(s["error_rate"] * s["requests"] for s in endpoints.values()) / total, 4)
+        if total else 0,
+        "endpoints": endpoints,
+    }
+
+
+def run_load(work, mix, concurrency, duration, warmup, timeout, seed):
+    """
+    Closed-loop clients: each thread picks an endpoint by weight, waits
+    for the reply and goes again until the deadline.
+
+    Returns:
+        (samples, measured_seconds); warm-up requests are discarded
+    """
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local = []
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            name = rng.choices(names, weights)[0]
+            try:
+                status = ENDPOINTS[name](session, work, rng, timeout).status_code
+            except requests.Timeout:
+                status = "timeout"
+            except requests.RequestException as e:
+                status = type(e).__name__
+            if now >= measure_from:
+                local.append((name, time.perf_counter() - now, status))
+        session.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout + duration + warmup + 30)
+    return samples, duration
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reproducible API load test with stubbed LLMs")
+    data = parser.add_argument_group("data")
+    data.add_argument("--scale", type=int, default=10000, help="Issues to seed (0 = use existing data)")
+    data.add_argument("--drop", action="store_true", help="Drop the issues collection before seeding")
+    data.add_argument("--mongo-uri", default="mongodb://127.0.0.1:27017")
+    data.add_argument("--spawn-mongod", action="store_true", help="Start a throwaway mongod for this run")
+    data.add_argument("--mongo-port", type=int, default=27018, help="Port for --spawn-mongod")
+
+    server = parser.add_argument_group("server")
+    server.add_argument("--api-url", help="Use a running API instead of starting gunicorn")
+    server.add_argument("--profile", default="gevent", choices=["sync", "gevent"])
+    server.add_argument("--workers", type=int, help="GUNICORN_WORKERS for the spawned server")
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    load.add_argument("--warmup", type=float, default=10, help="Unmeasured seconds before")
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--mix", default=DEFAULT_MIX, help="Weighted endpoint mix")
+    load.add_argument("--timeout", type=float, default=120)
+    load.add_argument("--seed", type=int, default=42)
+
+    llm = parser.add_argument_group("stub LLM")
+    llm.add_argument("--llm-latency-ms", type=float, default=800)
+    llm.add_argument("--llm-jitter", type=float, default=0.25, help="Log-normal sigma of the latency")
+    llm.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of LLM calls answered with 429")
+    llm.add_argument("--chatbot-provider", default="gemini", choices=["gemini", "openai"])
+
+    out = parser.add_argument_group("output")
+    out.add_argument("--output", help="Result JSON (default loadtest/results/<commit>.json)")
+    out.add_argument("--compare", help="Baseline result JSON to compare against")
+    out.add_argument("--threshold", type=float, default=0.10, help="Allowed p95 regression (0.10 = +10%%)")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    mongod = api = None
+    stub = StubLLMServer(latency_ms=args.llm_latency_ms, jitter=args.llm_jitter,
+                         error_rate=args.llm_error_rate, seed=args.seed).start()
+    print(f"🧪 Stub LLM on {stub.url} ({args.llm_latency_ms:.0f} ms, error rate {args.llm_error_rate})")
+
+    try:
+        mongo_uri = args.mongo_uri
+        if args.spawn_mongod:
+            mongod, dbpath, mongo_uri = spawn_mongod(args.mongo_port)
+            print(f"🍃 Throwaway mongod on {mongo_uri}")
+
+        seed_stats = None
+        if args.scale:
+            if not check_local(mongo_uri):
+                raise SystemExit(f"❌ Refusing to seed a non-local MongoDB ({mongo_uri})")
+            print(f"🌱 Seeding {args.scale} issues...")
+            seed_stats = seed_database(mongo_uri, args.scale, seed=args.seed, drop=args.drop)
+            print(f"   {seed_stats['inserted']} issues in {seed_stats['seconds']}s")
+
+        if args.api_url:
+            base_url = args.api_url.rstrip("/")
+        else:
+            api, base_url = start_api(args, stub, mongo_uri)
+            print(f"🚀 API ({args.profile}) on {base_url}")
+
+        issue_ids = sample_issue_ids(mongo_uri, seed=args.seed) if "issue_status" in mix else []
+        work = Workload(base_url, args.seed, issue_ids)
+
+        print(f"🔥 {args.concurrency} clients, {args.warmup:.0f}s warm-up + {args.duration:.0f}s measured")
+        samples, seconds = run_load(work, mix, args.concurrency, args.duration, args.warmup,
+                                    args.timeout, args.seed)
+        summary = summarize(samples, seconds)
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait(timeout=30)
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait(timeout=30)
+            shutil.rmtree(dbpath, ignore_errors=True)
+        stub.stop()
+
+    revision = git_revision()
+    result = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": revision,
+        "config": {
+            "scale": args.scale, "seed": args.seed, "mix": mix, "concurrency": args.concurrency,
+            "duration_s": args.duration, "warmup_s": args.warmup, "profile": args.profile,
+            "workers": args.workers, "external_api": bool(args.api_url),
+            "chatbot_provider": args.chatbot_provider,
+        },
+        "seed": seed_stats,
+        "llm_stub": stub.stats(),
+        **summary,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{(revision['commit'] or 'unknown')[:7]}"
+                                                      f"{'-dirty' if revision['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\n📊 {summary['requests']} requests, {summary['rps']} req/s, error rate {summary['error_rate']:.2%}")
+    print(f"   {'endpoint':<14}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>9}")
+    for name, s in summary["endpoints"].items():
+        print(f"   {name:<14}{s['rps']:>8}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}{s['error_rate']:>9.2%}")
+    print(f"✅ Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report = compare(baseline, result, threshold=args.threshold)
+        print_comparison(report)
+        return 1 if report["regressions"] else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Synthetic Issue Seeder for Load Tests
+Fills the issues collection with realistic reports at 10k-1M scale
+
+The data is shaped like real reports so the endpoints do realistic work:
+- Geo clusters: most issues fall in hotspots (Gaussian, 15-60 m spread,
+  Zipf-like sizes) around a city centre, the rest are scattered uniformly.
+- Hashes: within a cluster many photos are near-duplicates of a few
+  "scenes" (dHash with a few bits flipped), so duplicate detection finds
+  real candidates; every issue has a unique content_sha256.
+- Statuses, types, severities and created_at (last 90 days, skewed to
+  recent) follow the proportions seen in production; duplicates point
+  to another issue of the same cluster.
+
+Everything derives from --seed: the same seed gives the same documents,
+with created_at relative to the time of seeding.
+
+Usage:
+    python -m loadtest.seed --scale 100000 --drop [--mongo-uri mongodb://127.0.0.1:27017]
+"""
+
+import argparse
+import bisect
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from routes.routing import get_routing_info
+from services.storage import content_key
+
+CITY_CENTRE = (12.9716, 77.5946)  # Bengaluru
+CITY_RADIUS_M = 15000
+CLUSTER_SHARE = 0.7          # issues inside hotspots
+ISSUES_PER_CLUSTER = 60      # average; sizes are Zipf-like
+NEAR_DUPLICATE_SHARE = 0.4   # cluster photos derived from a shared scene
+HISTORY_DAYS = 90
+BATCH_SIZE = 5000
+METERS_PER_DEG = 111320.0
+
+ISSUE_TYPES = [("pothole", 0.38), ("garbage", 0.30), ("water_leak", 0.12),
+               ("streetlight", 0.12), ("unknown", 0.08)]
+STATUSES = [("Pending", 0.35), ("Assigned", 0.20), ("In Progress", 0.15),
+            ("Resolved", 0.25), ("Duplicate", 0.05)]
+SEVERITIES = [(1, "Low", 0.45), (2, "Medium", 0.35), (3, "High", 0.20)]
+STREETS = ["MG Road", "Brigade Road", "Residency Road", "Hosur Road", "Bannerghatta Road",
+           "Old Airport Road", "Outer Ring Road", "Sarjapur Road", "Bellary Road", "Tumkur Road"]
+
+
+def _weighted(rng, choices):
+    x = rng.random()
+    for item in choices:
+        x -= item[-1]
+        if x <= 0:
+            return item
+    return choices[-1]
+
+
+def _offset(lat, lng, north_m, east_m):
+    return (lat + north_m / METERS_PER_DEG,
+            lng + east_m / (METERS_PER_DEG * math.cos(math.radians(lat))))
+
+
+def _to_signed64(value):
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _object_id(rng, created_at):
+    """Deterministic ObjectId: creation timestamp + 8 bytes from the RNG"""
+    from bson import ObjectId
+    return ObjectId(int(created_at.timestamp()).to_bytes(4, "big") + rng.getrandbits(64).to_bytes(8, "big"))
+
+
+def make_clusters(scale, rng, centre=CITY_CENTRE, radius_m=CITY_RADIUS_M):
+    """Hotspot centres with Zipf-like weights and a few base image hashes each"""
+    count = max(5, int(scale * CLUSTER_SHARE / ISSUES_PER_CLUSTER))
+    clusters = []
+    for rank in range(1, count + 1):
+        r = radius_m * math.sqrt(rng.random())
+        theta = rng.random() * 2 * math.pi
+        lat, lng = _offset(centre[0], centre[1], r * math.cos(theta), r * math.sin(theta))
+        clusters.append({
+            "lat": lat,
+            "lng": lng,
+            "spread_m": rng.uniform(15, 60),
+            "weight": 1.0 / rank ** 0.8,
+            "issue_type": _weighted(rng, ISSUE_TYPES)[0],
+            "scenes": [rng.getrandbits(64) for _ in range(rng.randint(1, 4))],
+            "members": [],
+        })
+    total = sum(c["weight"] for c in clusters)
+    for c in clusters:
+        c["weight"] /= total
+    return clusters
+
+
+def generate_issues(scale, seed=42, now=None, centre=CITY_CENTRE):
+    """
+    Yield `scale` synthetic issue documents (deterministic for a seed).
+
+    Args:
+        scale: number of issues
+        seed: RNG seed
+        now: reference time for created_at (default: now)
+
+    Returns:
+        generator of dicts ready for insert_many
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    clusters = make_clusters(scale, rng, centre)
+    cumulative, acc = [], 0.0
+    for c in clusters:
+        acc += c["weight"]
+        cumulative.append(acc)
+
+    for i in range(scale):
+        # Recent days are busier: exponential age, capped at HISTORY_DAYS
+        age_days = min(rng.expovariate(1 / 20), HISTORY_DAYS)
+        created_at = now - timedelta(days=age_days, seconds=rng.randint(0, 86399))
+
+        cluster = None
+        if rng.random() < CLUSTER_SHARE:
+            cluster = clusters[min(bisect.bisect_left(cumulative, rng.random()), len(clusters) - 1)]
+            lat, lng = _offset(cluster["lat"], cluster["lng"],
+                               rng.gauss(0, cluster["spread_m"]), rng.gauss(0, cluster["spread_m"]))
+            issue_type = cluster["issue_type"] if rng.random() < 0.8 else _weighted(rng, ISSUE_TYPES)[0]
+        else:
+            r = CITY_RADIUS_M * math.sqrt(rng.random())
+            theta = rng.random() * 2 * math.pi
+            lat, lng = _offset(centre[0], centre[1], r * math.cos(theta), r * math.sin(theta))
+            issue_type = _weighted(rng, ISSUE_TYPES)[0]
+
+        if cluster and rng.random() < NEAR_DUPLICATE_SHARE:
+            dhash = rng.choice(cluster["scenes"])
+            for _ in range(min(int(rng.expovariate(1 / 4)), 20)):
+                dhash ^= 1 << rng.randrange(64)
+        else:
+            dhash = rng.getrandbits(64)
+
+        status = _weighted(rng, STATUSES)[0]
+        linked_to = None
+        if status == "Duplicate":
+            if cluster and cluster["members"]:
+                linked_to = str(rng.choice(cluster["members"]))
+            else:
+                status = "Pending"
+
+        score, label, _ = _weighted(rng, SEVERITIES)
+        media_type = "video" if rng.random() < 0.03 else "image"
+        sha = hashlib.sha256(f"{seed}:{i}".encode()).hexdigest()
+        routing = get_routing_info(issue_type)
+        _id = _object_id(rng, created_at)
+        if cluster is not None and len(cluster["members"]) < 32:
+            cluster["members"].append(_id)
+
+        radius = {"High": 500, "Medium": 200, "Low": 100}[label]
+        yield {
+            "_id": _id,
+            "reported_by": f"citizen_{rng.randrange(max(scale // 5, 1))}",
+            "title": f"{issue_type.replace('_', ' ').title()} near {rng.choice(STREETS)}",
+            "description": f"Synthetic {issue_type} report #{i} for load testing.",
+            "latitude": f"{lat:.6f}",
+            "longitude": f"{lng:.6f}",
+            "address": f"{rng.randint(1, 400)}, {rng.choice(STREETS)}, Bengaluru",
+            "issue_type": issue_type,
+            "image_path": content_key(sha, ".mp4" if media_type == "video" else ".jpg"),
+            "status": status,
+            "assigned_department": routing["dept"],
+            "priority": routing["priority"],
+            "created_at": created_at,
+            "image_hash": format(dhash, "016x"),
+            "image_dhash": _to_signed64(dhash),
+            "content_sha256": sha,
+            "support_count": 1 + (int(rng.expovariate(1 / 2)) if cluster else 0),
+            "media_type": media_type,
+            "video_analysis": None,
+            "is_duplicate_of": linked_to,
+            "admin_remarks": f"Linked to existing issue #{linked_to[-6:]}" if linked_to else None,
+            "severity_score": score,
+            "severity_label": label,
+            "severity_details": {"method": "YOLOv8", "confidence": round(rng.uniform(0.3, 0.95), 2)},
+            "estimated_repair_cost": rng.randint(1, 40) * 500 if issue_type == "pothole" else 0,
+            "impact_radius": radius,
+            "affected_population": int(math.pi * radius ** 2 * rng.uniform(0.01, 0.08)),
+            "population_source": "default",
+            "voice_transcript": None,
+            "forensics_data": {"status": "Verified", "details": "Synthetic"},
+            "pipeline_timings": _synthetic_timings(rng),
+            "reporter_email": None,
+            "notify_on_updates": True,
+            "notification_history": [],
+            "status_history": [{"status": status, "changed_at": created_at,
+                                "changed_by": "System", "comment": "Initial report"}],
+        }
+
+
+def _synthetic_timings(rng):
+    stages = {
+        "upload": round(rng.lognormvariate(1.5, 0.4), 1),
+        "decode": round(rng.lognormvariate(2.5, 0.3), 1),
+        "dhash": round(rng.lognormvariate(1.0, 0.3), 1),
+        "duplicate_query": round(rng.lognormvariate(2.0, 0.8), 1),
+        "yolo": round(rng.lognormvariate(5.0, 0.4), 1),
+        "summarize": round(rng.lognormvariate(7.0, 0.6), 1),
+    }
+    return {"total_ms": round(sum(stages.values()) * 1.05, 1), "stages": stages,
+            "mongo": {"calls": 5, "ms": round(rng.lognormvariate(1.5, 0.5), 1)}, "trace_id": None}
+
+
+def check_local(mongo_uri):
+    """Seeding writes to the `urbaneye` database: only allow local servers"""
+    host = urlparse(mongo_uri).hostname or ""
+    return host in ("localhost", "127.0.0.1", "::1") and not mongo_uri.startswith("mongodb+srv")
+
+
+def seed_database(mongo_uri, scale, seed=42, drop=False, batch_size=BATCH_SIZE):
+    """
+    Insert `scale` synthetic issues into <mongo_uri>/urbaneye.issues.
+
+    Returns:
+        dict with inserted, seconds, docs_per_second and status counts
+    """
+    from pymongo import MongoClient
+
+    if not check_local(mongo_uri):
+        raise ValueError(f"Refusing to seed a non-local MongoDB ({mongo_uri})")
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+    issues = client["urbaneye"]["issues"]
+    if drop:
+        issues.drop()
+    elif issues.estimated_document_count():
+        raise ValueError("issues collection is not empty (pass drop=True / --drop)")
+
+    start = time.perf_counter()
+    inserted = 0
+    statuses = {}
+    batch = []
+    for doc in generate_issues(scale, seed=seed):
+        statuses[doc["status"]] = statuses.get(doc["status"], 0) + 1
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            inserted += len(issues.insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+            print(f"   {inserted}/{scale} issues", end="\r", flush=True)
+    if batch:
+        inserted += len(issues.insert_many(batch, ordered=False).inserted_ids)
+    # Same index the report route creates lazily
+    issues.create_index("content_sha256", sparse=True)
+    elapsed = time.perf_counter() - start
+    client.close()
+    return {
+        "inserted": inserted,
+        "seed": seed,
+        "seconds": round(elapsed, 2),
+        "docs_per_second": round(inserted / elapsed, 1) if elapsed else None,
+        "statuses": statuses,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed synthetic issues for load tests")
+    parser.add_argument("--scale", type=int, default=10000, help="Number of issues (10k-1M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--drop", action="store_true", help="Drop the issues collection first")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    stats = seed_database(args.mongo_uri, args.scale, seed=args.seed, drop=args.drop, batch_size=args.batch_size)
+    print(f"✅ Seeded {stats['inserted']} issues in {stats['seconds']}s ({stats['docs_per_second']} docs/s)")
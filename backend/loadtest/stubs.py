@@ -0,0 +1,192 @@
+"""
+Stub LLM Servers for Load Tests
+One local HTTP server that answers like Gemini (REST) and OpenAI
+
+- Gemini:  POST /v1beta/models/<model>:generateContent
+           (point the app at it with GEMINI_API_ENDPOINT + GEMINI_TRANSPORT=rest)
+- OpenAI:  POST /v1/chat/completions
+           (OPENAI_BASE_URL=http://host:port/v1, read by the openai client)
+
+Latency is injected per call: log-normal around `latency_ms` with `jitter`
+as sigma, so the tail looks like a real provider's. `error_rate` answers
+that share of calls with HTTP 429 (quota) to exercise the fallbacks.
+Prompts that ask for JSON get a JSON object with every field the agents,
+vision classifier and summariser parse; everything else gets plain text.
+
+Usage:
+    python -m loadtest.stubs --port 8089 --latency-ms 800
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+JSON_REPLY = {
+    # Triage / policy / assignment / verifier agents
+    "valid_complaint": True,
+    "issue_type": "pothole",
+    "priority_level": "Medium",
+    "assigned_department": "Road Department",
+    "applicable_policy": "Municipal Road Maintenance Policy",
+    "required_resolution_time": "72 hours",
+    "compliance_status": "Within SLA",
+    "escalation_required": False,
+    "resolution_status": "Not Resolved",
+    "quality_of_fix": "N/A",
+    "reopen_ticket_required": False,
+    # Gemini vision classifier
+    "detected_object": "pothole",
+    "is_civic_issue": True,
+    "confidence": 0.87,
+    "brief_description": "Pothole on an asphalt road",
+    # Summariser key points
+    "problem": "Road surface damage",
+    "estimated_urgency": "medium",
+    "keywords": ["pothole", "road", "damage"],
+    "location_mentioned": None,
+}
+TEXT_REPLY = ("Thanks for reaching out to UrbanEye. Report the issue with a photo and your "
+              "location, and it is routed to the right department automatically.")
+
+
+class StubLLMServer:
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=800.0, jitter=0.25, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {"gemini": 0, "openai": 0}
+        self.errors = {"gemini": 0, "openai": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "injected_errors": dict(self.errors),
+                    "latency_ms": self.latency_ms, "jitter": self.jitter, "error_rate": self.error_rate}
+
+    def _draw(self, provider):
+        """Latency (seconds) and whether to fail this call"""
+        with self._lock:
+            self.calls[provider] += 1
+            delay = self.latency_ms / 1000 * self._rng.lognormvariate(0, self.jitter) if self.latency_ms else 0
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors[provider] += 1
+        return delay, fail
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                path = self.path.split("?")[0]
+                if ":generateContent" in path:
+                    self._gemini(path, body)
+                elif path.endswith("/chat/completions"):
+                    self._openai(body)
+                else:
+                    self._reply(404, {"error": {"code": 404, "message": f"stub: unknown path {path}"}})
+
+            def _gemini(self, path, body):
+                delay, fail = stub._draw("gemini")
+                time.sleep(delay)
+                if fail:
+                    return self._reply(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                                                       "message": "Quota exceeded (injected by stub)"}})
+                prompt = " ".join(part.get("text", "")
+                                  for content in body.get("contents", [])
+                                  for part in content.get("parts", []))
+                self._reply(200, {
+                    "candidates": [{
+                        "content": {"parts": [{"text": _reply_text(prompt)}], "role": "model"},
+                        "finishReason": "STOP",
+                        "index": 0,
+                    }],
+                    "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": 48,
+                                      "totalTokenCount": len(prompt) // 4 + 48},
+                    "modelVersion": path.rsplit("/", 1)[-1].split(":")[0],
+                })
+
+            def _openai(self, body):
+                delay, fail = stub._draw("openai")
+                time.sleep(delay)
+                if fail:
+                    return self._reply(429, {"error": {"type": "rate_limit_exceeded", "code": "rate_limit_exceeded",
+                                                       "message": "Rate limit reached (injected by stub)"}})
+                prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+                self._reply(200, {
+                    "id": f"chatcmpl-stub{int(time.time() * 1000)}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "gpt-4o-mini"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": _reply_text(prompt)}}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 48,
+                              "total_tokens": len(prompt) // 4 + 48},
+                })
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _reply_text(prompt):
+    return json.dumps(JSON_REPLY) if "JSON" in prompt else TEXT_REPLY
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Gemini/OpenAI server with injected latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter", type=float, default=0.25, help="Log-normal sigma of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with 429")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(args.host, args.port, args.latency_ms, args.jitter, args.error_rate).start()
+    print(f"🚀 Stub LLM server on {stub.url}")
+    print(f"   GEMINI_API_ENDPOINT={stub.url} GEMINI_TRANSPORT=rest")
+    print(f"   OPENAI_BASE_URL={stub.url}/v1")
+    print("Press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+        print("\n🛑 Stub stopped.")
@@ -0,0 +1,98 @@
+"""
+Migration: flat uploads/ -> content-addressed storage (services/storage.py)
+
+Rewrites every legacy `issues.image_path` and `users.profile_photo`
+("uploads/<epoch>_<uuid8>.jpg", "uploads/profiles/...") to its
+content-addressed key ("uploads/ab/cd/<sha256>.jpg") on the configured
+backend (STORAGE_BACKEND=local|s3) and records `content_sha256`.
+Byte-identical files collapse into one stored object.
+
+The old path is kept in `legacy_image_path` / `legacy_profile_photo`, and the
+old files stay on disk unless --delete-originals is given, so the migration
+can be re-run or rolled back safely.
+
+Usage:
+    python migrate_storage.py --dry-run
+    python migrate_storage.py [--delete-originals]
+"""
+
+import argparse
+import os
+
+from pymongo import UpdateOne
+
+from config import db
+from services.storage import storage, file_sha256, is_content_key
+
+BATCH_SIZE = 500
+
+
+def migrate_field(collection, field, dry_run=False, delete_originals=False):
+    """
+    Move every legacy path in `field` into content-addressed storage.
+
+    Returns:
+        dict: Migration counters for this collection
+    """
+    stats = {"scanned": 0, "migrated": 0, "missing": 0, "deduplicated": 0, "bytes_saved": 0}
+    seen = {}  # sha256 -> key, for dedupe accounting
+    ops, originals = [], []
+
+    def flush():
+        if ops and not dry_run:
+            collection.bulk_write(ops, ordered=False)
+            if delete_originals:
+                for path in originals:
+                    if os.path.exists(path):
+                        os.remove(path)
+        ops.clear()
+        originals.clear()
+
+    cursor = collection.find({field: {"$nin": [None, ""]}}, {field: 1})
+    for doc in cursor:
+        old_path = str(doc[field]).replace("\\", "/")
+        if old_path.startswith("http") or is_content_key(old_path):
+            continue
+        stats["scanned"] += 1
+
+        if not os.path.isfile(old_path):
+            stats["missing"] += 1
+            print(f"⚠️  Missing file for {doc['_id']}: {old_path}")
+            continue
+
+        digest = file_sha256(old_path)
+        if digest in seen:
+            stats["deduplicated"] += 1
+            stats["bytes_saved"] += os.path.getsize(old_path)
+            key = seen[digest]
+        elif dry_run:
+            key = f"<{digest[:12]}...>"
+        else:
+            key = storage.put_file(old_path, digest=digest, move=False)
+        seen[digest] = key
+
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+            field: key,
+            "content_sha256": digest,
+            f"legacy_{field}": old_path,
+        }}))
+        originals.append(old_path)
+        stats["migrated"] += 1
+        if len(ops) >= BATCH_SIZE:
+            flush()
+
+    flush()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate uploads to content-addressed storage")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--delete-originals", action="store_true", help="Remove old flat files after migrating")
+    args = parser.parse_args()
+
+    print(f"🚚 Migrating uploads to '{storage.backend}' storage{' (dry run)' if args.dry_run else ''}")
+    for name, field in (("issues", "image_path"), ("users", "profile_photo")):
+        stats = migrate_field(db[name], field, dry_run=args.dry_run, delete_originals=args.delete_originals)
+        print(f"   {name}.{field}: {stats}")
+    print("✅ Done")
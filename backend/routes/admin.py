@@ -1,14 +1,19 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, request, jsonify, send_from_directory, redirect
 from datetime import datetime
 from bson import ObjectId
 from pymongo import MongoClient
+import contextvars
+import math
 import os
+import threading
+from services.log import get_logger
 
 # AI modules will be lazy-loaded inside routes to prevent startup timeouts
 summarizer = None
 voice_synth = None
 
 admin_bp = Blueprint("admin", __name__)
+log = get_logger(__name__)
 
 # Database connection
 from config import issues_collection, db
@@ -60,7 +65,7 @@ def get_all_issues_admin():
         
         return jsonify(issues)
     except Exception as e:
-        print(f"❌ Admin issues error: {e}")
+        log.error("Admin issues error", error=str(e))
         return jsonify([]) # Return empty list on failure
 
 @admin_bp.route("/issues/<issue_id>", methods=["GET"])
@@ -105,6 +110,16 @@ def verify_issue(issue_id):
         )
         
         if result.modified_count > 0:
+            # Embed the upload now so the next head retrain only reads the store
+            if is_valid is not False:
+                issue = issues_collection.find_one(
+                    {"_id": ObjectId(issue_id)},
+                    {"image_path": 1, "media_type": 1, "content_sha256": 1}
+                )
+                if issue:
+                    from ai.embedding_store import index_issue_embedding
+                    threading.Thread(target=contextvars.copy_context().run, args=(index_issue_embedding, issue),
+                                     daemon=True).start()
             return jsonify({"success": True})
         return jsonify({"success": False, "message": "Issue not found"}), 404
         
@@ -208,7 +223,7 @@ def update_issue_status(issue_id):
                             }}
                         )
                 except Exception as e:
-                    print(f"Notification error (non-critical): {e}")
+                    log.warning("Notification error (non-critical)", error=str(e))
         
         if result.modified_count > 0:
             return jsonify({"success": True})
@@ -267,7 +282,7 @@ def get_ai_recommendation(issue_id):
         return jsonify(response)
         
     except Exception as e:
-        print(f"❌ AI Recommendation Error: {e}")
+        log.error("AI recommendation error", error=str(e))
         return jsonify({"error": str(e)}), 500
 
 
@@ -316,7 +331,7 @@ def generate_summary(issue_id):
         return jsonify({"success": True, "summary": summary, "key_points": key_points})
         
     except Exception as e:
-        print(f"❌ Summary generation error: {e}")
+        log.error("Summary generation error", error=str(e))
         return jsonify({"error": str(e)}), 500
 
 
@@ -363,7 +378,7 @@ def generate_voice(issue_id):
         return jsonify({"success": True, "audio_url": f"/api/admin/audio/{os.path.basename(audio_path)}"})
         
     except Exception as e:
-        print(f"❌ Voice generation error: {e}")
+        log.error("Voice generation error", error=str(e))
         return jsonify({"error": str(e)}), 500
 
 # ==================== PHASE 15: AUTONOMOUS AGENT CONTROL ====================
@@ -400,7 +415,7 @@ def trigger_autonomous_agent():
             "count": count
         })
     except Exception as e:
-        print(f"❌ Autonomous trigger error: {e}")
+        log.error("Autonomous trigger error", error=str(e))
         return jsonify({"error": str(e)}), 500
 
 @admin_bp.route("/autonomous/status", methods=["GET"])
@@ -423,10 +438,111 @@ def get_autonomous_status():
         return jsonify({"error": str(e)}), 500
 
 
+@admin_bp.route("/inference/stats", methods=["GET"])
+def get_inference_stats():
+    """Per-stage queue depth and latency of the inference service"""
+    try:
+        from ai.inference_service import get_inference_stats as inference_stats
+        return jsonify({"success": True, **inference_stats()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+SLOWEST_MAX_LIMIT = 100
+SLOWEST_MAX_HOURS = 720  # 30 days
+
+
+@admin_bp.route("/pipeline/slowest", methods=["GET"])
+def get_slowest_stages():
+    """
+    Slowest report pipeline stages over a time window, from the
+    `pipeline_timings` stored on each issue (?hours=24&limit=10).
+    hours is clamped to 1-720 and limit to 1-100.
+    """
+    try:
+        hours = float(request.args.get("hours", 24))
+        limit = int(request.args.get("limit", 10))
+        if not math.isfinite(hours):
+            raise ValueError(hours)
+    except ValueError:
+        return jsonify({"error": "hours and limit must be numbers"}), 400
+    hours = min(max(hours, 1.0), float(SLOWEST_MAX_HOURS))
+    limit = min(max(limit, 1), SLOWEST_MAX_LIMIT)
+
+    try:
+        import heapq
+        import numpy as np
+        from datetime import timedelta
+        since = datetime.now() - timedelta(hours=hours)
+
+        durations = {}   # stage -> [ms, ...]
+        slowest = []     # min-heap of (total_ms, issue_id, timings)
+        reports = 0
+        cursor = issues_collection.find(
+            {"created_at": {"$gte": since}, "pipeline_timings": {"$type": "object"}},
+            {"pipeline_timings": 1, "created_at": 1}
+        )
+        for issue in cursor:
+            timings = issue["pipeline_timings"]
+            reports += 1
+            for stage, ms in (timings.get("stages") or {}).items():
+                durations.setdefault(stage, []).append(ms)
+            mongo = timings.get("mongo") or {}
+            if mongo.get("calls"):
+                durations.setdefault("mongo", []).append(mongo.get("ms", 0))
+            entry = (timings.get("total_ms", 0), str(issue["_id"]), timings, issue.get("created_at"))
+            if len(slowest) < limit:
+                heapq.heappush(slowest, entry)
+            elif entry[0] > slowest[0][0]:
+                heapq.heapreplace(slowest, entry)
+
+        stages = []
+        for stage, values in durations.items():
+            values = np.asarray(values, dtype=np.float64)
+            stages.append({
+                "stage": stage,
+                "count": int(values.size),
+                "p50_ms": round(float(np.percentile(values, 50)), 1),
+                "p95_ms": round(float(np.percentile(values, 95)), 1),
+                "max_ms": round(float(values.max()), 1),
+                "total_ms": round(float(values.sum()), 1),
+            })
+        stages.sort(key=lambda s: s["p95_ms"], reverse=True)
+
+        slowest_reports = []
+        for total_ms, issue_id, timings, created_at in sorted(slowest, key=lambda e: e[0], reverse=True):
+            stage_times = timings.get("stages") or {}
+            slowest_reports.append({
+                "issue_id": issue_id,
+                "created_at": created_at,
+                "total_ms": total_ms,
+                "slowest_stage": max(stage_times, key=stage_times.get) if stage_times else None,
+                "trace_id": timings.get("trace_id"),
+                "stages": stage_times,
+            })
+
+        return jsonify({
+            "success": True,
+            "window_hours": hours,
+            "reports": reports,
+            "stages": stages[:limit],
+            "slowest_reports": slowest_reports,
+        })
+    except Exception as e:
+        log.error("Pipeline timings error", error=str(e))
+        return jsonify({"error": str(e)}), 500
+
+
 @admin_bp.route("/audio/<filename>", methods=['GET'])
 def serve_audio(filename):
     """Serve audio files"""
-    audio_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads', 'audio')
+    from services.storage import storage
+    audio_key = f"uploads/audio/{filename}"
+    if storage.is_remote:
+        if not storage.exists(audio_key):
+            return jsonify({"error": "Audio file not found"}), 404
+        return redirect(storage.url(audio_key))
+    audio_dir = os.path.dirname(storage.local_path(audio_key))
     try:
         return send_from_directory(audio_dir, filename)
     except FileNotFoundError:
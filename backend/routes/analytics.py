@@ -1,12 +1,9 @@
 from flask import Blueprint, jsonify
-from pymongo import MongoClient
+from config import issues_collection
+from services.log import get_logger
 
 analytics_bp = Blueprint("analytics", __name__)
-
-# Database connection
-client = MongoClient("mongodb://localhost:27017/")
-db = client["urbaneye"]
-issues_collection = db["issues"]
+log = get_logger(__name__)
 
 @analytics_bp.route("/stats", methods=["GET"])
 def get_statistics():
@@ -58,7 +55,7 @@ def get_statistics():
         })
     
     except Exception as e:
-        print(f"❌ Analytics error: {e}")
+        log.error("Analytics error", error=str(e))
         # Return safe defaults instead of crashing
         return jsonify({
             "total": 0,
@@ -75,9 +72,9 @@ def get_hotspots():
     """
     Predictive Maintenance: Find clusters of issues.
     """
-    # Get all active issues (ignore resolved)
+    # Get all active issues (ignore resolved and linked duplicates)
     issues = list(issues_collection.find(
-        {"status": {"$in": ["Pending", "Assigned", "In Progress"]}},
+        {"status": {"$in": ["Pending", "Assigned", "In Progress"]}, "is_duplicate_of": None},
         {"latitude": 1, "longitude": 1, "issue_type": 1}
     ))
     
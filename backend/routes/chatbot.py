@@ -6,6 +6,9 @@ Endpoints for AI assistant conversations
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 import uuid
+from services.log import get_logger
+
+log = get_logger(__name__)
 
 # Global chatbot instance for lazy loading
 chatbot = None
@@ -18,7 +21,7 @@ def get_chatbot():
             from ai.chatbot_engine import UrbanEyeChatbot
             chatbot = UrbanEyeChatbot()
         except Exception as e:
-            print(f"❌ Error initializing chatbot engine: {e}")
+            log.error("Error initializing chatbot engine", error=str(e))
             chatbot = "ERROR" # Marker to prevent repeated failing attempts
     return chatbot
 
@@ -57,7 +60,7 @@ def send_message():
         })
         
     except Exception as e:
-        print(f"❌ Chatbot error: {e}")
+        log.error("Chatbot error", error=str(e))
         return jsonify({
             "error": "Failed to generate response",
             "details": str(e)
@@ -121,3 +124,21 @@ def health_check():
         "status": "available" if is_avail else "unavailable",
         "message": "Chatbot ready" if is_avail else "Chatbot engine initialization failed"
     })
+
+
+@bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    FAQ response cache hit-rate metrics
+    
+    GET /api/chatbot/cache-stats
+    """
+    bot = get_chatbot()
+    if bot is None or bot == "ERROR":
+        return jsonify({"error": "Chatbot not available"}), 503
+    
+    return jsonify({
+        "service": "chatbot",
+        "ai_tier": bot.chatbot_type,
+        "cache": bot.get_cache_stats()
+    })
@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify
 from config import db
+from services.log import get_logger
 
 features_bp = Blueprint("features", __name__)
+log = get_logger(__name__)
 feature_flags_collection = db["feature_flags"]
 
 @features_bp.route("/status", methods=["GET"])
@@ -29,5 +31,5 @@ def get_feature_status():
             
         return jsonify(flags)
     except Exception as e:
-        print(f"❌ Feature Flags Error: {e}")
+        log.error("Feature flags error", error=str(e))
         return jsonify({"error": str(e)}), 500
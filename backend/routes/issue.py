@@ -2,28 +2,59 @@ import os
 from flask import Blueprint, request, jsonify
 from config import issues_collection
 from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
+from services.metrics import metrics
+from services.log import get_logger
+from services.tracing import tracer
 
 issue_bp = Blueprint("issue", __name__)
+log = get_logger(__name__)
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+_sha_index_ready = False
+
+def _find_identical_upload(content_sha256):
+    """Earliest issue whose upload has exactly these bytes (object still stored)"""
+    global _sha_index_ready
+    if not content_sha256:
+        return None
+    try:
+        if not _sha_index_ready:
+            issues_collection.create_index("content_sha256", sparse=True)
+            _sha_index_ready = True
+        issue = issues_collection.find_one(
+            {"content_sha256": content_sha256, "image_path": {"$ne": None}},
+            sort=[("created_at", 1)]
+        )
+    except Exception as e:
+        log.warning("Identical-upload lookup failed", error=str(e))
+        return None
+    from services.storage import storage
+    if issue and storage.exists(issue["image_path"]):
+        return issue
+    return None
+
 @issue_bp.route("/report", methods=["POST"])
 def report_issue():
-    print("➡️ Received Report Request") # DEBUG LOG
+    log.debug("Received report request")
     
     # Lazy imports
     from routes.routing import get_routing_info
     try:
         from ai.image_classifier import classify_issue
     except Exception as e:
-        print(f"Warning: image_classifier not available: {e}")
+        log.warning("image_classifier not available", error=str(e))
         def classify_issue(path): return "unknown"
 
     # Initialize ALL variables at start to prevent UnboundLocalError
     forensics_data = {"status": "Skipped", "details": "No image provided"}
     severity_data = {"score": 1, "label": "Low", "details": {"method": "default"}}
     image_hash = None
+    image_dhash = None  # packed 64-bit dHash (signed for MongoDB)
+    video_analysis = None  # keyframe votes for video reports
+    content_sha256 = None
     media_type = "text"
     image_path = None
     issue_type = "unknown"
@@ -35,34 +66,56 @@ def report_issue():
     try:
         image = request.files.get("image")
         data = request.form
-        print(f"📦 Payload: Image={image.filename if image else 'None'}, Title={data.get('title')}")
+        log.info("Report payload", has_image=bool(image), content_type=image.mimetype if image else None,
+                 title_chars=len(data.get("title") or ""))
+    except RequestEntityTooLarge:
+        raise  # 413 from the streaming upload limits
     except Exception as e:
-        print(f"❌ Error Parsing Request: {e}")
+        log.error("Error parsing request", error=str(e))
         return jsonify({"error": "Bad Request Payload"}), 400
 
     image_path = None
     issue_type = "unknown"
 
     if image:
-        # FIX: Generate unique filename to prevent overwriting
-        import uuid
-        import time
-        ext = os.path.splitext(image.filename)[1]
-        unique_filename = f"{int(time.time())}_{uuid.uuid4().hex[:8]}{ext}"
-        image_path = os.path.join(UPLOAD_FOLDER, unique_filename)
+        # Already streamed to uploads/ and hashed on write; move it into
+        # content-addressed storage (identical bytes are stored once)
+        from services.upload_streaming import save_upload
+        from services.storage import storage
+        with tracer.span("upload"):
+            upload_path, _, content_sha256 = save_upload(image, UPLOAD_FOLDER, claim=False)
+            image_path = storage.put_file(upload_path, digest=content_sha256)
+        # Local file for the AI stages (the stored object itself when local)
+        work_path = storage.local_path(image_path, hint=upload_path)
         
-        image.save(image_path)
+        # Byte-identical upload seen before? Reuse its AI results
+        with tracer.span("identical_lookup"):
+            identical = _find_identical_upload(content_sha256)
+        metrics.cache_result("identical_upload", hit=bool(identical))
+        if identical:
+            log.info("Identical upload, skipping AI stages", original_id=str(identical["_id"]))
         
         # Check Media Type
         filename_lower = image.filename.lower()
         if filename_lower.endswith(('.mp4', '.mov', '.avi', '.mkv')):
             # VIDEO FLOW
-            try:
-                from ai.video_analyzer import process_video
-                issue_type_raw = process_video(image_path)
-            except Exception as e:
-                print(f"Error processing video: {e}")
-                issue_type_raw = "unknown"
+            from ai.duplicate_detector import find_potential_duplicate
+            from ai.perceptual_hash import to_hex
+            if identical:
+                issue_type_raw = str(identical.get("issue_type", "unknown")).replace("Advisory: ", "")
+                video_analysis = identical.get("video_analysis")
+                image_dhash = identical.get("image_dhash")
+            else:
+                try:
+                    from ai.inference_service import run_inference
+                    video_analysis = run_inference("video", work_path)
+                except Exception as e:
+                    log.error("Error processing video", error=str(e))
+                    video_analysis = None
+                issue_type_raw = (video_analysis or {}).get("issue_type", "unknown")
+                image_dhash = (video_analysis or {}).get("fingerprint")
+            # Keyframe fingerprint, compared like an image dHash
+            image_hash = to_hex(image_dhash) if image_dhash is not None else None
             
             # User Constraint: "Video analysis results are advisory"
             if issue_type_raw != "unknown":
@@ -75,19 +128,47 @@ def report_issue():
             status = "Pending"
             linked_to = None
             admin_remarks = "Video Analysis - Verification Required"
-            image_hash = None # No hashing for video yet
+            
+            with tracer.span("duplicate_query"):
+                duplicate = find_potential_duplicate(image_dhash, data.get("latitude"), data.get("longitude"),
+                                                     media_type="video")
+            if duplicate:
+                issues_collection.update_one({"_id": duplicate["_id"]}, {"$inc": {"support_count": 1}})
+                status = "Duplicate"
+                linked_to = str(duplicate["_id"])
+                admin_remarks = f"Linked to existing video #{str(duplicate['_id'])[-6:]} - Verification Required"
             media_type = "video"
             
         else:
             # IMAGE FLOW (Existing)
             media_type = "image"
             
+            # Decode once; every AI stage below shares this context
+            from ai.image_context import ImageContext
+            with tracer.span("decode"):
+                image_ctx = ImageContext.from_path(work_path)
+            
+            # List/card renditions (?size=thumb|medium), reusing the decode
+            if not identical:
+                from services.image_renditions import rendition_service
+                with tracer.span("renditions"):
+                    rendition_service.create_renditions(image_ctx, digest=content_sha256)
+            
             # 1. Compute Hash
-            from ai.duplicate_detector import compute_dhash, find_potential_duplicate
-            image_hash = compute_dhash(image_path)
+            from ai.duplicate_detector import find_potential_duplicate
+            from ai.inference_service import run_inference
+            from ai.perceptual_hash import to_hex, to_signed64, from_hex
+            if identical:
+                image_dhash = identical.get("image_dhash")
+                if image_dhash is None:
+                    image_dhash = to_signed64(from_hex(identical.get("image_hash")))
+            else:
+                image_dhash = to_signed64(run_inference("dhash", image_ctx))
+            image_hash = to_hex(image_dhash)
             
             # 2. Check Duplicate
-            duplicate = find_potential_duplicate(image_hash, data.get("latitude"), data.get("longitude"))
+            with tracer.span("duplicate_query"):
+                duplicate = find_potential_duplicate(image_dhash, data.get("latitude"), data.get("longitude"))
             
             if duplicate:
                 # IT IS A DUPLICATE
@@ -114,10 +195,17 @@ def report_issue():
             else:
                 # NEW UNIQUE ISSUE
                 # NEW: YOLOv8 Object Detection based Civic Infrastructure Analysis
-                from ai.yolo_detector import detect_issue
-                yolo_result = detect_issue(image_path)
+                yolo_result = None if identical else run_inference("yolo", image_ctx)
                 
-                if yolo_result:
+                if identical:
+                    # Same bytes -> same classification and severity
+                    issue_type = identical.get("issue_type", "unknown")
+                    severity_data = {
+                        "score": identical.get("severity_score", 1),
+                        "label": identical.get("severity_label", "Low"),
+                        "details": identical.get("severity_details", {})
+                    }
+                elif yolo_result:
                     issue_type = yolo_result["issue_type"]
                     severity_data = {
                         "score": 3 if yolo_result["severity_score"] == "High" else (2 if yolo_result["severity_score"] == "Medium" else 1),
@@ -125,14 +213,18 @@ def report_issue():
                         "details": {
                             "method": "YOLOv8",
                             "area_pixels": yolo_result["detected_area_pixels"],
+                            "area_ratio": yolo_result["damaged_area_ratio"],
+                            "detections": yolo_result["detection_count"],
                             "confidence": yolo_result["confidence"],
+                            "bounding_box": yolo_result["bounding_box"],
                             "repair_cost": yolo_result["estimated_repair_cost"]
                         }
                     }
-                    print(f"✅ YOLOv8 Detection: {issue_type} ({severity_data['label']})")
+                    log.info("YOLOv8 detection", issue_type=issue_type, severity=severity_data["label"])
                 else:
                     # FALLBACK: Use existing MobileNetV2 classifier
-                    ai_result = classify_issue(image_path)
+                    with tracer.span("classify"):
+                        ai_result = classify_issue(image_ctx)
                     
                     if isinstance(ai_result, dict):
                         if ai_result.get("status") == "confident":
@@ -145,30 +237,32 @@ def report_issue():
                         issue_type = ai_result if ai_result else "unknown"
                     
                     # Phase 5: AI Severity Estimation
-                    from ai.severity_model import estimate_severity
-                    severity_data = estimate_severity(image_path, issue_type)
-                    print(f"⚠️ YOLO Failed. Fallback to MobileNetV2: {issue_type}")
+                    severity_data = run_inference("severity", image_ctx, issue_type)
+                    log.warning("YOLO failed, fell back to MobileNetV2", issue_type=issue_type)
 
                 # NEW: Civic Impact Radius Calculation
                 from ai.impact_radius import calculate_impact_radius
-                impact_data = calculate_impact_radius(
-                    float(data.get("latitude", 0)), 
-                    float(data.get("longitude", 0)), 
-                    severity_data["label"]
-                )
+                with tracer.span("impact"):
+                    impact_data = calculate_impact_radius(
+                        float(data.get("latitude", 0)), 
+                        float(data.get("longitude", 0)), 
+                        severity_data["label"]
+                    )
                 
                 routing = get_routing_info(issue_type)
                 status = "Pending"
                 linked_to = None
                 admin_remarks = None
                 
-                # Phase 6: Forensics
+                # Phase 6: Forensics (header-only, so re-run even for identical
+                # bytes: age and location depend on this report)
                 from ai.metadata_forensics import analyze_metadata
-                forensics_data = analyze_metadata(image_path)
+                with tracer.span("forensics"):
+                    forensics_data = analyze_metadata(image_ctx, data.get("latitude"), data.get("longitude"))
                 
                 # 🧠 STEP 2: BACKEND ROUTING LOGIC (Generative vs Agentic)
                 ai_mode = data.get("ai_mode", "GENERATIVE") # Default to Generative (Toggle OFF)
-                print(f"🧠 AI MODE: {ai_mode}")
+                log.info("AI mode", ai_mode=ai_mode)
                 
                 ai_summary_text = "Processing..."
                 agentic_data = None
@@ -177,11 +271,12 @@ def report_issue():
                     # 🤖 AGENTIC MODE
                     try:
                         from ai.agentic_engine import run_agentic_pipeline
-                        agentic_result = run_agentic_pipeline(
-                            description=data.get("description", "No description"),
-                            location=data.get("address", "Unknown Location"),
-                            image_path=image_path
-                        )
+                        with tracer.span("agentic"):
+                            agentic_result = run_agentic_pipeline(
+                                description=data.get("description", "No description"),
+                                location=data.get("address", "Unknown Location"),
+                                image_path=work_path
+                            )
                         agentic_data = agentic_result
                         
                         # Flatten for backward compatibility
@@ -192,16 +287,17 @@ def report_issue():
                              routing["priority"] = triage.get("priority_level", routing["priority"])
                              ai_summary_text = f"[AGENTIC DECISION] {triage.get('issue_type')} - {triage.get('priority_level')}\nPolicy: {agentic_result.get('policy', {}).get('applicable_policy')}"
                     except Exception as e:
-                        print(f"❌ Agentic Pipeline Failed: {e}")
+                        log.error("Agentic pipeline failed", error=str(e))
                         ai_summary_text = "Agentic AI Error"
 
                 else:
                     # ✨ GENERATIVE MODE (Toggle OFF)
                     from ai.summarizer import summarizer
-                    ai_summary_text = summarizer.generate_generative_summary(
-                        description=data.get("description", "No description"),
-                        location=data.get("address", "Unknown Location")
-                    )
+                    with tracer.span("summarize"):
+                        ai_summary_text = summarizer.generate_generative_summary(
+                            description=data.get("description", "No description"),
+                            location=data.get("address", "Unknown Location")
+                        )
                     # Parse the text to extract fields if possible, or just store the text
                     # For now, we store the full text in admin_remarks or description supplement
 
@@ -220,8 +316,11 @@ def report_issue():
         "created_at": datetime.now(),
         # Phase 4 Fields
         "image_hash": image_hash,
+        "image_dhash": image_dhash,
+        "content_sha256": content_sha256,
         "support_count": 1,
         "media_type": media_type,
+        "video_analysis": video_analysis,
         "is_duplicate_of": linked_to,
         "admin_remarks": admin_remarks,
         # Phase 5 Fields
@@ -232,9 +331,12 @@ def report_issue():
         "estimated_repair_cost": severity_data["details"].get("repair_cost", 0),
         "impact_radius": impact_data.get("impact_radius", 0) if 'impact_data' in locals() else 0,
         "affected_population": impact_data.get("affected_population", 0) if 'impact_data' in locals() else 0,
+        "population_source": impact_data.get("population_source") if 'impact_data' in locals() else None,
         # Phase 6 Fields
         "voice_transcript": data.get("voice_transcript"),
         "forensics_data": forensics_data,
+        # Per-stage milliseconds up to this point (services/tracing.py)
+        "pipeline_timings": tracer.pipeline_timings(),
         # Phase 9 Fields
         "reporter_email": data.get("reporter_email"),  # Optional
         "notify_on_updates": data.get("notify_on_updates", "true").lower() == "true",
@@ -249,7 +351,13 @@ def report_issue():
 
     result = issues_collection.insert_one(issue)
     issue_id = str(result.inserted_id)
-    
+
+    # Pothole depth/volume estimate runs in the background (fills volumetric_data)
+    if media_type == "image" and status != "Duplicate" and "pothole" in str(issue_type).lower():
+        from ai.volumetric_analyzer import schedule_volume_enrichment
+        schedule_volume_enrichment(issue_id, image_path, (severity_data.get("details") or {}).get("bounding_box"),
+                                   content_sha256)
+
     # Phase 9: Send welcome notification if email provided
     reporter_email = data.get("reporter_email")
     notify_enabled = data.get("notify_on_updates", "true").lower() == "true"
@@ -280,7 +388,7 @@ def report_issue():
                     }}}
                 )
         except Exception as e:
-            print(f"Notification error (non-critical): {e}")
+            log.warning("Notification error (non-critical)", error=str(e))
     
     response_data = {
         "message": "Issue reported", 
@@ -341,5 +449,5 @@ def get_ai_summary(issue_id):
         
         return jsonify(summary)
     except Exception as e:
-        print(f"Agent Error: {e}")
+        log.error("Agent error", error=str(e))
         return jsonify({"error": str(e)}), 500
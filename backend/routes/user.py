@@ -160,16 +160,18 @@ def upload_profile_photo(user_id):
     if image.filename == '':
         return jsonify({"success": False, "message": "Empty filename"}), 400
 
-    # Save image
-    upload_dir = os.path.join("uploads", "profiles")
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    filename = f"profile_{user_id}_{int(datetime.now().timestamp())}.jpg"
-    filepath = os.path.join(upload_dir, filename)
-    image.save(filepath)
+    # Save image (content-addressed, see services/storage.py)
+    from services.upload_streaming import save_upload
+    from services.storage import storage
+    upload_path, _, content_sha256 = save_upload(image, "uploads", claim=False)
+    ext = os.path.splitext(upload_path)[1] or ".jpg"
+    photo_url = storage.put_file(upload_path, digest=content_sha256, ext=ext)
+
+    # Avatar-sized renditions (?size=thumb)
+    from services.image_renditions import rendition_service
+    rendition_service.create_renditions(storage.local_path(photo_url, hint=upload_path), digest=content_sha256)
 
     # Update DB
-    photo_url = f"uploads/profiles/{filename}"
     users_collection.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": {"profile_photo": photo_url}}
@@ -0,0 +1,232 @@
+"""
+Image Rendition Service for UrbanEye
+Small WebP/JPEG versions of uploads for list and card views
+
+The admin issue list and the mobile "My Reports" screen show dozens of
+photos at 60-72px. Serving each full-resolution original for that is
+wasteful, so every image upload gets fixed-size renditions:
+
+    thumb   - longest side 160px  (list rows, map pins)
+    medium  - longest side 640px  (detail cards, mobile detail view)
+
+Renditions are content-addressed by the SHA-256 of the original bytes:
+
+    uploads/renditions/ab/ab12...ef/thumb.webp
+    uploads/renditions/ab/ab12...ef/thumb.jpg
+
+so identical uploads share files and a rendition URL never changes its
+bytes (strong ETag + Cache-Control: immutable). Content-addressed uploads
+(services/storage.py) carry the digest in their name; for older flat
+uploads a tiny pointer file (uploads/renditions/names/<upload name>) maps
+the name to its digest. Missing renditions are generated on first request.
+Renditions are a regenerable local cache, whatever the storage backend.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services.metrics import metrics
+from services.log import get_logger
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+log = get_logger(__name__)
+
+UPLOAD_ROOT = "uploads"
+
+# size name -> longest side in pixels
+RENDITION_SIZES = {"thumb": 160, "medium": 640}
+
+# Bump when sizes/quality change so ETags change with the bytes
+RENDITION_VERSION = 1
+
+FORMATS = {
+    "webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, 80] if CV2_AVAILABLE else []),
+    "jpeg": (".jpg", "image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, 82, cv2.IMWRITE_JPEG_PROGRESSIVE, 1] if CV2_AVAILABLE else []),
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+# Uploads that could not be rendered are not retried for this long
+# (every ?size= request would otherwise re-read and re-decode the original)
+NEGATIVE_TTL_S = 600
+
+
+class RenditionService:
+    def __init__(self, upload_root=UPLOAD_ROOT):
+        self.upload_root = upload_root
+        self.rendition_root = os.path.join(upload_root, "renditions")
+        self.name_root = os.path.join(self.rendition_root, "names")
+        self._lock = threading.Lock()
+        self._digests = OrderedDict()  # upload name -> digest (LRU)
+        self._failed = OrderedDict()   # upload name -> retry-after time (LRU)
+        self._max_cached = 4096
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+    def rendition_path(self, digest, size, fmt):
+        ext = FORMATS[fmt][0]
+        return os.path.join(self.rendition_root, digest[:2], digest, f"{size}{ext}")
+
+    def _pointer_path(self, name):
+        return os.path.join(self.name_root, name)
+
+    @staticmethod
+    def etag(digest, size, fmt):
+        """Strong ETag: the bytes are fully determined by digest + size + format"""
+        return f"{digest[:32]}-{size}-{fmt}-v{RENDITION_VERSION}"
+
+    # ------------------------------------------------------------------
+    # Generation
+    # ------------------------------------------------------------------
+    def create_renditions(self, image, name=None, digest=None):
+        """
+        Generate every rendition for an upload (skips ones already on disk).
+
+        Args:
+            image: File path or shared ImageContext (reuses its decode)
+            name: Legacy (flat) upload name relative to uploads/, e.g.
+                  "1770_ab12.jpg" - records a pointer to the digest
+            digest: SHA-256 hex of the original bytes, if already known
+
+        Returns:
+            dict: {"sha256": digest, size: {fmt: path}} or None if not an image
+        """
+        from ai.image_context import ImageContext
+
+        if not CV2_AVAILABLE:
+            return None
+        try:
+            ctx = ImageContext.ensure(image)
+            if ctx.bgr is None:
+                return None
+            digest = digest or hashlib.sha256(ctx.data).hexdigest()
+
+            result = {"sha256": digest}
+            for size, max_side in RENDITION_SIZES.items():
+                result[size] = {}
+                for fmt, (_, _, params) in FORMATS.items():
+                    path = self.rendition_path(digest, size, fmt)
+                    if not os.path.exists(path):
+                        ok, buf = cv2.imencode(FORMATS[fmt][0], ctx.downscaled(max_side), params)
+                        if not ok:
+                            continue
+                        self._write_atomic(path, buf.tobytes())
+                    result[size][fmt] = path
+
+            if name:
+                self._write_atomic(self._pointer_path(name), digest.encode())
+                self._remember(name, digest)
+            return result
+        except Exception as e:
+            log.warning("Rendition generation failed", error=str(e))
+            return None
+
+    @staticmethod
+    def _write_atomic(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def _remember(self, name, digest):
+        with self._lock:
+            self._digests[name] = digest
+            self._digests.move_to_end(name)
+            while len(self._digests) > self._max_cached:
+                self._digests.popitem(last=False)
+
+    def _mark_failed(self, name):
+        with self._lock:
+            self._failed[name] = time.monotonic() + NEGATIVE_TTL_S
+            self._failed.move_to_end(name)
+            while len(self._failed) > self._max_cached:
+                self._failed.popitem(last=False)
+
+    def _recently_failed(self, name):
+        with self._lock:
+            retry_after = self._failed.get(name)
+            if retry_after is None:
+                return False
+            if retry_after > time.monotonic():
+                return True
+            del self._failed[name]
+            return False
+
+    def _original(self, name):
+        """Local copy of the original upload (None if it does not exist)"""
+        from services.storage import storage
+        key = f"{self.upload_root}/{name}"
+        try:
+            return storage.local_path(key) if storage.exists(key) else None
+        except Exception:
+            return None
+
+    def digest_for(self, name):
+        """Digest of an upload, generating renditions for legacy uploads"""
+        from services.storage import is_content_key
+        # Videos and other media never get renditions (and are not read)
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            return None
+        if is_content_key(f"{self.upload_root}/{name}"):
+            return os.path.splitext(os.path.basename(name))[0]
+
+        with self._lock:
+            digest = self._digests.get(name)
+        if digest:
+            return digest
+
+        pointer = self._pointer_path(name)
+        if os.path.exists(pointer):
+            with open(pointer) as f:
+                digest = f.read().strip()
+            self._remember(name, digest)
+            return digest
+
+        original = self._original(name)
+        if not original:
+            return None
+        created = self.create_renditions(original, name=name)
+        if not created:
+            self._mark_failed(name)
+        return created["sha256"] if created else None
+
+    def resolve(self, name, size, accept_webp=True):
+        """
+        Find the rendition file for an upload.
+
+        Returns:
+            tuple: (path, mimetype, etag) or None to fall back to the original
+        """
+        if size not in RENDITION_SIZES or self._recently_failed(name):
+            return None
+        digest = self.digest_for(name)
+        if not digest:
+            return None
+        fmt = "webp" if accept_webp else "jpeg"
+        path = self.rendition_path(digest, size, fmt)
+        exists = os.path.exists(path)
+        metrics.cache_result("rendition", hit=exists)
+        if not exists:
+            # Not generated yet (or removed): build from the original
+            original = self._original(name)
+            if not original or not self.create_renditions(original, digest=digest):
+                self._mark_failed(name)
+                return None
+        return path, FORMATS[fmt][1], self.etag(digest, size, fmt)
+
+
+# Global instance
+rendition_service = RenditionService()
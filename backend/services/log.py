@@ -0,0 +1,302 @@
+"""
+Structured Logging for UrbanEye
+JSON log records, request IDs, per-module levels and sampled debug output
+
+    from services.log import get_logger
+    log = get_logger(__name__)
+    log.info("YOLOv8 detection", issue_type=issue_type, severity="High")
+
+Every keyword argument becomes a field of the JSON record:
+
+    {"ts": "2026-10-19T11:48:54.441Z", "level": "INFO", "logger": "routes.issue",
+     "msg": "YOLOv8 detection", "request_id": "5f0c1d2e9a7b4c3d",
+     "stage": "yolo", "issue_type": "pothole", "severity": "High"}
+
+- Non-blocking: loggers only put records on a bounded in-memory queue
+  (QueueHandler). A single listener thread formats and writes them, so
+  a slow stdout pipe never stalls a request. When the queue is full,
+  records below WARNING are dropped and counted instead of blocking.
+- Request IDs: app.py sets one per request (X-Request-ID header or a new
+  one) in a contextvar; `log_context(stage=...)` adds pipeline fields.
+  Both are attached to every record logged inside the context, including
+  work handed to background threads through `contextvars.copy_context()`.
+- Levels: LOG_LEVEL for everything, LOG_LEVELS for overrides, e.g.
+  LOG_LEVELS="ai.gemini_chatbot=WARNING,routes.issue=DEBUG".
+- Volume control: DEBUG records are sampled (LOG_DEBUG_SAMPLE, fraction
+  kept) and every call site below WARNING is rate-limited to
+  LOG_RATE_PER_SITE records/second; the next record that passes reports
+  how many were suppressed.
+
+LOG_FORMAT=text gives plain one-line records for local development.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "0.1"))
+LOG_RATE_PER_SITE = float(os.getenv("LOG_RATE_PER_SITE", "20"))
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+context_var = contextvars.ContextVar("log_context", default={})
+
+# LogRecord attributes that are not user fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "fields"}
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+# ----------------------------------------------------------------------
+# Context
+# ----------------------------------------------------------------------
+def new_request_id(incoming=None):
+    """Use a sane incoming X-Request-ID or make a new one; set it for this context"""
+    rid = incoming if incoming and len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex[:16]
+    request_id_var.set(rid)
+    return rid
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+def clear_request_id():
+    """Forget the request ID once the request is done (threads are reused)"""
+    request_id_var.set(None)
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields (stage, issue_id, ...) to every record logged inside the block"""
+    token = context_var.set({**context_var.get(), **fields})
+    try:
+        yield
+    finally:
+        context_var.reset(token)
+
+
+# ----------------------------------------------------------------------
+# Logger with keyword fields
+# ----------------------------------------------------------------------
+class StructuredLogger(logging.LoggerAdapter):
+    """log.info("msg", key=value) -> record with fields {key: value}"""
+
+    def process(self, msg, kwargs):
+        passthrough = {k: kwargs.pop(k) for k in ("exc_info", "stack_info", "stacklevel", "extra") if k in kwargs}
+        extra = dict(passthrough.pop("extra", None) or {})
+        extra["fields"] = kwargs
+        passthrough["extra"] = extra
+        return msg, passthrough
+
+
+def get_logger(name):
+    configure_logging()
+    return StructuredLogger(logging.getLogger(name), {})
+
+
+# ----------------------------------------------------------------------
+# Filters (run in the calling thread)
+# ----------------------------------------------------------------------
+class ContextFilter(logging.Filter):
+    """Copy request ID and context fields onto the record before it is queued"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.context = context_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Sample DEBUG and rate-limit every call site below WARNING"""
+
+    def __init__(self, debug_sample=LOG_DEBUG_SAMPLE, rate=LOG_RATE_PER_SITE):
+        super().__init__()
+        self.debug_sample = debug_sample
+        self.rate = rate
+        self._sites = {}  # (logger, lineno) -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if record.levelno <= logging.DEBUG and random.random() >= self.debug_sample:
+            return False
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        site = (record.name, record.lineno)
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None:
+                state = self._sites[site] = [self.rate, now, 0]
+            state[0] = min(self.rate, state[0] + (now - state[1]) * self.rate)
+            state[1] = now
+            if state[0] < 1.0:
+                state[2] += 1
+                return False
+            state[0] -= 1.0
+            if state[2]:
+                record.suppressed = state[2]
+                state[2] = 0
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: drops when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message now (args may change later) but leave the
+        # JSON formatting to the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                # Errors matter more than latency: wait briefly for room
+                try:
+                    self.queue.put(record, timeout=0.05)
+                    return
+                except queue.Full:
+                    pass
+            self.dropped += 1
+
+
+# ----------------------------------------------------------------------
+# Formatters (run in the listener thread)
+# ----------------------------------------------------------------------
+def _record_fields(record):
+    fields = {}
+    fields.update(getattr(record, "context", None) or {})
+    fields.update(getattr(record, "fields", None) or {})
+    for key, value in vars(record).items():
+        if key not in _RESERVED and key not in ("request_id", "context", "suppressed"):
+            fields.setdefault(key, value)
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")
+                  .replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(_record_fields(record))
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = _record_fields(record)
+        extra = " ".join(f"{k}={v}" for k, v in fields.items())
+        rid = f" [{record.request_id}]" if getattr(record, "request_id", None) else ""
+        line = f"{datetime.fromtimestamp(record.created).strftime('%H:%M:%S')} {record.levelname:<7} " \
+               f"{record.name}{rid}: {record.getMessage()}{(' ' + extra) if extra else ''}"
+        if getattr(record, "suppressed", None):
+            line += f" (+{record.suppressed} suppressed)"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+# ----------------------------------------------------------------------
+# Setup
+# ----------------------------------------------------------------------
+def _apply_levels(spec):
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if level:
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def configure_logging(stream=None, force=False):
+    """
+    Install the queue handler on the root logger (idempotent).
+    Called by get_logger(), so importing modules configure it lazily.
+    """
+    global _listener
+    if _listener is not None and not force:
+        return _listener
+    with _configure_lock:
+        if _listener is not None and not force:
+            return _listener
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        handler = DroppingQueueHandler(log_queue)
+        handler.addFilter(ContextFilter())
+        handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        for existing in [h for h in root.handlers if isinstance(h, DroppingQueueHandler)]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        _apply_levels(LOG_LEVELS)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.handler = handler
+        _listener.start()
+        return _listener
+
+
+def _stop_listener():
+    """Drain the queue on interpreter exit"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_after_fork():
+    """Threads do not survive fork(): give the child its own listener thread"""
+    if _listener is not None and _listener._thread is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def dropped_records():
+    """Records dropped because the queue was full (since start)"""
+    return _listener.handler.dropped if _listener is not None else 0
@@ -0,0 +1,336 @@
+"""
+Metrics for UrbanEye
+Latency histograms, counters and cache hit rates in Prometheus text format
+
+Instrumented (see the call sites):
+    urbaneye_http_request_seconds{method, route, status}   - every Flask request
+    urbaneye_mongo_command_seconds{command, collection, outcome} - pymongo CommandListener
+    urbaneye_ai_stage_seconds{stage, backend}               - run_inference() stages
+    urbaneye_llm_call_seconds{provider, operation, outcome} - Gemini / OpenAI calls
+    urbaneye_cache_requests_total{cache, result}            - hit / miss per cache
+
+Histograms use fixed latency buckets; /metrics also reports p50/p95/p99
+per series (interpolated from the buckets, like histogram_quantile) as
+`<name>_quantile` and a hit ratio per cache as urbaneye_cache_hit_ratio.
+
+Gunicorn workers: set METRICS_MULTIPROC_DIR (or PROMETHEUS_MULTIPROC_DIR)
+to a directory shared by all workers. Each process keeps its series in
+memory and a background thread snapshots them to
+<dir>/metrics_<pid>_<start>.json once per METRICS_FLUSH_INTERVAL_S; a
+scrape sums every snapshot, so whichever worker answers /metrics reports
+the whole server. Snapshots of exited workers are kept (counters stay
+monotonic); gunicorn_config.py clears the directory on start.
+
+Usage:
+    from services.metrics import metrics
+    with metrics.timer("urbaneye_ai_stage_seconds", stage="yolo"):
+        ...
+    metrics.cache_result("chatbot_faq", hit=True)
+"""
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or os.getenv("PROMETHEUS_MULTIPROC_DIR")
+FLUSH_INTERVAL_S = float(os.getenv("METRICS_FLUSH_INTERVAL_S", "1.0"))
+
+# Upper bounds in seconds (+Inf is implicit)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+HELP = {
+    "urbaneye_http_request_seconds": "HTTP request latency by route",
+    "urbaneye_mongo_command_seconds": "MongoDB command latency",
+    "urbaneye_ai_stage_seconds": "AI inference stage latency",
+    "urbaneye_llm_call_seconds": "Outbound LLM call latency",
+    "urbaneye_cache_requests_total": "Cache lookups by result",
+}
+
+
+def _series_key(name, labels):
+    return json.dumps([name, sorted((k, str(v)) for k, v in labels.items())])
+
+
+def _format_labels(pairs, extra=()):
+    items = list(pairs) + list(extra)
+    if not items:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+def bucket_quantile(q, bounds, counts):
+    """
+    Quantile estimate from cumulative-free bucket counts (linear within a
+    bucket, like Prometheus' histogram_quantile).
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if seen + count >= rank and count:
+            lower = bounds[i - 1] if i > 0 else 0.0
+            if i >= len(bounds):  # +Inf bucket: best we can say is the last bound
+                return bounds[-1]
+            return lower + (bounds[i] - lower) * (rank - seen) / count
+        seen += count
+    return bounds[-1]
+
+
+class MetricsRegistry:
+    """In-process series plus optional per-process snapshots for aggregation"""
+
+    def __init__(self, multiproc_dir=MULTIPROC_DIR, flush_interval=FLUSH_INTERVAL_S):
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._histograms = {}  # key -> [bucket counts..., sum]
+        self._counters = {}    # key -> value
+        self._dirty = False
+        self._flusher = None
+        self._pid = None
+        self._snapshot_path = None
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def observe(self, name, seconds, **labels):
+        self._ensure_flusher()
+        key = _series_key(name, labels)
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+            self._dirty = True
+
+    def inc(self, name, amount=1, **labels):
+        self._ensure_flusher()
+        key = _series_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time a block; an exception is recorded as outcome="error" when the series has an outcome label"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if "outcome" in labels:
+                labels["outcome"] = "error"
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def llm_call(self, provider, operation):
+        """Timer for one outbound LLM request"""
+        return self.timer("urbaneye_llm_call_seconds", provider=provider, operation=operation, outcome="ok")
+
+    def cache_result(self, cache, hit):
+        self.inc("urbaneye_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    # ------------------------------------------------------------------
+    # Multiprocess snapshots
+    # ------------------------------------------------------------------
+    def _ensure_flusher(self):
+        if not self.multiproc_dir:
+            return
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                # Forked child: the parent's series belong to the parent's file
+                self._histograms, self._counters = {}, {}
+            self._pid = pid
+            self._snapshot_path = os.path.join(self.multiproc_dir, f"metrics_{pid}_{time.time_ns()}.json")
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this process's series to its snapshot file (if changed)"""
+        if not self.multiproc_dir or self._snapshot_path is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                state = {"histograms": {k: list(v) for k, v in self._histograms.items()},
+                         "counters": dict(self._counters)}
+                self._dirty = False
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            tmp = f"{self._snapshot_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self._snapshot_path)
+
+    def _collect(self):
+        """Series of every process (or just this one without a multiprocess dir)"""
+        if not self.multiproc_dir:
+            with self._lock:
+                return ({k: list(v) for k, v in self._histograms.items()}, dict(self._counters))
+        self.flush()
+        histograms, counters = {}, {}
+        if not os.path.isdir(self.multiproc_dir):
+            return histograms, counters
+        for name in os.listdir(self.multiproc_dir):
+            if not (name.startswith("metrics_") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, name)) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced right now; next scrape has it
+            for key, series in state.get("histograms", {}).items():
+                total = histograms.setdefault(key, [0] * len(series))
+                for i, value in enumerate(series):
+                    total[i] += value
+            for key, value in state.get("counters", {}).items():
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+    def render(self):
+        """All series in Prometheus text exposition format (0.0.4)"""
+        histograms, counters = self._collect()
+        lines = []
+
+        by_name = {}
+        for key, series in histograms.items():
+            name, pairs = json.loads(key)
+            by_name.setdefault(name, []).append((pairs, series))
+        for name in sorted(by_name):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            quantile_lines = []
+            for pairs, series in sorted(by_name[name], key=lambda s: s[0]):
+                counts, total_sum = series[:-1], series[-1]
+                cumulative = 0
+                for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(pairs, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {total_sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {cumulative}")
+                for q in QUANTILES:
+                    value = bucket_quantile(q, LATENCY_BUCKETS, counts)
+                    if value is not None:
+                        quantile_lines.append(
+                            f"{name}_quantile{_format_labels(pairs, [('quantile', q)])} {value:.6f}")
+            if quantile_lines:
+                lines.append(f"# HELP {name}_quantile Estimated latency quantiles from the histogram buckets")
+                lines.append(f"# TYPE {name}_quantile gauge")
+                lines.extend(quantile_lines)
+
+        counter_names = {}
+        for key, value in counters.items():
+            name, pairs = json.loads(key)
+            counter_names.setdefault(name, []).append((pairs, value))
+        for name in sorted(counter_names):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for pairs, value in sorted(counter_names[name], key=lambda s: s[0]):
+                lines.append(f"{name}{_format_labels(pairs)} {value}")
+
+        # Hit ratio per cache
+        caches = {}
+        for pairs, value in counter_names.get("urbaneye_cache_requests_total", []):
+            labels = dict(pairs)
+            entry = caches.setdefault(labels.get("cache"), [0, 0])
+            entry[0 if labels.get("result") == "hit" else 1] += value
+        if caches:
+            lines.append("# HELP urbaneye_cache_hit_ratio Cache hits / lookups")
+            lines.append("# TYPE urbaneye_cache_hit_ratio gauge")
+            for cache, (hits, misses) in sorted(caches.items()):
+                lines.append(f"urbaneye_cache_hit_ratio{_format_labels([('cache', cache)])} "
+                             f"{hits / (hits + misses):.4f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name=None):
+        """{series: {count, sum, p50, p95, p99}} for JSON dashboards"""
+        histograms, _ = self._collect()
+        out = {}
+        for key, series in histograms.items():
+            series_name, pairs = json.loads(key)
+            if name and series_name != name:
+                continue
+            counts = series[:-1]
+            label = series_name + _format_labels(pairs)
+            out[label] = {"count": sum(counts), "sum": round(series[-1], 6)}
+            for q in QUANTILES:
+                value = bucket_quantile(q, LATENCY_BUCKETS, counts)
+                out[label][f"p{int(q * 100)}"] = round(value, 6) if value is not None else None
+        return out
+
+
+def clear_multiproc_dir(path=MULTIPROC_DIR):
+    """Remove old snapshots (call once before workers start)"""
+    if path and os.path.isdir(path):
+        for name in os.listdir(path):
+            if name.startswith("metrics_"):
+                os.remove(os.path.join(path, name))
+
+
+# ----------------------------------------------------------------------
+# MongoDB command listener
+# ----------------------------------------------------------------------
+try:
+    from pymongo import monitoring
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        """Latency of every MongoDB command, labelled by command and collection"""
+
+        def __init__(self, registry):
+            self.registry = registry
+            self._collections = {}
+            self._lock = threading.Lock()
+
+        def started(self, event):
+            target = event.command.get(event.command_name)
+            collection = target if isinstance(target, str) else ""
+            with self._lock:
+                self._collections[(event.connection_id, event.request_id)] = collection
+
+        def _finish(self, event, outcome):
+            with self._lock:
+                collection = self._collections.pop((event.connection_id, event.request_id), "")
+            self.registry.observe("urbaneye_mongo_command_seconds", event.duration_micros / 1e6,
+                                  command=event.command_name, collection=collection, outcome=outcome)
+
+        def succeeded(self, event):
+            self._finish(event, "ok")
+
+        def failed(self, event):
+            self._finish(event, "error")
+
+    MONGO_MONITORING_AVAILABLE = True
+except ImportError:
+    MONGO_MONITORING_AVAILABLE = False
+
+
+# Global instance
+metrics = MetricsRegistry()
+atexit.register(metrics.flush)
@@ -9,6 +9,10 @@ from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import os
 
+from services.log import get_logger
+
+log = get_logger(__name__)
+
 class NotificationService:
     def __init__(self):
         # Using a simple SMTP approach (can be configured for Gmail, etc.)
@@ -39,18 +43,16 @@ class NotificationService:
             # For development: just log to console
             # In production: use actual SMTP
             if not self.enabled:
-                print(f"\n📧 [MOCK EMAIL NOTIFICATION]")
-                print(f"To: {to_email}")
-                print(f"Subject: {subject}")
-                print(f"Body:\n{body}")
-                print(f"=" * 50)
+                # Never log the body: it carries reporter and location details
+                log.info("Mock email notification", notification_type=notification_type,
+                         to_domain=to_email.rpartition("@")[2], body_chars=len(body))
                 return True
             
             # Production email sending (disabled by default)
             return self._send_smtp_email(to_email, subject, body)
             
         except Exception as e:
-            print(f"Notification Error: {e}")
+            log.error("Notification error", error=str(e))
             return False
     
     def _create_email_content(self, notification_type, issue_data):
@@ -151,7 +153,7 @@ Note: This notification is informational and does not constitute a guarantee of
             
             return True
         except Exception as e:
-            print(f"SMTP Error: {e}")
+            log.error("SMTP error", error=str(e))
             return False
 
 # Singleton instance
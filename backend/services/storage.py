@@ -0,0 +1,192 @@
+"""
+Upload Storage for UrbanEye
+Content-addressed, sharded object storage with pluggable backends
+
+Every stored file gets a key that doubles as its public path:
+
+    uploads/ab/cd/abcd1234...ef.jpg     (content-addressed: SHA-256 of the bytes)
+    uploads/audio/<issue>_<texthash>.mp3 (explicit key, e.g. TTS cache)
+
+Two levels of 2-hex-digit shards keep every directory small (65,536 leaf
+directories) and identical bytes map to the same key, so re-uploads are
+stored once. Keys are stored as-is in `image_path` / `profile_photo`, so
+the existing `/uploads/<path>` URLs keep working.
+
+Backends (STORAGE_BACKEND):
+    local  - files under STORAGE_LOCAL_ROOT (default: backend working dir)
+    s3     - any S3-compatible store (AWS S3, MinIO) via optional boto3:
+             S3_BUCKET, S3_ENDPOINT_URL (e.g. http://127.0.0.1:9000 for MinIO),
+             AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY, S3_REGION
+
+AI stages need a local file; local_path() returns one for either backend
+(remote objects are fetched into a local cache once).
+"""
+
+import hashlib
+import os
+import shutil
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+KEY_PREFIX = "uploads"
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_key(digest, ext=""):
+    """uploads/ab/cd/<digest><ext>"""
+    ext = ext.lower() if ext else ""
+    return f"{KEY_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def is_content_key(key):
+    parts = str(key or "").replace("\\", "/").split("/")
+    if len(parts) != 4 or parts[0] != KEY_PREFIX:
+        return False
+    stem = os.path.splitext(parts[3])[0]
+    return len(stem) == 64 and stem[:2] == parts[1] and stem[2:4] == parts[2]
+
+
+class LocalStorage:
+    """Files on the worker's disk (default)"""
+
+    backend = "local"
+    is_remote = False
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv("STORAGE_LOCAL_ROOT", ".")
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return bool(key) and os.path.isfile(self._path(key))
+
+    def put_file(self, src, key=None, digest=None, ext=None, move=True):
+        """
+        Store a local file.
+
+        Args:
+            src: Path of the file to store
+            key: Explicit key; default is the content-addressed key
+            digest: SHA-256 of src if already known (saves a re-read)
+            ext: Extension for content keys (default: src's extension)
+            move: Move src into place instead of copying it
+
+        Returns:
+            str: Storage key
+        """
+        if key is None:
+            digest = digest or file_sha256(src)
+            key = content_key(digest, os.path.splitext(src)[1] if ext is None else ext)
+
+        dest = self._path(key)
+        if os.path.exists(dest):
+            # Identical bytes already stored
+            if move and os.path.abspath(src) != os.path.abspath(dest):
+                os.remove(src)
+            return key
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if move:
+            os.replace(src, dest)
+        else:
+            tmp = f"{dest}.{os.getpid()}.tmp"
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+        return key
+
+    def local_path(self, key, hint=None):
+        return self._path(key)
+
+    def delete(self, key):
+        if self.exists(key):
+            os.remove(self._path(key))
+
+    def url(self, key):
+        """Local objects are served by app.uploaded_file"""
+        return None
+
+
+class S3Storage:
+    """S3-compatible object store (AWS S3, MinIO)"""
+
+    backend = "s3"
+    is_remote = True
+
+    def __init__(self, bucket=None, endpoint_url=None, region=None, cache_dir=None):
+        if not BOTO3_AVAILABLE:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        self.bucket = bucket or os.getenv("S3_BUCKET", "urbaneye-uploads")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or os.getenv("S3_ENDPOINT_URL") or None,
+            region_name=region or os.getenv("S3_REGION", "us-east-1"),
+        )
+        self.cache_dir = cache_dir or os.getenv("STORAGE_CACHE_DIR", os.path.join("uploads", ".cache"))
+        self.url_expiry = int(os.getenv("S3_URL_EXPIRY", "3600"))
+
+    def exists(self, key):
+        if not key:
+            return False
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def put_file(self, src, key=None, digest=None, ext=None, move=True):
+        """
+        Upload a local file (skipped if the key already exists).
+        src is left in place: it stays usable as the local working copy
+        for the current request (streamed uploads are removed at request end).
+        """
+        if key is None:
+            digest = digest or file_sha256(src)
+            key = content_key(digest, os.path.splitext(src)[1] if ext is None else ext)
+        if not self.exists(key):
+            self.client.upload_file(src, self.bucket, key)
+        return key
+
+    def local_path(self, key, hint=None):
+        """Local copy of an object (hint: a file known to hold the same bytes)"""
+        if hint and os.path.isfile(hint):
+            return hint
+        path = os.path.join(self.cache_dir, key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            self.client.download_file(self.bucket, key, tmp)
+            os.replace(tmp, path)
+        return path
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def url(self, key):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=self.url_expiry
+        )
+
+
+def create_storage(backend=None):
+    backend = (backend or os.getenv("STORAGE_BACKEND", "local")).lower()
+    if backend == "s3":
+        return S3Storage()
+    return LocalStorage()
+
+
+# Global instance
+storage = create_storage()
@@ -0,0 +1,313 @@
+"""
+Request Tracing for UrbanEye
+Span timelines for report processing, OpenTelemetry-compatible
+
+Every Flask request gets a root span (app.py); code inside it opens child
+spans that nest through a contextvar, so they follow the request into
+run_cpu() threads and the background executors like the log context does:
+
+    from services.tracing import tracer
+    with tracer.span("duplicate_query"):
+        duplicate = find_potential_duplicate(...)
+
+Instrumented (see the call sites): each stage of report_issue, every
+run_inference() stage, each agent of run_agentic_pipeline and every
+MongoDB command (pymongo CommandListener, spans named "mongo.<command>").
+
+The root span also collects per-stage durations of everything finished
+under it; `tracer.pipeline_timings()` turns them into the compact summary
+stored on the issue document:
+
+    {"total_ms": 5231.4, "stages": {"yolo": 412.0, "agent_triage": 3120.7, ...},
+     "mongo": {"calls": 6, "ms": 21.3}, "trace_id": "4bf92f3577b34da6a3ce929d0e0e4736"}
+
+Export:
+- TRACE_EXPORT_PATH: append finished spans as JSON lines with OTLP field
+  names (traceId, spanId, parentSpanId, startTimeUnixNano, ...). Written
+  in batches when a trace's root span ends.
+- OpenTelemetry: when the opentelemetry API is installed (TRACING_OTEL=auto,
+  the default) every span is mirrored to it, so a configured SDK/collector
+  receives the same timeline. Incoming W3C `traceparent` headers are honoured
+  either way.
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+TRACING_OTEL = os.getenv("TRACING_OTEL", "auto").lower()
+EXPORT_BATCH = 256  # spans buffered before a forced write
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate as otel_propagate
+    from opentelemetry import trace as otel_trace
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current_span = ContextVar("trace_span", default=None)
+
+
+class PipelineTimings:
+    """Per-stage milliseconds of the spans finished under one root span"""
+
+    def __init__(self):
+        self.stages = {}
+        self.mongo_calls = 0
+        self.mongo_ms = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        ms = span.duration_ms
+        with self._lock:
+            if span.attributes.get("db.system") == "mongodb":
+                self.mongo_calls += 1
+                self.mongo_ms += ms
+            else:
+                # Repeated stages (two duplicate queries, ...) are summed
+                self.stages[span.name] = self.stages.get(span.name, 0.0) + ms
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "root", "attributes",
+                 "status", "start_ns", "end_ns", "timings", "_token", "_otel", "_otel_token")
+
+    def __init__(self, name, parent=None, attributes=None, trace_id=None, parent_id=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else (trace_id or os.urandom(16).hex())
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else parent_id
+        self.root = parent.root if parent else self
+        self.attributes = {k: v for k, v in (attributes or {}).items() if v is not None}
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.timings = None if parent else PipelineTimings()
+        self._token = None
+        self._otel = None
+        self._otel_token = None
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+        if self._otel is not None:
+            for key, value in attributes.items():
+                if value is not None:
+                    self._otel.set_attribute(key, value)
+
+    def to_dict(self):
+        """OTLP-style JSON representation"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+        }
+
+
+class SpanFileExporter:
+    """Append finished spans to a JSON-lines file, one write per trace"""
+
+    def __init__(self, path):
+        self.path = path
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def export(self, span, flush=False):
+        with self._lock:
+            self._buffer.append(span.to_dict())
+            if not flush and len(self._buffer) < EXPORT_BATCH:
+                return
+            batch, self._buffer = self._buffer, []
+        self._write(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        lines = "".join(json.dumps(item, default=str) + "\n" for item in batch)
+        try:
+            with open(self.path, "a") as f:
+                f.write(lines)
+        except OSError:
+            pass  # tracing must never fail a request
+
+
+class Tracer:
+    def __init__(self, export_path=TRACE_EXPORT_PATH, otel=TRACING_OTEL):
+        self.exporter = SpanFileExporter(export_path) if export_path else None
+        use_otel = OTEL_AVAILABLE and otel in ("auto", "true")
+        self._otel = otel_trace.get_tracer("urbaneye") if use_otel else None
+
+    # ------------------------------------------------------------------
+    # Span lifecycle
+    # ------------------------------------------------------------------
+    def begin(self, name, traceparent=None, **attributes):
+        """
+        Start a span as the current one. Without a current span it becomes
+        a root span (continuing `traceparent` when given). Pair with end().
+        """
+        parent = _current_span.get()
+        trace_id = parent_id = None
+        if parent is None and traceparent:
+            match = TRACEPARENT_RE.match(traceparent.strip().lower())
+            if match:
+                trace_id, parent_id = match.groups()
+        span = Span(name, parent, attributes, trace_id=trace_id, parent_id=parent_id)
+
+        if self._otel is not None:
+            ctx = otel_propagate.extract({"traceparent": traceparent}) if parent is None and traceparent else None
+            span._otel = self._otel.start_span(name, context=ctx, attributes=span.attributes,
+                                               start_time=span.start_ns)
+            span._otel_token = otel_context.attach(otel_trace.set_span_in_context(span._otel))
+            otel_ids = span._otel.get_span_context()
+            if otel_ids.is_valid:
+                # A configured SDK owns the IDs: keep the local export consistent
+                span.trace_id = format(otel_ids.trace_id, "032x")
+                span.span_id = format(otel_ids.span_id, "016x")
+
+        span._token = _current_span.set(span)
+        return span
+
+    def end(self, span, error=None):
+        """Finish a span from begin() and restore the previous current span"""
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = "ERROR"
+            span.attributes["error"] = type(error).__name__
+        try:
+            _current_span.reset(span._token)
+        except ValueError:
+            # Ended from another context (e.g. a copied one): just clear it
+            _current_span.set(None)
+        if span._otel is not None:
+            if error is not None:
+                span._otel.record_exception(error)
+                span._otel.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+            otel_context.detach(span._otel_token)
+            span._otel.end(end_time=span.end_ns)
+        self._finish(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Child span around a block; exceptions mark it as ERROR and propagate"""
+        span = self.begin(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end(span, error=e)
+            raise
+        self.end(span)
+
+    def record(self, name, duration_s, error=False, **attributes):
+        """Add an already-finished child span that ended now (listener callbacks)"""
+        parent = _current_span.get()
+        span = Span(name, parent, attributes)
+        span.end_ns = time.time_ns()
+        span.start_ns = span.end_ns - int(duration_s * 1e9)
+        if error:
+            span.status = "ERROR"
+        if self._otel is not None:
+            otel_span = self._otel.start_span(name, attributes=span.attributes, start_time=span.start_ns)
+            if error:
+                otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+            otel_span.end(end_time=span.end_ns)
+        self._finish(span)
+
+    def _finish(self, span):
+        if span.root is not span and span.root.timings is not None:
+            span.root.timings.add(span)
+        if self.exporter is not None:
+            self.exporter.export(span, flush=span.root is span)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def current_span(self):
+        return _current_span.get()
+
+    def pipeline_timings(self):
+        """Compact stage summary of the current trace (None outside a trace)"""
+        span = _current_span.get()
+        if span is None:
+            return None
+        root = span.root
+        timings = root.timings
+        with timings._lock:
+            stages = {name: round(ms, 1) for name, ms in timings.stages.items()}
+            mongo = {"calls": timings.mongo_calls, "ms": round(timings.mongo_ms, 1)}
+        return {
+            "total_ms": round(root.duration_ms, 1),
+            "stages": stages,
+            "mongo": mongo,
+            "trace_id": root.trace_id,
+        }
+
+    def flush(self):
+        if self.exporter is not None:
+            self.exporter.flush()
+
+
+try:
+    from pymongo import monitoring
+
+    class MongoCommandTracer(monitoring.CommandListener):
+        """A span per MongoDB command, parented to the caller's current span"""
+
+        def __init__(self, tracer):
+            self.tracer = tracer
+            self._collections = {}
+            self._lock = threading.Lock()
+
+        def started(self, event):
+            if _current_span.get() is None:
+                return  # outside a trace (startup, CLI jobs)
+            target = event.command.get(event.command_name)
+            collection = target if isinstance(target, str) else ""
+            with self._lock:
+                self._collections[(event.connection_id, event.request_id)] = collection
+
+        def _finish(self, event, error):
+            with self._lock:
+                collection = self._collections.pop((event.connection_id, event.request_id), None)
+            if collection is None:
+                return
+            self.tracer.record(f"mongo.{event.command_name}", event.duration_micros / 1e6, error=error,
+                               **{"db.system": "mongodb", "db.operation": event.command_name,
+                                  "db.collection": collection or None})
+
+        def succeeded(self, event):
+            self._finish(event, False)
+
+        def failed(self, event):
+            self._finish(event, True)
+
+    MONGO_MONITORING_AVAILABLE = True
+except ImportError:
+    MONGO_MONITORING_AVAILABLE = False
+
+
+# Global instance
+tracer = Tracer()
+atexit.register(tracer.flush)
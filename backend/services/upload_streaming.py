@@ -0,0 +1,185 @@
+"""
+Streaming Upload Handling for UrbanEye
+Writes multipart file parts straight to uploads/ while hashing them
+
+Werkzeug normally spools every file part into a temporary file (or memory)
+and the route then copies it with FileStorage.save(). StreamingRequest
+replaces that stream factory so each file part is:
+
+- written chunk by chunk directly to a file in uploads/ (which
+  services.storage then renames into place - no second copy),
+- hashed (SHA-256) on the fly, so the route gets `content_sha256` for free,
+- size-checked against a per-media-type limit on every chunk, and rejected
+  up front when the request's Content-Length already exceeds it.
+
+Oversize uploads raise 413 before the rest of the body is read; unclaimed
+files (rejected or failed requests) are deleted when the request closes.
+
+Usage:
+    app.request_class = StreamingRequest            # app.py
+    path, name, sha256 = save_upload(request.files["image"], "uploads")
+    key = storage.put_file(path, digest=sha256)     # services/storage.py
+"""
+
+import hashlib
+import os
+import time
+import uuid
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+UPLOAD_FOLDER = "uploads"
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+MB = 1024 * 1024
+MAX_IMAGE_BYTES = int(float(os.getenv("UPLOAD_MAX_IMAGE_MB", "15")) * MB)
+MAX_VIDEO_BYTES = int(float(os.getenv("UPLOAD_MAX_VIDEO_MB", "200")) * MB)
+# Room for the text fields that travel with the file
+FORM_OVERHEAD_BYTES = 1 * MB
+
+# Whole-body cap, enforced by Werkzeug before anything is read
+MAX_CONTENT_LENGTH = max(MAX_IMAGE_BYTES, MAX_VIDEO_BYTES) + FORM_OVERHEAD_BYTES
+
+
+def media_type_for(filename):
+    return "video" if str(filename or "").lower().endswith(VIDEO_EXTENSIONS) else "image"
+
+
+def limit_for(filename):
+    return MAX_VIDEO_BYTES if media_type_for(filename) == "video" else MAX_IMAGE_BYTES
+
+
+def unique_upload_name(filename):
+    """Same naming scheme as report_issue: <unix time>_<8 hex><ext>"""
+    ext = os.path.splitext(secure_filename(filename or ""))[1].lower()
+    return f"{int(time.time())}_{uuid.uuid4().hex[:8]}{ext}"
+
+
+class HashingUploadFile:
+    """
+    Writable/readable file that hashes and size-checks every chunk.
+    Created by StreamingRequest for each multipart file part.
+    """
+
+    def __init__(self, folder, filename, limit):
+        os.makedirs(folder, exist_ok=True)
+        self.filename = unique_upload_name(filename)
+        self.path = os.path.join(folder, self.filename)
+        self.limit = limit
+        self.size = 0
+        self.claimed = False
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, "w+b")
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.limit:
+            self.discard()
+            raise RequestEntityTooLarge(
+                f"Upload exceeds the {self.limit // MB} MB limit for this media type"
+            )
+        self._hash.update(chunk)
+        return self._file.write(chunk)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def claim(self):
+        """Keep the file on disk and return its path"""
+        self._file.flush()
+        self.claimed = True
+        return self.path
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.claimed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    # File protocol used by Werkzeug / FileStorage
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class StreamingRequest(Request):
+    """Flask request class that streams file parts via HashingUploadFile"""
+
+    upload_folder = UPLOAD_FOLDER
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        limit = limit_for(filename)
+        # Reject before reading the body when the declared size is already too big
+        declared = content_length or 0
+        if declared > limit or (total_content_length or 0) > limit + FORM_OVERHEAD_BYTES:
+            raise RequestEntityTooLarge(
+                f"Upload exceeds the {limit // MB} MB limit for this media type"
+            )
+
+        stream = HashingUploadFile(self.upload_folder, filename, limit)
+        self.__dict__.setdefault("_streamed_uploads", []).append(stream)
+        return stream
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for stream in self.__dict__.get("_streamed_uploads", []):
+                stream.discard()
+
+
+def save_upload(file_storage, folder=UPLOAD_FOLDER, claim=True):
+    """
+    Persist an uploaded file and return its location and content hash.
+
+    Streamed parts are already on disk and only claimed; any other
+    FileStorage is copied while hashing. With claim=False a streamed file
+    is still deleted when the request closes (unless it was moved away,
+    e.g. into services.storage), so it can serve as a scratch copy.
+
+    Returns:
+        tuple: (path, unique filename, sha256 hex)
+    """
+    stream = file_storage.stream
+    if isinstance(stream, HashingUploadFile) and os.path.dirname(stream.path) == os.path.normpath(folder):
+        path = stream.claim() if claim else stream.path
+        stream.flush()
+        stream.close()  # release the handle so the file can be moved (Windows)
+        return path, stream.filename, stream.sha256
+
+    os.makedirs(folder, exist_ok=True)
+    filename = unique_upload_name(file_storage.filename)
+    path = os.path.join(folder, filename)
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        for chunk in iter(lambda: stream.read(64 * 1024), b""):
+            digest.update(chunk)
+            out.write(chunk)
+    return path, filename, digest.hexdigest()
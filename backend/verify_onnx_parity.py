@@ -0,0 +1,109 @@
+"""
+Verify: ONNX Runtime classifier vs the Keras model it was exported from
+
+1. Parity   - softmax outputs of the ONNX artifact(s) against Keras on every
+              image in training_data/. float32 must match to ATOL and agree on
+              every top-1 label; the int8 model must agree on >= INT8_MIN_AGREEMENT.
+2. Footprint - cold start (import + load + first prediction) and peak RSS of
+              a fresh worker process for each backend.
+
+Exits with status 1 if parity is broken.
+
+Usage:
+    python -m ai.onnx_export --int8      # create the artifacts first
+    python verify_onnx_parity.py [--no-footprint]
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from ai.image_classifier import OnnxClassifier, _preprocess
+from ai.onnx_export import KERAS_MODEL_PATH, ONNX_MODEL_PATH, ONNX_INT8_MODEL_PATH
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+ATOL = 1e-4
+INT8_MIN_AGREEMENT = 0.95
+BATCH = 32
+
+# Runs in a fresh interpreter so imports and model load are measured cold
+FOOTPRINT_SNIPPET = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+from ai.image_classifier import classify_local_batch, _load_local_model
+model = _load_local_model()
+classify_local_batch([sys.argv[1]])
+print(json.dumps({
+    "backend": type(model).__name__,
+    "cold_start_s": round(time.perf_counter() - t0, 2),
+    "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+}))
+"""
+
+
+def list_images():
+    paths = glob.glob(os.path.join(BASE_DIR, "training_data", "**", "*"), recursive=True)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTS))
+
+
+def predict_all(model, arrays):
+    return np.concatenate([
+        np.asarray(model.predict(np.stack(arrays[i:i + BATCH]), verbose=0))
+        for i in range(0, len(arrays), BATCH)
+    ])
+
+
+def compare(reference, candidate):
+    """(max abs diff, top-1 agreement) of two softmax matrices"""
+    diff = float(np.abs(reference - candidate).max())
+    agreement = float((reference.argmax(axis=1) == candidate.argmax(axis=1)).mean())
+    return diff, agreement
+
+
+def footprint(backend, image):
+    env = dict(os.environ, CLASSIFIER_BACKEND=backend)
+    out = subprocess.run([sys.executable, "-c", FOOTPRINT_SNIPPET, image], cwd=BASE_DIR, env=env,
+                         capture_output=True, text=True, timeout=600)
+    lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+    return json.loads(lines[-1]) if lines else {"error": out.stderr.strip().splitlines()[-1:]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check ONNX classifier parity with Keras")
+    parser.add_argument("--no-footprint", action="store_true", help="Skip the cold-start/RSS comparison")
+    args = parser.parse_args()
+
+    if not os.path.exists(ONNX_MODEL_PATH):
+        sys.exit(f"❌ {ONNX_MODEL_PATH} not found - run: python -m ai.onnx_export")
+
+    images = list_images()
+    arrays = [a.astype(np.float32) for a in map(_preprocess, images) if a is not None]
+    print(f"🔍 Comparing on {len(arrays)} images from training_data/")
+
+    from tensorflow.keras.models import load_model
+    reference = predict_all(load_model(KERAS_MODEL_PATH), arrays)
+
+    failed = False
+    diff, agreement = compare(reference, predict_all(OnnxClassifier(ONNX_MODEL_PATH), arrays))
+    ok = diff <= ATOL and agreement == 1.0
+    failed |= not ok
+    print(f"   {'✅' if ok else '❌'} float32: max |diff| {diff:.2e}, top-1 agreement {agreement:.1%}")
+
+    if os.path.exists(ONNX_INT8_MODEL_PATH):
+        diff, agreement = compare(reference, predict_all(OnnxClassifier(ONNX_INT8_MODEL_PATH), arrays))
+        ok = agreement >= INT8_MIN_AGREEMENT
+        failed |= not ok
+        print(f"   {'✅' if ok else '❌'} int8:    max |diff| {diff:.2e}, top-1 agreement {agreement:.1%}")
+
+    if not args.no_footprint and images:
+        print("\n⏱️  Fresh worker footprint (import + load + first prediction)")
+        for backend in ("keras", "onnx"):
+            print(f"   {backend:6s} {footprint(backend, images[0])}")
+
+    sys.exit(1 if failed else 0)
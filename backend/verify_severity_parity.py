@@ -0,0 +1,230 @@
+"""
+Verify: downscaled severity analysis vs the legacy full-resolution analysis
+
+1. Native   - images at/below ANALYSIS_MAX_SIDE are analysed unchanged and
+              must get exactly the same score as the full-resolution path.
+2. Held-out - images above ANALYSIS_MAX_SIDE (training_data/ + uploads/) are
+              split by content hash into a FIT half and a HOLD-OUT half.
+              DOWNSCALED_THRESHOLDS are fitted on the FIT half only
+              (--fit prints them); agreement with the full-resolution
+              analysis is reported on the HOLD-OUT half, which the
+              thresholds never saw. Labels are compared under every base
+              score in BASE_SCORES.
+3. Speed    - full-res vs 512px on the largest real photos available (or
+              the --photo files), at their native resolution.
+
+Exits with status 1 on any native score mismatch or any hold-out label
+mismatch. The 512px level (SEVERITY_ANALYSIS_SIDE) stays opt-in until this
+passes.
+
+Usage:
+    python verify_severity_parity.py [--fit] [--no-bench] [--photo big.jpg ...]
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+
+from ai.image_context import ImageContext
+from ai.severity_model import (
+    ANALYSIS_MAX_SIDE, BASE_SCORES, DOWNSCALED_THRESHOLDS, NATIVE_THRESHOLDS, _bucket, estimate_severity,
+    get_label, visual_features
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTS = (".jpg", ".jpeg", ".jfif", ".png", ".webp")
+ISSUE_TYPE = "pothole"
+
+
+def list_images(*folders):
+    paths = []
+    for folder in folders:
+        paths += glob.glob(os.path.join(BASE_DIR, folder, "**", "*"), recursive=True)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTS) and "renditions" not in p)
+
+
+def load_samples(paths):
+    """
+    Visual features of every decodable image, at full resolution and at the
+    analysis level.
+
+    Returns:
+        list: dicts with path, digest, pixels, large, full (edge, contrast), small (edge, contrast)
+    """
+    samples, seen = [], set()
+    for path in paths:
+        ctx = ImageContext.from_path(path)
+        if ctx.gray is None:
+            continue
+        digest = hashlib.sha256(ctx.data).hexdigest()
+        if digest in seen:  # identical uploads would leak across the split
+            continue
+        seen.add(digest)
+        small = ctx.downscaled(ANALYSIS_MAX_SIDE, gray=True)
+        samples.append({
+            "path": os.path.relpath(path, BASE_DIR),
+            "digest": digest,
+            "pixels": ctx.gray.size,
+            "large": small.shape != ctx.gray.shape,
+            "full": visual_features(ctx.gray),
+            "small": visual_features(small),
+        })
+    return samples
+
+
+def split(samples):
+    """Deterministic, balanced FIT / HOLD-OUT halves: alternate in content-hash order"""
+    ordered = sorted(samples, key=lambda s: s["digest"])
+    return ordered[0::2], ordered[1::2]
+
+
+def _modifiers(features, thresholds):
+    return _bucket(features[0], thresholds["edge"]) + _bucket(features[1], thresholds["contrast"])
+
+
+def _labels(modifiers):
+    return [get_label(max(1, min(10, base + modifiers))) for base in sorted(set(BASE_SCORES.values()))]
+
+
+def agreement(samples, thresholds):
+    """
+    Downscaled analysis with `thresholds` vs the full-resolution analysis.
+    A sample agrees on labels only if they match for every base score.
+
+    Returns:
+        tuple: (score agreement, label agreement, [(path, full modifiers, downscaled modifiers, same labels)])
+    """
+    if not samples:
+        return None, None, []
+    misses, label_misses = [], 0
+    for s in samples:
+        full = _modifiers(s["full"], NATIVE_THRESHOLDS)
+        small = _modifiers(s["small"], thresholds)
+        same_labels = _labels(full) == _labels(small)
+        label_misses += not same_labels
+        if full != small:
+            misses.append((s["path"], full, small, same_labels))
+    return 1 - len(misses) / len(samples), 1 - label_misses / len(samples), misses
+
+
+def fit_thresholds(samples):
+    """
+    Per feature, the (low, high) pair for the downscaled value that best
+    reproduces the full-resolution bucket on `samples`. Candidates are the
+    midpoints between observed values; ties go to the pair closest to the
+    native thresholds.
+    """
+    fitted = {}
+    for i, feature in enumerate(("edge", "contrast")):
+        native = NATIVE_THRESHOLDS[feature]
+        target = [_bucket(s["full"][i], native) for s in samples]
+        values = sorted({s["small"][i] for s in samples})
+        candidates = sorted(set([(a + b) / 2 for a, b in zip(values, values[1:])] + list(native)))
+        best = None
+        for low in candidates:
+            for high in candidates:
+                if high < low:
+                    continue
+                hits = sum(_bucket(s["small"][i], (low, high)) == t for s, t in zip(samples, target))
+                distance = abs(low - native[0]) + abs(high - native[1])
+                key = (-hits, distance)
+                if best is None or key < best[0]:
+                    best = (key, (round(float(low), 4), round(float(high), 4)))
+        fitted[feature] = best[1]
+    return fitted
+
+
+def native_parity(paths):
+    """Small images must score identically on both paths"""
+    checked, mismatches = 0, []
+    for path in paths:
+        ctx = ImageContext.from_path(path)
+        if ctx.gray is None or max(ctx.gray.shape) > ANALYSIS_MAX_SIDE:
+            continue
+        legacy = estimate_severity(ctx, ISSUE_TYPE, analysis_side=None)
+        fast = estimate_severity(ctx, ISSUE_TYPE, analysis_side=ANALYSIS_MAX_SIDE)
+        checked += 1
+        if (legacy["score"], legacy["label"]) != (fast["score"], fast["label"]):
+            mismatches.append((os.path.relpath(path, BASE_DIR), legacy["score"], fast["score"]))
+    return checked, mismatches
+
+
+def benchmark(paths, repeats=5):
+    """Both paths on real photos at their own resolution (decode excluded)"""
+    print(f"\n⏱️  Benchmark on real photos (best of {repeats}, decode excluded)")
+    print(f"   {'photo':<40} {'MP':>5} | {'full ms':>8} | {'512px ms':>8} | speedup")
+    for path in paths:
+        ctx = ImageContext.from_path(path)
+        if ctx.gray is None:
+            print(f"   {os.path.basename(path):<40} not decodable")
+            continue
+        mp = ctx.gray.size / 1e6
+        timings = {}
+        for label, side in (("full", None), ("fast", ANALYSIS_MAX_SIDE)):
+            best = float("inf")
+            for _ in range(repeats):
+                fresh = ImageContext.from_path(path)
+                fresh.gray  # decode/convert cost is shared by every stage
+                start = time.perf_counter()
+                estimate_severity(fresh, ISSUE_TYPE, analysis_side=side)
+                best = min(best, time.perf_counter() - start)
+            timings[label] = best * 1000
+        print(f"   {os.path.basename(path)[:40]:<40} {mp:>5.1f} | {timings['full']:>8.1f} | "
+              f"{timings['fast']:>8.1f} | {timings['full'] / timings['fast']:.1f}x")
+
+
+def largest_photos(samples, count=3):
+    large = sorted(samples, key=lambda s: s["pixels"], reverse=True)
+    return [os.path.join(BASE_DIR, s["path"]) for s in large[:count]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Severity downscale parity check")
+    parser.add_argument("--fit", action="store_true", help="Fit DOWNSCALED_THRESHOLDS on the FIT split and print them")
+    parser.add_argument("--no-bench", action="store_true", help="Skip the speed benchmark")
+    parser.add_argument("--photo", nargs="*", default=[], help="Real photos to benchmark (e.g. 12 MP phone shots)")
+    args = parser.parse_args()
+
+    paths = list_images("training_data", "uploads")
+    checked, mismatches = native_parity(paths)
+    print(f"🧪 Native (<= {ANALYSIS_MAX_SIDE}px): {checked} images, {len(mismatches)} score mismatches")
+    for path, legacy, fast in mismatches:
+        print(f"   ❌ {path}: full-res {legacy} vs {ANALYSIS_MAX_SIDE}px {fast}")
+
+    samples = [s for s in load_samples(paths) if s["large"]]
+    fit, holdout = split(samples)
+    print(f"📷 Large (> {ANALYSIS_MAX_SIDE}px): {len(samples)} unique images, "
+          f"{len(fit)} fit / {len(holdout)} hold-out")
+
+    thresholds = DOWNSCALED_THRESHOLDS
+    if args.fit:
+        thresholds = fit_thresholds(fit)
+        print(f"   fitted on FIT split: {thresholds}")
+        print(f"   current:             {DOWNSCALED_THRESHOLDS}")
+
+    fit_share, _, _ = agreement(fit, thresholds)
+    held_share, held_labels, held_misses = agreement(holdout, thresholds)
+    baseline, baseline_labels, _ = agreement(holdout, NATIVE_THRESHOLDS)
+    if fit_share is not None:
+        print(f"   fit agreement:      score {fit_share:.1%} (in-sample)")
+    if held_share is not None:
+        print(f"   hold-out agreement: score {held_share:.1%} ({len(holdout) - len(held_misses)}/{len(holdout)}), "
+              f"label {held_labels:.1%}")
+        print(f"   native thresholds:  score {baseline:.1%}, label {baseline_labels:.1%} (no recalibration)")
+        for path, full, small, same_labels in held_misses:
+            icon = "⚠️" if same_labels else "❌"
+            print(f"   {icon} {path}: full-res modifiers {full} vs {ANALYSIS_MAX_SIDE}px {small}"
+                  f"{'' if same_labels else ' (label changes)'}")
+
+    if not args.no_bench:
+        photos = args.photo or largest_photos(samples)
+        if photos:
+            benchmark(photos)
+
+    if mismatches or any(not same_labels for *_, same_labels in held_misses):
+        print("\n❌ Parity check FAILED")
+        sys.exit(1)
+    print("\n✅ Parity check passed")
@@ -131,7 +131,7 @@ class _HomeScreenState extends State<HomeScreen> {
                                 backgroundImage: auth.currentUser?.profilePhoto != null 
                                   ? NetworkImage(auth.currentUser!.profilePhoto!.startsWith('http') 
                                       ? auth.currentUser!.profilePhoto! 
-                                      : ApiService.getImageUrl(auth.currentUser!.profilePhoto))
+                                      : ApiService.getImageUrl(auth.currentUser!.profilePhoto, size: 'thumb'))
                                   : null,
                                 child: auth.currentUser?.profilePhoto == null 
                                   ? const Icon(Icons.person, color: Color(0xFF4285F4))
@@ -56,7 +56,7 @@ class _IssueDetailScreenState extends State<IssueDetailScreen> {
               SizedBox(
                 height: 250,
                 child: Image.network(
-                  ApiService.getImageUrl(issue.imagePath),
+                  ApiService.getImageUrl(issue.imagePath, size: 'medium'),
                   fit: BoxFit.cover,
                   errorBuilder: (_, __, ___) => Container(
                     color: Colors.grey.shade200,
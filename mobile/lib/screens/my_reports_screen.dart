@@ -169,7 +169,7 @@ class _IssueCard extends StatelessWidget {
                   color: Colors.grey.shade200,
                   child: issue.imagePath != null
                       ? Image.network(
-                          ApiService.getImageUrl(issue.imagePath),
+                          ApiService.getImageUrl(issue.imagePath, size: 'thumb'),
                           fit: BoxFit.cover,
                           errorBuilder: (_, __, ___) => Icon(
                             Icons.image_not_supported,
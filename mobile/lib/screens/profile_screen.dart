@@ -116,7 +116,7 @@ class _ProfileScreenState extends State<ProfileScreen> {
                         backgroundImage: auth.currentUser?.profilePhoto != null 
                           ? NetworkImage(auth.currentUser!.profilePhoto!.startsWith('http') 
                               ? auth.currentUser!.profilePhoto! 
-                              : ApiService.getImageUrl(auth.currentUser!.profilePhoto))
+                              : ApiService.getImageUrl(auth.currentUser!.profilePhoto, size: 'thumb'))
                           : null,
                         child: auth.currentUser?.profilePhoto == null 
                           ? const Icon(Icons.person, size: 60, color: Color(0xFF4285F4))
@@ -343,9 +343,11 @@ class ApiService {
     };
   }
 
-  /// Helper: Get full image URL from backend image_path
-  static String getImageUrl(String? imagePath) {
+  /// Helper: Get full image URL from backend image_path.
+  /// [size] picks a server-side rendition ('thumb' 160px, 'medium' 640px).
+  static String getImageUrl(String? imagePath, {String? size}) {
     if (imagePath == null || imagePath.isEmpty) return '';
+    if (size != null) return '$baseUrl/$imagePath?size=$size';
     return '$baseUrl/$imagePath';
   }
 